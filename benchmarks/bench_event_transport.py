@@ -0,0 +1,115 @@
+"""Throughput and latency of board event delivery: Redis pub/sub vs Streams.
+
+Needs a running Redis (CELERY_RESULT_BACKEND or --redis-url):
+
+    python -m benchmarks.bench_event_transport --events 200000 --boards 50 --batch 500
+
+The publisher writes events in pipelined batches the way `record_activities`
+does; one reader per transport consumes them the way the API listeners do
+(SUBSCRIBE, or XREADGROUP + XACK). Each event carries its send time, so the
+reader reports delivered events/sec and end-to-end latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import redis.asyncio as redis
+
+from utils.redis_utils import REDIS_URL
+
+
+def frame(board_id:int,n:int)->str:
+    return json.dumps({"type":"activity","activity_id":n,"board_id":board_id,"message":"x"*120,"sent":time.perf_counter()})
+
+
+async def publish(client,transport:str,events:int,boards:int,batch:int,maxlen:int):
+    for start in range(0,events,batch):
+        pipe=client.pipeline(transaction=False)
+        for n in range(start,min(start+batch,events)):
+            board_id=n%boards
+            if transport=="streams":
+                pipe.xadd(f"bench:{board_id}:stream",{"data":frame(board_id,n)},maxlen=maxlen,approximate=True)
+            else:
+                pipe.publish(f"bench:{board_id}",frame(board_id,n))
+        await pipe.execute()
+
+
+async def read_pubsub(client,events:int,boards:int,latencies:list,ready:asyncio.Event):
+    pubsub=client.pubsub()
+    await pubsub.subscribe(*[f"bench:{board_id}" for board_id in range(boards)])
+    ready.set()
+    async for message in pubsub.listen():
+        if message["type"]!="message":
+            continue
+        latencies.append(time.perf_counter()-json.loads(message["data"])["sent"])
+        if len(latencies)>=events:
+            break
+    await pubsub.close()
+
+
+async def read_streams(client,events:int,boards:int,batch:int,latencies:list,ready:asyncio.Event):
+    streams={f"bench:{board_id}:stream":">" for board_id in range(boards)}
+    for name in streams:
+        await client.xgroup_create(name,"bench",id="$",mkstream=True)
+    ready.set()
+    while len(latencies)<events:
+        response=await client.xreadgroup("bench","bench",streams,count=batch,block=1000)
+        if not response:
+            break
+        for name,entries in response:
+            for _,fields in entries:
+                latencies.append(time.perf_counter()-json.loads(fields[b"data"])["sent"])
+            if entries:
+                await client.xack(name,"bench",*[entry_id for entry_id,_ in entries])
+
+
+async def run(transport:str,args):
+    publisher=redis.from_url(args.redis_url)
+    reader=redis.from_url(args.redis_url)
+    await publisher.delete(*[f"bench:{board_id}:stream" for board_id in range(args.boards)])
+    latencies=[]
+    ready=asyncio.Event()
+    if transport=="streams":
+        reading=asyncio.create_task(read_streams(reader,args.events,args.boards,args.batch,latencies,ready))
+    else:
+        reading=asyncio.create_task(read_pubsub(reader,args.events,args.boards,latencies,ready))
+    await ready.wait()
+
+    started=time.perf_counter()
+    await publish(publisher,transport,args.events,args.boards,args.batch,args.maxlen)
+    try:
+        await asyncio.wait_for(reading,timeout=args.timeout)
+    except asyncio.TimeoutError:
+        pass
+    elapsed=time.perf_counter()-started
+
+    await publisher.delete(*[f"bench:{board_id}:stream" for board_id in range(args.boards)])
+    await publisher.close()
+    await reader.close()
+    if not latencies:
+        print(f"{transport:>8}: nothing delivered")
+        return
+    latencies.sort()
+    print(
+        f"{transport:>8}: {len(latencies)}/{args.events} delivered  {len(latencies)/elapsed:,.0f} events/s  "
+        f"p50={statistics.median(latencies)*1000:.1f}ms  p99={latencies[int(len(latencies)*0.99)-1]*1000:.1f}ms"
+    )
+
+
+async def main(args):
+    for transport in args.transports:
+        await run(transport,args)
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url",default=REDIS_URL)
+    parser.add_argument("--events",type=int,default=200000)
+    parser.add_argument("--boards",type=int,default=50)
+    parser.add_argument("--batch",type=int,default=500)
+    parser.add_argument("--maxlen",type=int,default=10000)
+    parser.add_argument("--timeout",type=float,default=60)
+    parser.add_argument("--transports",nargs="+",default=["pubsub","streams"],choices=["pubsub","streams"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""Login throughput vs board API latency under a mixed load.
+
+Needs a running API (e.g. `uvicorn main:app`); run it once with
+BCRYPT_WORKERS=0 (bcrypt in the shared threadpool) and once with the
+default process pool to compare:
+
+    python -m benchmarks.bench_login_load --base-url http://localhost:8000 --logins 2000 --login-concurrency 64
+
+A login storm (POST /auth/token_json for --users accounts) runs alongside
+--readers clients polling GET /boards/{id}/cards. The report is logins/sec,
+how many were shed with 503, and board read latency percentiles.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+async def setup(client,users:int):
+    prefix=uuid.uuid4().hex[:8]
+    accounts=[(f"bench-{prefix}-{n}@example.com","bench-password") for n in range(users)]
+    for email,password in accounts:
+        response=await client.post("/auth/register",json={"email":email,"name":"bench","password":password})
+        response.raise_for_status()
+    token=(await client.post("/auth/token_json",json={"email":accounts[0][0],"password":accounts[0][1]})).json()["access_token"]
+    headers={"Authorization":f"Bearer {token}"}
+    board_id=(await client.post("/boards",json={"name":"bench","description":"login load"},headers=headers)).json()["id"]
+    for n in range(20):
+        await client.post(f"/boards/{board_id}/cards",json={"title":f"card {n}","description":"x"},headers=headers)
+    return accounts,headers,board_id
+
+
+async def login_storm(client,accounts,logins:int,concurrency:int,outcomes:dict):
+    queue=asyncio.Queue()
+    for n in range(logins):
+        queue.put_nowait(accounts[n%len(accounts)])
+
+    async def worker():
+        while not queue.empty():
+            email,password=queue.get_nowait()
+            response=await client.post("/auth/token_json",json={"email":email,"password":password})
+            outcomes[response.status_code]=outcomes.get(response.status_code,0)+1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+
+async def board_reader(client,headers,board_id:int,latencies:list,stop:asyncio.Event):
+    while not stop.is_set():
+        started=time.perf_counter()
+        response=await client.get(f"/boards/{board_id}/cards",headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter()-started)
+
+
+def percentile(values:list,fraction:float)->float:
+    return values[max(0,int(len(values)*fraction)-1)]
+
+
+async def main(args):
+    limits=httpx.Limits(max_connections=args.login_concurrency+args.readers)
+    async with httpx.AsyncClient(base_url=args.base_url,timeout=args.timeout,limits=limits) as client:
+        accounts,headers,board_id=await setup(client,args.users)
+
+        baseline=[]
+        stop=asyncio.Event()
+        readers=[asyncio.create_task(board_reader(client,headers,board_id,baseline,stop)) for _ in range(args.readers)]
+        await asyncio.sleep(args.warmup)
+        stop.set()
+        await asyncio.gather(*readers)
+
+        latencies=[]
+        outcomes={}
+        stop=asyncio.Event()
+        readers=[asyncio.create_task(board_reader(client,headers,board_id,latencies,stop)) for _ in range(args.readers)]
+        started=time.perf_counter()
+        await login_storm(client,accounts,args.logins,args.login_concurrency,outcomes)
+        elapsed=time.perf_counter()-started
+        stop.set()
+        await asyncio.gather(*readers)
+
+    for label,values in (("idle",baseline),("storm",latencies)):
+        values.sort()
+        print(f"board reads ({label:>5}): {len(values)} requests  p50={statistics.median(values)*1000:.1f}ms  p99={percentile(values,0.99)*1000:.1f}ms")
+    print(f"logins: {outcomes.get(200,0)}/{args.logins} ok  {outcomes.get(200,0)/elapsed:,.1f} logins/s  shed(503)={outcomes.get(503,0)}  other={ {code:count for code,count in outcomes.items() if code not in (200,503)} }")
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url",default="http://localhost:8000")
+    parser.add_argument("--users",type=int,default=50)
+    parser.add_argument("--logins",type=int,default=2000)
+    parser.add_argument("--login-concurrency",type=int,default=64)
+    parser.add_argument("--readers",type=int,default=8)
+    parser.add_argument("--warmup",type=float,default=5)
+    parser.add_argument("--timeout",type=float,default=60)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""Per-item cost of serializing a large card list, before and after the fast path.
+
+Runs against an in-memory SQLite board by default (or --database-url):
+
+    python -m benchmarks.bench_serialization --cards 10000 --repeat 20
+
+`orm+model` is the path before the fast one: ORM Card objects copied into
+dicts, re-validated against `response_model` and encoded with the stdlib
+json module. The other rows fetch Core column tuples as `CardQueryHandler`
+does and encode them with each FAST_SERIALIZATION mode; `off` is what the
+card list cache did before. Query and encode times are
+reported separately, per request and per card.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine,insert,select
+from sqlalchemy.orm import sessionmaker
+
+from db.models import Base,Board,Card,User
+from queries.handlers import CARD_COLUMNS
+from schemas.card_schemas import CardOut
+from utils.serialization_utils import encode
+
+
+def seed(db,cards:int)->int:
+    user_id=db.scalar(insert(User).values(email="bench@example.com",name="bench",password_hash="x").returning(User.id))
+    board_id=db.scalar(insert(Board).values(name="bench",description="serialization",created_by=user_id).returning(Board.id))
+    now=datetime.now()
+    db.execute(insert(Card),[{"title":f"card {n}","description":"lorem ipsum "*4,"board_id":board_id,"position":float(n*1024),"is_complete":n%3==0,"created_by":user_id,"created_at":now,"updated_at":now} for n in range(cards)])
+    db.commit()
+    return board_id
+
+
+def orm_rows(db,board_id:int):
+    return [
+        {"id":card.id,"title":card.title,"description":card.description,"is_complete":card.is_complete,"board_id":card.board_id,"position":card.position,"created_by":card.created_by,"created_at":card.created_at,"updated_at":card.updated_at}
+        for card in db.query(Card).filter(Card.board_id==board_id).order_by(Card.position).all()
+    ]
+
+
+def core_rows(db,board_id:int):
+    # what CardQueryHandler._list_cards returns, minus its membership and board checks
+    return [row._asdict() for row in db.execute(select(*CARD_COLUMNS).where(Card.board_id==board_id).order_by(Card.position)).all()]
+
+
+RESPONSE_MODEL=TypeAdapter(list[CardOut])
+
+
+def before_encode(rows)->bytes:
+    # FastAPI's response_model path: validate, dump to JSON-able python, json.dumps in JSONResponse
+    return json.dumps(RESPONSE_MODEL.dump_python(RESPONSE_MODEL.validate_python(rows),mode="json"),separators=(",",":")).encode()
+
+
+def measure(fetch,encode_rows,db,board_id:int,repeat:int):
+    fetches,encodes,size=[],[],0
+    for _ in range(repeat):
+        db.expunge_all()
+        started=time.perf_counter()
+        rows=fetch(db,board_id)
+        fetched=time.perf_counter()
+        body=encode_rows(rows)
+        fetches.append(fetched-started)
+        encodes.append(time.perf_counter()-fetched)
+        size=len(body)
+    return statistics.median(fetches),statistics.median(encodes),size
+
+
+def main(args):
+    engine=create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    db=sessionmaker(bind=engine)()
+    board_id=seed(db,args.cards)
+    # sanity: every path must produce the same document
+    reference=json.loads(before_encode(orm_rows(db,board_id)))
+    paths=[
+        ("orm+model",orm_rows,before_encode),
+        *[(mode,core_rows,lambda rows,mode=mode:encode(rows,list[CardOut],mode=mode)) for mode in ("off","validate","trusted")],
+    ]
+    for name,fetch,encode_rows in paths:
+        assert json.loads(encode_rows(fetch(db,board_id)))==reference,name
+        fetch_s,encode_s,size=measure(fetch,encode_rows,db,board_id,args.repeat)
+        total=fetch_s+encode_s
+        print(
+            f"{name:>9}: fetch={fetch_s*1000:7.1f}ms  encode={encode_s*1000:7.1f}ms  total={total*1000:7.1f}ms  "
+            f"{total/args.cards*1e6:5.2f}us/card  {size/1024:,.0f}KiB"
+        )
+    db.close()
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url",default="sqlite://")
+    parser.add_argument("--cards",type=int,default=10000)
+    parser.add_argument("--repeat",type=int,default=20)
+    main(parser.parse_args())
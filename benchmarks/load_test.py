@@ -0,0 +1,80 @@
+"""Concurrent-client load test for the board API.
+
+Run the API in the mode under test, then point this script at it:
+
+    ASYNC_DB=0 uvicorn main:app --workers 4      # threadpool + SessionLocal
+    ASYNC_DB=1 uvicorn main:app --workers 4      # AsyncSession (asyncpg)
+    python -m benchmarks.load_test --base-url http://localhost:8000 --concurrency 100 1000 5000
+
+It registers (or logs in) a benchmark user, creates one board with a few
+cards and then hammers the read endpoints with N concurrent clients,
+printing requests/sec and latency percentiles per concurrency level.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+ENDPOINTS=("/boards","/boards/{board_id}","/boards/{board_id}/cards","/boards/{board_id}/feed")
+
+
+async def setup(client:httpx.AsyncClient,email:str,password:str):
+    await client.post("/auth/register",json={"email":email,"name":"bench","password":password})
+    token=(await client.post("/auth/token_json",json={"email":email,"password":password})).json()["access_token"]
+    headers={"Authorization":f"Bearer {token}"}
+    board_id=(await client.post("/boards",headers=headers,json={"name":"bench","description":"load test"})).json()["id"]
+    for i in range(20):
+        await client.post(f"/boards/{board_id}/cards",headers=headers,json={"title":f"card {i}","description":"","position":i+1})
+    return headers,board_id
+
+
+async def worker(client,headers,board_id,deadline,latencies,errors):
+    i=0
+    while time.perf_counter()<deadline:
+        path=ENDPOINTS[i%len(ENDPOINTS)].format(board_id=board_id)
+        i+=1
+        started=time.perf_counter()
+        try:
+            response=await client.get(path,headers=headers)
+            if response.status_code>=400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter()-started)
+
+
+async def run_level(base_url,headers,board_id,concurrency,duration):
+    limits=httpx.Limits(max_connections=concurrency,max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url,limits=limits,timeout=60) as client:
+        latencies,errors=[],[]
+        deadline=time.perf_counter()+duration
+        await asyncio.gather(*(worker(client,headers,board_id,deadline,latencies,errors) for _ in range(concurrency)))
+    if not latencies:
+        print(f"{concurrency:>6} clients: no successful requests ({len(errors)} errors)")
+        return
+    latencies.sort()
+    p50=statistics.median(latencies)*1000
+    p99=latencies[int(len(latencies)*0.99)-1]*1000
+    print(f"{concurrency:>6} clients: {len(latencies)/duration:>9.1f} req/s  p50={p50:.1f}ms  p99={p99:.1f}ms  errors={len(errors)}")
+
+
+async def main():
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url",default="http://localhost:8000")
+    parser.add_argument("--concurrency",type=int,nargs="+",default=[100,1000,5000])
+    parser.add_argument("--duration",type=float,default=20.0,help="seconds per concurrency level")
+    parser.add_argument("--email",default="bench@example.com")
+    parser.add_argument("--password",default="bench-password")
+    args=parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url,timeout=60) as client:
+        headers,board_id=await setup(client,args.email,args.password)
+    for concurrency in args.concurrency:
+        await run_level(args.base_url,headers,board_id,concurrency,args.duration)
+
+
+if __name__=="__main__":
+    asyncio.run(main())
@@ -1,5 +1,5 @@
 class CreateCardCommand:
-    def __init__(self,board_id:int,user_id:int,position:float,title:str,description:str):
+    def __init__(self,board_id:int,user_id:int,title:str,description:str,position:float|None=None):
         
         self.board_id=board_id
         self.user_id=user_id
@@ -17,6 +17,22 @@ class UpdateCardCommand:
         self.title=title
         self.description=description
 
+class MoveCardCommand:
+    """Place a card right after `after_id` and/or right before `before_id`."""
+    def __init__(self,id:int,board_id:int,user_id:int,after_id:int|None=None,before_id:int|None=None):
+        self.id=id
+        self.board_id=board_id
+        self.user_id=user_id
+        self.after_id=after_id
+        self.before_id=before_id
+
+class BatchCardCommand:
+    """Apply `operations` (dicts with an `op` of create/update/move/delete) in order, in one transaction."""
+    def __init__(self,board_id:int,user_id:int,operations:list[dict]):
+        self.board_id=board_id
+        self.user_id=user_id
+        self.operations=operations
+
 class DeleteCardCommand:
     def __init__(self,id,board_id,user_id):
         self.id=id
@@ -1,12 +1,18 @@
+from datetime import datetime
+from collections import defaultdict
 from fastapi import HTTPException,status
+from sqlalchemy import select,insert,update,delete
 
 from db.models import Board,Card,BoardMembers,BoardRole,AuditAction
 from utils.permission_utils import BoardPermissionService
 from commands.boards import CreateBoardCommand,UpdateBoardCommand,DeleteBoardCommand
-from commands.cards import CreateCardCommand,UpdateCardCommand,DeleteCardCommand
+from commands.cards import CreateCardCommand,UpdateCardCommand,DeleteCardCommand,MoveCardCommand,BatchCardCommand
 from commands.boards import AddBoardMemberCommand,UpdateBoardMemberRoleCommand,RemoveBoardMemberCommand
-from tasks.log import log_audit
-from tasks.process import record_activity
+from utils.outbox_utils import add_outbox_event,request_rebalance
+from utils.membership_cache import publish_membership_change
+from utils.db_utils import insert_on_conflict_do_nothing,AsyncHandler
+from utils.version_utils import bump_board_version
+from utils.ordering_utils import position_between,is_too_dense,next_position,rebalance_positions,BoardLayout
 
 class BoardCommandHandler:
     def __init__(self,db):
@@ -27,15 +33,12 @@ class BoardCommandHandler:
         self.db.flush()
         membership=BoardMembers(user_id=command.user_id,board_id=board.id,role=BoardRole.owner,)
         self.db.add(membership)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=board.id,action=AuditAction.BOARD_CREATED,payload={"name":board.name,"description":board.description})
         
         self.db.commit()
         board_id = board.id
         created_at = board.created_at
         updated_at = board.updated_at
-        try:
-            record_activity.delay(actor_id=command.user_id,board_id=board.id,action=AuditAction.BOARD_CREATED,payload={"name":board.name,"description":board.description},)
-        except Exception as e:
-            print("failed to dispatch activity task")
         return {
             "id": board_id,
             "name": command.name,
@@ -57,6 +60,8 @@ class BoardCommandHandler:
             board.name=command.name
         if command.description is not None:
             board.description=command.description
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=board.id,action=AuditAction.BOARD_UPDATED,payload={"old":{"name":old_name,"description":old_description},"new":{"name":board.name,"description":board.description}})
         
         self.db.commit()
         board_id = board.id
@@ -65,10 +70,6 @@ class BoardCommandHandler:
         created_by = board.created_by
         created_at = board.created_at
         updated_at = board.updated_at
-        try:
-            record_activity.delay(actor_id=command.user_id,board_id=board.id,action=AuditAction.BOARD_UPDATED,payload={"old":{"name":old_name,"description":old_description},"new":{"name":board.name,"description":board.description},},)
-        except Exception as e:
-            print("failed to dispatch activity task")
 
         return {
             "id": board_id,
@@ -87,11 +88,9 @@ class BoardCommandHandler:
         
         name = board.name
         self.db.delete(board)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=command.board_id,action=AuditAction.BOARD_DELETED,payload=None)
         self.db.commit()
-        try:
-            record_activity.delay(actor_id=command.user_id,board_id=command.board_id,action=AuditAction.BOARD_DELETED,payload=None)
-        except Exception as e:
-            print("failed to dispatch activity task")
+        publish_membership_change(self.db,command.board_id)
 
         return {"name": name}
 
@@ -106,6 +105,10 @@ class CardCommandHandler:
             return self._update_card(command)
         if isinstance(command,DeleteCardCommand):
             return self._delete_card(command)
+        if isinstance(command,MoveCardCommand):
+            return self._move_card(command)
+        if isinstance(command,BatchCardCommand):
+            return self._batch_cards(command)
 
     def _create_card(self,command:CreateCardCommand):
         BoardPermissionService.require_role(self.db,command.board_id,user_id=command.user_id,allowed_roles={BoardRole.owner})
@@ -116,23 +119,23 @@ class CardCommandHandler:
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Board not found"
         )
-        card=Card(title=command.title,description=command.description,board_id=command.board_id,position=command.position,created_by=command.user_id)
+        position=command.position if command.position is not None else next_position(self.db,command.board_id)
+        card=Card(title=command.title,description=command.description,board_id=command.board_id,position=position,created_by=command.user_id)
         self.db.add(card)
+        self.db.flush()
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARD_CREATED,payload={
+            "id": card.id,
+            "title": card.title,
+            "description": card.description,
+            "position": float(card.position),
+            "created_by": card.created_by
+        })
         self.db.commit()
         self.db.refresh(card)
         card_id = card.id
         created_at = card.created_at
         updated_at = card.updated_at
-        try:
-            record_activity.delay(actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARD_CREATED,payload={
-                "id": card.id,
-                "title": card.title,
-                "description": card.description,
-                "position": float(card.position),
-                "created_by": card.created_by
-            })
-        except Exception as e:
-            print("failed to dispatch activity task")
 
         return {
             "id": card_id,
@@ -140,7 +143,7 @@ class CardCommandHandler:
             "description": command.description,
             "is_complete": False,
             "board_id": command.board_id,
-            "position": command.position,
+            "position": position,
             "created_by": command.user_id,
             "created_at": created_at,
             "updated_at": updated_at,
@@ -170,6 +173,10 @@ class CardCommandHandler:
             card.description=command.description
         if command.position is not None:
             card.position=command.position
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARD_UPDATED,payload={
+            "old":{"title":old_title,"description":old_description,"position":float(old_position)},"new":{"title":card.title,"description":card.description,"position":float(card.position)}
+        })
         
         self.db.commit()
         card_id = card.id
@@ -181,12 +188,6 @@ class CardCommandHandler:
         created_by = card.created_by
         created_at = card.created_at
         updated_at = card.updated_at
-        try:
-            record_activity.delay(actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARD_UPDATED,payload={
-                "old":{"title":old_title,"description":old_description,"position":float(old_position)},"new":{"title":card.title,"description":card.description,"position":float(card.position)}
-            })
-        except Exception as e:
-            print("failed to dispatch activity task")
         return {
             "id": card_id,
             "title": title,
@@ -199,6 +200,132 @@ class CardCommandHandler:
             "updated_at": updated_at,
         }
     
+    def _move_card(self,command:MoveCardCommand):
+        BoardPermissionService.require_role(self.db,command.board_id,user_id=command.user_id,allowed_roles={BoardRole.owner,BoardRole.editor})
+        if command.after_id is None and command.before_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="after_card_id or before_card_id is required")
+        if command.id in (command.after_id,command.before_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="a card cannot be moved next to itself")
+        # serialises with the rebalancer, which rewrites the board's keys under the same lock
+        if self.db.execute(select(Board.id).where(Board.id==command.board_id).with_for_update()).first() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Board not found")
+        card=(self.db.query(Card).filter(Card.id==command.id,Card.board_id==command.board_id).first())
+        if card is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Card not found")
+
+        previous,following=self._neighbour_positions(command)
+        position=position_between(previous,following)
+        if previous is not None and following is not None and not previous<position<following:
+            # float precision exhausted between the two neighbours: respace the board now
+            rebalance_positions(self.db,command.board_id)
+            self.db.refresh(card)
+            previous,following=self._neighbour_positions(command)
+            position=position_between(previous,following)
+
+        old_position=card.position
+        card.position=position
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARD_MOVED,payload={
+            "id":card.id,"title":card.title,"old_position":old_position,"new_position":position
+        })
+        if is_too_dense(previous,position,following):
+            request_rebalance(self.db,command.user_id,command.board_id)
+        self.db.commit()
+        return {
+            "id": card.id,
+            "title": card.title,
+            "description": card.description,
+            "is_complete": card.is_complete,
+            "board_id": card.board_id,
+            "position": card.position,
+            "created_by": card.created_by,
+            "created_at": card.created_at,
+            "updated_at": card.updated_at,
+        }
+
+    def _neighbour_positions(self,command:MoveCardCommand):
+        """Positions the moved card goes between; a missing side is the next card along from the given one."""
+        anchor_ids=[card_id for card_id in (command.after_id,command.before_id) if card_id is not None]
+        positions=dict(self.db.execute(select(Card.id,Card.position).where(Card.board_id==command.board_id,Card.id.in_(anchor_ids))).all())
+        if len(positions)!=len(set(anchor_ids)):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Card not found")
+        others=select(Card.position).where(Card.board_id==command.board_id,Card.id!=command.id)
+        if command.after_id is not None and command.before_id is not None:
+            previous,following=positions[command.after_id],positions[command.before_id]
+            if previous>=following:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="after_card_id must come before before_card_id")
+        elif command.after_id is not None:
+            previous=positions[command.after_id]
+            following=self.db.scalar(others.where(Card.position>previous).order_by(Card.position.asc()).limit(1))
+        else:
+            following=positions[command.before_id]
+            previous=self.db.scalar(others.where(Card.position<following).order_by(Card.position.desc()).limit(1))
+        return previous,following
+
+    def _batch_cards(self,command:BatchCardCommand):
+        operations=command.operations
+        # create and delete are owner-only as for single cards; one check covers the whole batch
+        allowed_roles={BoardRole.owner} if any(operation["op"] in ("create","delete") for operation in operations) else {BoardRole.owner,BoardRole.editor}
+        BoardPermissionService.require_role(self.db,command.board_id,user_id=command.user_id,allowed_roles=allowed_roles)
+        if self.db.execute(select(Board.id).where(Board.id==command.board_id).with_for_update()).first() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Board not found")
+
+        layout=BoardLayout(self.db.execute(select(Card.id,Card.position).where(Card.board_id==command.board_id)).all())
+        creates=[]
+        updates=defaultdict(dict)
+        deleted=[]
+        counts={"created":0,"updated":0,"moved":0,"deleted":0}
+        dense=False
+        for operation in operations:
+            kind=operation["op"]
+            if kind=="create":
+                key=-1-len(creates)
+                creates.append({"title":operation["title"],"description":operation["description"]})
+                if operation["position"] is None:
+                    layout.append(key)
+                else:
+                    layout.place(key,operation["position"])
+                counts["created"]+=1
+                continue
+            card_id=operation["id"]
+            if card_id not in layout:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"Card {card_id} not found")
+            if kind=="delete":
+                layout.remove(card_id)
+                updates.pop(card_id,None)
+                deleted.append(card_id)
+                counts["deleted"]+=1
+            elif kind=="move":
+                dense|=layout.move(card_id,operation["after_card_id"],operation["before_card_id"])
+                counts["moved"]+=1
+            else:
+                for field in ("title","description"):
+                    if operation[field] is not None:
+                        updates[card_id][field]=operation[field]
+                if operation["position"] is not None:
+                    layout.remove(card_id)
+                    layout.place(card_id,operation["position"])
+                counts["updated"]+=1
+
+        now=datetime.now()
+        for key in layout.changed:
+            if key>0 and key in layout:
+                updates[key]["position"]=layout.positions[key]
+        if deleted:
+            self.db.execute(delete(Card).where(Card.board_id==command.board_id,Card.id.in_(deleted)))
+        if updates:
+            self.db.execute(update(Card),[{"id":card_id,**fields,"updated_at":now} for card_id,fields in updates.items()])
+        created_ids=[]
+        if creates:
+            rows=[{**row,"board_id":command.board_id,"position":layout.positions[-1-index],"is_complete":False,"created_by":command.user_id,"created_at":now,"updated_at":now} for index,row in enumerate(creates)]
+            created_ids=self.db.scalars(insert(Card).returning(Card.id,sort_by_parameter_order=True),rows).all()
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARDS_BATCH,payload=counts)
+        if dense:
+            request_rebalance(self.db,command.user_id,command.board_id)
+        self.db.commit()
+        return {"created_ids":created_ids,**{key:counts[key] for key in ("updated","moved","deleted")}}
+
     def _delete_card(self,command:DeleteCardCommand):
         BoardPermissionService.require_role(self.db,command.board_id,user_id=command.user_id,allowed_roles={BoardRole.owner})
         board=self.db.query(Board).filter(Board.id==command.board_id)
@@ -216,11 +343,9 @@ class CardCommandHandler:
             detail="Card not found"
             )
         self.db.delete(card)
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARD_DELETED,payload=None)
         self.db.commit()
-        try:
-            record_activity.delay(actor_id=command.user_id,board_id=command.board_id,action=AuditAction.CARD_DELETED,payload=None)
-        except Exception as e:
-            print("failed to dispatch activity task")
         return card
 
 
@@ -249,14 +374,15 @@ class BoardMemberHandler:
         if command.role==BoardRole.owner:
             raise HTTPException(400,"owner role cannot be assigned")
         
-        exists=(self.db.query(BoardMembers).filter(BoardMembers.board_id==command.board_id,BoardMembers.user_id==command.target_user_id).first())
-        if exists:
+        # uq_board_members_board_user makes concurrent adds race-free without an exists-then-insert round trip
+        inserted=insert_on_conflict_do_nothing(self.db,BoardMembers,{"board_id":command.board_id,"user_id":command.target_user_id,"role":command.role},index_elements=["board_id","user_id"])
+        if not inserted:
+            self.db.rollback()
             raise HTTPException(400,"user is already a board member")
-        
-        membership=BoardMembers(board_id=command.board_id,user_id=command.target_user_id,role=command.role)
-        self.db.add(membership)
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.owner_id,board_id=command.board_id,action=AuditAction.MEMBER_ADDED,payload={"board_id":command.board_id,"user_id":command.target_user_id,"role":command.role.value})
         self.db.commit()
-        record_activity.delay(actor_id=command.owner_id,board_id=command.board_id,action=AuditAction.MEMBER_ADDED,payload={"board_id":command.board_id,"user_id":command.target_user_id,"role":command.role.value})
+        publish_membership_change(self.db,command.board_id,command.target_user_id)
         return {
             "user_id": command.target_user_id,
             "board_id": command.board_id,
@@ -272,8 +398,10 @@ class BoardMemberHandler:
         if membership.role==BoardRole.owner:
             raise HTTPException(400,"owner cant be removed")
         self.db.delete(membership)
-        log_audit.delay(actor_id=command.owner_id,board_id=command.board_id,action=AuditAction.MEMBER_REMOVED,payload={"board_id":command.board_id,"user_id":command.target_user_id})
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.owner_id,board_id=command.board_id,action=AuditAction.MEMBER_REMOVED,payload={"board_id":command.board_id,"user_id":command.target_user_id})
         self.db.commit()
+        publish_membership_change(self.db,command.board_id,command.target_user_id)
     
     def _update_role(self,command:UpdateBoardMemberRoleCommand):
         self._require_owner(command.board_id,command.owner_id)
@@ -286,9 +414,11 @@ class BoardMemberHandler:
         old_role=membership.role
         print(old_role)
         membership.role=command.new_role
+        bump_board_version(self.db,command.board_id)
+        add_outbox_event(self.db,actor_id=command.owner_id,board_id=command.board_id,action=AuditAction.MEMBER_ROLE_CHANGED,payload={"board_id":command.board_id,"user_id":command.target_user_id,"old_role":old_role.value,"new_role":command.new_role.value})
         self.db.commit()
+        publish_membership_change(self.db,command.board_id,command.target_user_id)
         self.db.refresh(membership)
-        record_activity.delay(actor_id=command.owner_id,board_id=command.board_id,action=AuditAction.MEMBER_ROLE_CHANGED,payload={"board_id":command.board_id,"user_id":command.target_user_id,"old_role":old_role.value,"new_role":command.new_role.value})
         return {
             "user_id": command.target_user_id,
             "board_id": command.board_id,
@@ -296,9 +426,13 @@ class BoardMemberHandler:
         }
 
 
-    
-    
+class AsyncBoardCommandHandler(AsyncHandler):
+    handler_class=BoardCommandHandler
 
-    
+
+class AsyncCardCommandHandler(AsyncHandler):
+    handler_class=CardCommandHandler
 
 
+class AsyncBoardMemberHandler(AsyncHandler):
+    handler_class=BoardMemberHandler
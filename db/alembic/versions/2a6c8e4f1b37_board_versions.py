@@ -0,0 +1,28 @@
+"""board versions
+
+Revision ID: 2a6c8e4f1b37
+Revises: 9e3b7d1f4a62
+Create Date: 2026-10-18 15:22:47.903214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a6c8e4f1b37'
+down_revision: Union[str, Sequence[str], None] = '9e3b7d1f4a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('boards', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('boards', 'version')
@@ -0,0 +1,31 @@
+"""activity feed keyset index
+
+Revision ID: 3c1a9e5d7b20
+Revises: f937afb7bdfe
+Create Date: 2026-10-18 09:12:04.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1a9e5d7b20'
+down_revision: Union[str, Sequence[str], None] = 'f937afb7bdfe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (board_id, created_at, id) serves the keyset-paginated feed; board_id alone is now a redundant prefix
+    op.create_index('ix_activity_feeds_board_created_id', 'activity_feeds', ['board_id', 'created_at', 'id'], unique=False)
+    op.drop_index(op.f('ix_activity_feeds_board_id'), table_name='activity_feeds')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_activity_feeds_board_id'), 'activity_feeds', ['board_id'], unique=False)
+    op.drop_index('ix_activity_feeds_board_created_id', table_name='activity_feeds')
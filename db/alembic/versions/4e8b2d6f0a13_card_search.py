@@ -0,0 +1,59 @@
+"""card search
+
+Revision ID: 4e8b2d6f0a13
+Revises: 7c4f1a9d2e58
+Create Date: 2026-10-18 21:06:52.310874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b2d6f0a13'
+down_revision: Union[str, Sequence[str], None] = '7c4f1a9d2e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # a stored generated column is recomputed by every write path, COPY and bulk UPDATE included
+        op.execute(
+            "ALTER TABLE cards ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED"
+        )
+        op.create_index('ix_cards_search_vector', 'cards', ['search_vector'], unique=False, postgresql_using='gin')
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE cards_fts USING fts5(title, description, content='cards', content_rowid='id', tokenize='porter unicode61')")
+        op.execute(
+            "CREATE TRIGGER cards_fts_insert AFTER INSERT ON cards BEGIN "
+            "INSERT INTO cards_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER cards_fts_delete AFTER DELETE ON cards BEGIN "
+            "INSERT INTO cards_fts(cards_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER cards_fts_update AFTER UPDATE OF title, description ON cards BEGIN "
+            "INSERT INTO cards_fts(cards_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+            "INSERT INTO cards_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+        )
+        # index the cards that already exist
+        op.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_cards_search_vector', table_name='cards', postgresql_using='gin')
+        op.drop_column('cards', 'search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('cards_fts_insert', 'cards_fts_delete', 'cards_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS cards_fts")
@@ -0,0 +1,31 @@
+"""audit log event ids
+
+Revision ID: 6f2a9c4e8b15
+Revises: 4e8b2d6f0a13
+Create Date: 2026-10-18 23:12:40.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2a9c4e8b15'
+down_revision: Union[str, Sequence[str], None] = '4e8b2d6f0a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('audit_logs', sa.Column('event_id', sa.Integer(), nullable=True))
+    # a unique index on a partitioned table must contain the partition key; replays carry the outbox created_at
+    op.create_index('uq_audit_logs_event_created', 'audit_logs', ['event_id', 'created_at'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_audit_logs_event_created', table_name='audit_logs')
+    op.drop_column('audit_logs', 'event_id')
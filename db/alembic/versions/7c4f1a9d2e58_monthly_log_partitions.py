@@ -0,0 +1,102 @@
+"""monthly log partitions
+
+Revision ID: 7c4f1a9d2e58
+Revises: 2a6c8e4f1b37
+Create Date: 2026-10-18 18:41:09.527316
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4f1a9d2e58'
+down_revision: Union[str, Sequence[str], None] = '2a6c8e4f1b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# table -> (column definitions, indexes) of the partitioned replacement
+TABLES = {
+    'audit_logs': (
+        "id integer NOT NULL DEFAULT nextval('audit_logs_id_seq'), "
+        "actor_id integer NOT NULL, board_id integer NOT NULL, action varchar NOT NULL, payload json, "
+        "created_at timestamp without time zone NOT NULL, "
+        "PRIMARY KEY (id, created_at)",
+        ["CREATE INDEX ix_audit_logs_board_id ON audit_logs (board_id)"],
+    ),
+    'activity_feeds': (
+        "id integer NOT NULL DEFAULT nextval('activity_feeds_id_seq'), "
+        "board_id integer NOT NULL, message varchar NOT NULL, actor_id integer NOT NULL REFERENCES users (id), "
+        "activity_type varchar NOT NULL, metadata_info json, "
+        "created_at timestamp without time zone NOT NULL DEFAULT now(), "
+        "PRIMARY KEY (id, created_at)",
+        ["CREATE INDEX ix_activity_feeds_board_created_id ON activity_feeds (board_id, created_at, id)"],
+    ),
+}
+OLD_INDEXES = {
+    'audit_logs': ['audit_logs_pkey', 'ix_audit_logs_board_id'],
+    'activity_feeds': ['activity_feeds_pkey', 'ix_activity_feeds_board_created_id'],
+}
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # range partitioning is Postgres only; elsewhere retention falls back to DELETE
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    now = datetime.now()
+    for table, (columns, indexes) in TABLES.items():
+        # the sequence must outlive the table it was created for
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        for index in OLD_INDEXES[table]:
+            op.execute(f"ALTER INDEX {index} RENAME TO {index}_unpartitioned")
+        op.execute(f"CREATE TABLE {table} ({columns}) PARTITION BY RANGE (created_at)")
+        for statement in indexes:
+            op.execute(statement)
+
+        # created_at becomes the partition key and part of the primary key
+        op.execute(f"UPDATE {table}_unpartitioned SET created_at = now() WHERE created_at IS NULL")
+        oldest = op.get_bind().scalar(sa.text(f"SELECT min(created_at) FROM {table}_unpartitioned")) or now
+        month = datetime(oldest.year, oldest.month, 1)
+        last = _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+        while month <= last:
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+            )
+            month = _add_months(month, 1)
+        # catches rows beyond the newest monthly partition if partition maintenance stops running
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned")
+        op.execute(f"DROP TABLE {table}_unpartitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, (columns, indexes) in TABLES.items():
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        for index in OLD_INDEXES[table]:
+            op.execute(f"ALTER INDEX {index} RENAME TO {index}_partitioned")
+        plain = columns.replace("PRIMARY KEY (id, created_at)", f"CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        op.execute(f"CREATE TABLE {table} ({plain})")
+        for statement in indexes:
+            op.execute(statement)
+        op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned")
+        op.execute(f"DROP TABLE {table}_partitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
@@ -0,0 +1,35 @@
+"""board members composite indexes
+
+Revision ID: 8d4e2f6a1c93
+Revises: 3c1a9e5d7b20
+Create Date: 2026-10-18 10:03:51.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4e2f6a1c93'
+down_revision: Union[str, Sequence[str], None] = '3c1a9e5d7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # keep the oldest row of any duplicate membership so the unique index can be built
+    op.execute(
+        "DELETE FROM board_members WHERE id NOT IN "
+        "(SELECT MIN(id) FROM board_members GROUP BY board_id, user_id)"
+    )
+    op.create_index('uq_board_members_board_user', 'board_members', ['board_id', 'user_id'], unique=True)
+    op.create_index('ix_board_members_user_board_role', 'board_members', ['user_id', 'board_id', 'role'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_board_members_user_board_role', table_name='board_members')
+    op.drop_index('uq_board_members_board_user', table_name='board_members')
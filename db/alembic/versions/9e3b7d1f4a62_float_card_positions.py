@@ -0,0 +1,39 @@
+"""float card positions
+
+Revision ID: 9e3b7d1f4a62
+Revises: 5b7f0c2e9a41
+Create Date: 2026-10-18 14:05:12.418736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3b7d1f4a62'
+down_revision: Union[str, Sequence[str], None] = '5b7f0c2e9a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_cards_board_position is rebuilt with the column and keeps serving ordered reads
+    with op.batch_alter_table('cards') as batch_op:
+        batch_op.alter_column('position',
+                              existing_type=sa.Numeric(precision=10, scale=2),
+                              type_=sa.Float(),
+                              existing_nullable=False,
+                              postgresql_using='position::double precision')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('cards') as batch_op:
+        batch_op.alter_column('position',
+                              existing_type=sa.Float(),
+                              type_=sa.Numeric(precision=10, scale=2),
+                              existing_nullable=False,
+                              postgresql_using='position::numeric(10,2)')
@@ -1,13 +1,87 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool,QueuePool
+from sqlalchemy.ext.asyncio import create_async_engine,async_sessionmaker
+from utils.metrics import register_metrics
 
 current_path=os.path.dirname(os.path.realpath(__file__))
 
 database_url=os.getenv("DATABASE_URL",f"sqlite:///{current_path}/database.db")
 
-engine=create_engine(database_url,echo=True)
+# ASYNC_DB=1 serves requests from an AsyncSession (asyncpg / aiosqlite) instead of the blocking SessionLocal
+ASYNC_DB=os.getenv("ASYNC_DB","0")=="1"
+
+DB_ECHO=os.getenv("DB_ECHO","0")=="1"
+# PgBouncer in transaction mode owns the pooling: no client-side pool and no server-side prepared statements
+DB_PGBOUNCER=os.getenv("DB_PGBOUNCER","0")=="1"
+
+
+def pool_setting(role:str,name:str,default):
+    """DB_<ROLE>_<NAME> overrides DB_<NAME>, e.g. DB_WORKER_POOL_SIZE over DB_POOL_SIZE."""
+    return os.getenv(f"DB_{role.upper()}_{name}",os.getenv(f"DB_{name}",default))
+
+
+def engine_options(role:str):
+    options={"echo":DB_ECHO}
+    if make_url(database_url).get_backend_name()=="sqlite":
+        return options
+    if DB_PGBOUNCER:
+        options["poolclass"]=NullPool
+        return options
+    options.update(
+        pool_size=int(pool_setting(role,"POOL_SIZE",5)),
+        max_overflow=int(pool_setting(role,"MAX_OVERFLOW",10)),
+        pool_timeout=float(pool_setting(role,"POOL_TIMEOUT",30)),
+        pool_recycle=int(pool_setting(role,"POOL_RECYCLE",1800)),
+        pool_pre_ping=pool_setting(role,"POOL_PRE_PING","1")=="1",
+    )
+    return options
+
+
+def to_async_url(url):
+    url=make_url(url)
+    if url.drivername.startswith("postgresql"):
+        url=url.set(drivername="postgresql+asyncpg")
+        if DB_PGBOUNCER:
+            url=url.update_query_dict({"prepared_statement_cache_size":"0"})
+        return url
+    if url.drivername.startswith("sqlite"):
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+
+# one pool per process role so a burst on one path cannot starve the others
+engine=create_engine(database_url,**engine_options("api"))
+worker_engine=create_engine(database_url,**engine_options("worker"))
+ws_engine=create_engine(database_url,**engine_options("ws"))
 
 SessionLocal=sessionmaker(bind=engine)
+WorkerSessionLocal=sessionmaker(bind=worker_engine)
+WsSessionLocal=sessionmaker(bind=ws_engine)
+
+async_engine=None
+if ASYNC_DB:
+    async_options=engine_options("api")
+    if DB_PGBOUNCER and make_url(database_url).get_backend_name()=="postgresql":
+        async_options["connect_args"]={"statement_cache_size":0}
+    async_engine=create_async_engine(to_async_url(database_url),**async_options)
+
+AsyncSessionLocal=async_sessionmaker(bind=async_engine) if ASYNC_DB else None
+
+
+def pool_stats():
+    engines={"api":engine,"worker":worker_engine,"ws":ws_engine}
+    if async_engine is not None:
+        engines["api_async"]=async_engine.sync_engine
+    stats={}
+    for role,pooled_engine in engines.items():
+        pool=pooled_engine.pool
+        stats[role]={"pool":type(pool).__name__}
+        if isinstance(pool,QueuePool):
+            stats[role].update(size=pool.size(),checked_in=pool.checkedin(),checked_out=pool.checkedout(),overflow=pool.overflow())
+    return stats
 
 
+register_metrics("db_pools",pool_stats)
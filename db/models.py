@@ -1,5 +1,5 @@
 from sqlalchemy.orm import declarative_base,relationship
-from sqlalchemy import Column,Integer,DateTime,func,String,ForeignKey,Enum,Index,Text,Numeric,Boolean,JSON
+from sqlalchemy import Column,Integer,DateTime,func,String,ForeignKey,Enum,Index,Text,Numeric,Boolean,JSON,Float,DDL,event
 import enum
 
 from datetime import datetime
@@ -25,9 +25,11 @@ class Board(Base):
     id=Column(Integer,primary_key=True)
     name=Column(String,nullable=False)
     description=Column(Text,nullable=True)
-    created_at=Column(DateTime,default=datetime.now())
+    created_at=Column(DateTime,default=datetime.now)
     created_by=Column(Integer,ForeignKey("users.id"),nullable=False)
-    updated_at=Column(DateTime,onupdate=datetime.now(),default=datetime.now())
+    updated_at=Column(DateTime,onupdate=datetime.now,default=datetime.now)
+    # bumped by every command touching the board or its cards and members; served as the ETag
+    version=Column(Integer,nullable=False,default=1,server_default="1")
     members=relationship("BoardMembers",back_populates="board",cascade="all,delete-orphan",passive_deletes=True)
 
 
@@ -59,15 +61,16 @@ class Card(Base):
     is_complete=Column(Boolean,default=False)
     
     board_id = Column(Integer, ForeignKey("boards.id"), nullable=False, index=True)
-    position = Column(Numeric(10, 2), nullable=False)
+    # sparse float keys (see utils/ordering_utils.py): a move rewrites only the moved card
+    position = Column(Float, nullable=False)
     
     
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
-    created_at = Column(DateTime(timezone=True), default=datetime.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
     updated_at = Column(
         DateTime(timezone=True),
-        default=datetime.now(),
-        onupdate=datetime.now(),
+        default=datetime.now,
+        onupdate=datetime.now,
         nullable=False,
     )
 
@@ -78,10 +81,14 @@ class AuditAction:
     CARD_CREATED="CARD_CREATED"
     CARD_UPDATED="CARD_UPDATED"
     CARD_DELETED="CARD_DELETED"
+    CARD_MOVED="CARD_MOVED"
+    CARDS_BATCH="CARDS_BATCH"
+    BOARD_IMPORTED="BOARD_IMPORTED"
     MEMBER_ADDED="MEMBER_ADDED"
     MEMBER_REMOVED="MEMBER_REMOVED"
     MEMBER_ROLE_CHANGED="MEMBER_ROLE_CHANGED"
 
+# monthly range partitions on Postgres, managed by utils.partition_utils
 class AuditLog(Base):
     __tablename__="audit_logs"
     id=Column(Integer,primary_key=True)
@@ -90,21 +97,62 @@ class AuditLog(Base):
     action=Column(String,nullable=False)
     payload=Column(JSON,nullable=True)
     created_at=Column(DateTime,default=datetime.now,nullable=False)
+    # the outbox row id; with created_at (the partition key) it makes replayed events a no-op
+    event_id=Column(Integer,nullable=True)
 
 class ActivityFeed(Base):
     __tablename__="activity_feeds"
     id=Column(Integer,primary_key=True)
-    board_id=Column(Integer,index=True,nullable=False)
+    board_id=Column(Integer,nullable=False)
     message=Column(String,nullable=False)
     actor_id=Column(Integer,ForeignKey("users.id"),nullable=False)
     activity_type=Column(String,nullable=False)
     metadata_info=Column(JSON,nullable=True)
-    created_at=Column(DateTime,default=datetime.now)
+    # the monthly partition key on Postgres, where the primary key is (id, created_at)
+    created_at=Column(DateTime,default=datetime.now,nullable=False)
+
+
 
+# written in the same transaction as the change it describes, relayed to the activity pipeline by tasks.outbox_relay
+class OutboxEvent(Base):
+    __tablename__="outbox_events"
+    id=Column(Integer,primary_key=True)
+    actor_id=Column(Integer,nullable=False)
+    board_id=Column(Integer,nullable=False)
+    action=Column(String,nullable=False)
+    payload=Column(JSON,nullable=True)
+    created_at=Column(DateTime,default=datetime.now,nullable=False)
 
 
 
 
 Index("ix_cards_board_position", Card.board_id, Card.position)
 Index("ix_boards_owner_id", Board.created_by)
-
+Index("uq_board_members_board_user", BoardMembers.board_id, BoardMembers.user_id, unique=True)
+Index("ix_board_members_user_board_role", BoardMembers.user_id, BoardMembers.board_id, BoardMembers.role)
+Index("ix_activity_feeds_board_created_id", ActivityFeed.board_id, ActivityFeed.created_at, ActivityFeed.id)
+Index("uq_audit_logs_event_created", AuditLog.event_id, AuditLog.created_at, unique=True)
+
+
+# card full-text search, outside the mapped columns: a generated tsvector with a GIN index on Postgres,
+# an external-content FTS5 index kept in step by triggers on SQLite (see queries.handlers.SearchQueryHandler)
+CARD_SEARCH_DDL={
+    "postgresql":[
+        "ALTER TABLE cards ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+        "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_cards_search_vector ON cards USING gin (search_vector)",
+    ],
+    "sqlite":[
+        "CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(title, description, content='cards', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN "
+        "INSERT INTO cards_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN "
+        "INSERT INTO cards_fts(cards_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS cards_fts_update AFTER UPDATE OF title, description ON cards BEGIN "
+        "INSERT INTO cards_fts(cards_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO cards_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    ],
+}
+for dialect,statements in CARD_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Card.__table__,"after_create",DDL(statement).execute_if(dialect=dialect))
@@ -6,9 +6,13 @@ from routers.auth import router as auth_router
 from routers.boards import router as boards_router
 from routers.cards import router as cards_router
 from routers.sockets import router as ws_router
+from routers.metrics import router as metrics_router
+from routers.search import router as search_router
 import asyncio
 from utils.connection_manager import manager
-from utils.feed_utils import activity_feed_dispatcher,redis_listener
+from utils.feed_utils import activity_feed_dispatcher,redis_listener,redis_stream_listener
+from utils.redis_utils import EVENT_TRANSPORT,require_instance_id
+from utils.password_hashing import password_hasher
 from db.init_db import init_db
 
 templates = Jinja2Templates(directory="templates")
@@ -17,8 +21,10 @@ templates = Jinja2Templates(directory="templates")
 
 @asynccontextmanager
 async def lifespan(app:FastAPI):
+    require_instance_id()
     init_db()
-    redis_task = asyncio.create_task(redis_listener(manager))
+    listener = redis_stream_listener if EVENT_TRANSPORT == "streams" else redis_listener
+    redis_task = asyncio.create_task(listener(manager))
     yield
     
     redis_task.cancel()
@@ -26,6 +32,7 @@ async def lifespan(app:FastAPI):
         await redis_task
     except asyncio.CancelledError:
         pass
+    password_hasher.shutdown()
 
 
 app=FastAPI(lifespan=lifespan)
@@ -38,5 +45,7 @@ app.include_router(auth_router)
 app.include_router(boards_router)
 app.include_router(cards_router)
 app.include_router(ws_router)
+app.include_router(metrics_router)
+app.include_router(search_router)
 
 
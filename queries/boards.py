@@ -9,8 +9,11 @@ class ListBoardsQuery:
 
 
 class ListAccessibleBoardsQuery:
-    def __init__(self,user_id:int):
+    def __init__(self,user_id:int,cursor=None,limit:int=50,order:str="desc"):
         self.user_id=user_id
+        self.cursor=cursor
+        self.limit=limit
+        self.order=order
 
 class ActivityFeedQuery:
     def __init__(self,board_id:int,user_id:int):
@@ -1,4 +1,7 @@
 class ActivityFeedQuery:
-    def __init__(self,board_id,user_id):
+    def __init__(self,board_id,user_id,before=None,after=None,limit=50):
         self.board_id=board_id
-        self.user_id=user_id
\ No newline at end of file
+        self.user_id=user_id
+        self.before=before
+        self.after=after
+        self.limit=limit
\ No newline at end of file
@@ -1,10 +1,19 @@
 from queries.boards import GetBoardQuery,ListBoardsQuery,ListAccessibleBoardsQuery,ActivityFeedQuery
 from queries.cards import ListCardQuery,GetCardQuery
 from queries.feed import ActivityFeedQuery
+from queries.search import SearchCardsQuery
 from fastapi import HTTPException,status
 from utils.permission_utils import BoardPermissionService
 from db.models import Board,Card,BoardMembers,BoardRole,ActivityFeed
-from sqlalchemy import select
+import re
+from sqlalchemy import select,tuple_,func,literal_column,cast,Double,table,column
+from utils.db_utils import AsyncHandler
+from utils.pagination_utils import encode_cursor,decode_datetime_cursor,decode_rank_cursor,MAX_PAGE_SIZE
+
+# the CardOut fields, in order
+CARD_COLUMNS=(Card.id,Card.title,Card.description,Card.is_complete,Card.board_id,Card.position,Card.created_by,Card.created_at,Card.updated_at)
+# the SQLite full-text index (db.models.CARD_SEARCH_DDL), rowid == cards.id
+CARDS_FTS=table("cards_fts",column("rowid"))
 
 class ActivityQueryHandler:
     def __init__(self,db):
@@ -16,16 +25,35 @@ class ActivityQueryHandler:
         
     def _list_activity_feed(self,query:ActivityFeedQuery):
             BoardPermissionService.require_member(db=self.db,board_id=query.board_id,user_id=query.user_id)
+            if query.before and query.after:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="before and after cannot be combined")
+            limit=min(query.limit,MAX_PAGE_SIZE)
             stmt = (
             select(
+            ActivityFeed.id,
             ActivityFeed.actor_id,
             ActivityFeed.message,
             ActivityFeed.activity_type,
             ActivityFeed.created_at,
             ActivityFeed.metadata_info,
-            ).where(ActivityFeed.board_id == query.board_id).order_by(ActivityFeed.created_at.desc()))
-            result = self.db.execute(stmt).mappings().all()
-            return result
+            ).where(ActivityFeed.board_id == query.board_id))
+
+            # keyset on (created_at, id) so every page is an index range scan on ix_activity_feeds_board_created_id
+            key=tuple_(ActivityFeed.created_at,ActivityFeed.id)
+            if query.after:
+                stmt=stmt.where(key>tuple_(*decode_datetime_cursor(query.after))).order_by(ActivityFeed.created_at.asc(),ActivityFeed.id.asc())
+            else:
+                if query.before:
+                    stmt=stmt.where(key<tuple_(*decode_datetime_cursor(query.before)))
+                stmt=stmt.order_by(ActivityFeed.created_at.desc(),ActivityFeed.id.desc())
+
+            rows = self.db.execute(stmt.limit(limit+1)).mappings().all()
+            has_more=len(rows)>limit
+            rows=rows[:limit]
+            next_cursor=encode_cursor(rows[-1]["created_at"],rows[-1]["id"]) if has_more else None
+            if query.after:
+                rows=rows[::-1]
+            return {"items":rows,"next_cursor":next_cursor}
 
 
 class BoardQueryHandler:
@@ -73,20 +101,39 @@ class BoardQueryHandler:
         ]
     
     def _list_accessible_boards(self,query:ListAccessibleBoardsQuery):
-        boards = (self.db.query(Board).join(BoardMembers,Board.created_by==BoardMembers.board_id).filter(BoardMembers.user_id==query.user_id).all())
-        if not boards:
-            raise HTTPException(404,"Boards not found")
-        return [
-            {
-                "id": board.id,
-                "name": board.name,
-                "description": board.description,
-                "created_by": board.created_by,
-                "created_at": board.created_at,
-                "updated_at": board.updated_at,
-            }
-            for board in boards
-        ]
+        limit=min(query.limit,MAX_PAGE_SIZE)
+        card_count=(select(func.count(Card.id)).where(Card.board_id==Board.id).correlate(Board).scalar_subquery())
+        # driven by ix_board_members_user_board_role: the user's memberships first, then their boards by primary key
+        stmt=(
+            select(
+                Board.id,
+                Board.name,
+                Board.description,
+                Board.created_by,
+                Board.created_at,
+                Board.updated_at,
+                BoardMembers.role,
+                card_count.label("card_count"),
+            )
+            .select_from(BoardMembers)
+            .join(Board,Board.id==BoardMembers.board_id)
+            .where(BoardMembers.user_id==query.user_id)
+        )
+        key=tuple_(Board.updated_at,Board.id)
+        if query.order=="asc":
+            if query.cursor:
+                stmt=stmt.where(key>tuple_(*decode_datetime_cursor(query.cursor)))
+            stmt=stmt.order_by(Board.updated_at.asc(),Board.id.asc())
+        else:
+            if query.cursor:
+                stmt=stmt.where(key<tuple_(*decode_datetime_cursor(query.cursor)))
+            stmt=stmt.order_by(Board.updated_at.desc(),Board.id.desc())
+
+        rows=self.db.execute(stmt.limit(limit+1)).mappings().all()
+        has_more=len(rows)>limit
+        rows=rows[:limit]
+        next_cursor=encode_cursor(rows[-1]["updated_at"],rows[-1]["id"]) if has_more else None
+        return {"items":rows,"next_cursor":next_cursor}
     
     def _list_activity_feed(self,query:ActivityFeedQuery):
         BoardPermissionService.require_member(db=self.db,board_id=query.board_id,user_id=query.user_id)
@@ -154,30 +201,75 @@ class CardQueryHandler:
             detail="Board not found"
             )
 
-    # 2. Fetch cards
-        cards = (
-        self.db.query(Card)
-        .filter(
-            Card.board_id == query.board_id
-            
+    # 2. Fetch cards: plain column tuples, no ORM identity map or object per card
+        rows=self.db.execute(select(*CARD_COLUMNS).where(Card.board_id==query.board_id).order_by(Card.position)).all()
+
+    # 3. Empty list is valid
+        return [row._asdict() for row in rows]
+
+
+class SearchQueryHandler:
+    def __init__(self,db):
+        self.db=db
+
+    def handle(self,query):
+        if isinstance(query,SearchCardsQuery):
+            return self._search_cards(query)
+
+    def _ranked(self,text:str,user_id:int):
+        """Cards on the user's boards matching `text` plus a `rank` column, higher is better; None if nothing can match."""
+        stmt=(
+            select(*CARD_COLUMNS)
+            .select_from(BoardMembers)
+            .join(Card,Card.board_id==BoardMembers.board_id)
+            .where(BoardMembers.user_id==user_id)
         )
-        .order_by(Card.position)
-        .all()
+        if self.db.get_bind().dialect.name=="postgresql":
+            tsquery=func.websearch_to_tsquery("english",text)
+            vector=literal_column("cards.search_vector")
+            # double precision: a real rank would not survive the round trip through the cursor exactly
+            return stmt.add_columns(cast(func.ts_rank_cd(vector,tsquery),Double).label("rank")).where(vector.op("@@")(tsquery))
+        # every word must match; quoting keeps FTS5 operators in user input literal
+        words=re.findall(r"\w+",text)
+        if not words:
+            return None
+        fts=literal_column("cards_fts")
+        return (
+            stmt.add_columns((-func.bm25(fts,10.0,1.0)).label("rank"))
+            .join(CARDS_FTS,CARDS_FTS.c.rowid==Card.id)
+            .where(fts.op("MATCH")(" ".join(f'"{word}"' for word in words)))
         )
 
-    # 3. Empty list is valid
-        return [
-            {
-                "id": card.id,
-                "title": card.title,
-                "description": card.description,
-                "is_complete": card.is_complete,
-                "board_id": card.board_id,
-                "position": card.position,
-                "created_by": card.created_by,
-                "created_at": card.created_at,
-                "updated_at": card.updated_at,
-            }
-            for card in cards
-        ]
+    def _search_cards(self,query:SearchCardsQuery):
+        limit=min(query.limit,MAX_PAGE_SIZE)
+        stmt=self._ranked(query.q,query.user_id)
+        if stmt is None:
+            return {"items":[],"next_cursor":None}
+        ranked=stmt.subquery()
+        # keyset on (rank, id): the rank is computed per row, so it is filtered outside the ranking query
+        page=select(ranked)
+        if query.cursor:
+            page=page.where(tuple_(ranked.c.rank,ranked.c.id)<tuple_(*decode_rank_cursor(query.cursor)))
+        page=page.order_by(ranked.c.rank.desc(),ranked.c.id.desc())
+
+        rows=self.db.execute(page.limit(limit+1)).all()
+        has_more=len(rows)>limit
+        rows=rows[:limit]
+        next_cursor=encode_cursor(rows[-1].rank,rows[-1].id) if has_more else None
+        return {"items":[row._asdict() for row in rows],"next_cursor":next_cursor}
+
+
+class AsyncSearchQueryHandler(AsyncHandler):
+    handler_class=SearchQueryHandler
+
+
+class AsyncActivityQueryHandler(AsyncHandler):
+    handler_class=ActivityQueryHandler
+
+
+class AsyncBoardQueryHandler(AsyncHandler):
+    handler_class=BoardQueryHandler
+
 
+class AsyncCardQueryHandler(AsyncHandler):
+    handler_class=CardQueryHandler
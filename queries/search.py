@@ -0,0 +1,6 @@
+class SearchCardsQuery:
+    def __init__(self,user_id:int,q:str,cursor=None,limit:int=50):
+        self.user_id=user_id
+        self.q=q
+        self.cursor=cursor
+        self.limit=limit
@@ -6,7 +6,10 @@ from fastapi import APIRouter,status,Depends,HTTPException,Security
 from fastapi.security import OAuth2PasswordRequestForm
 from schemas.auth_schemas import UserOut,UserCreate,Token,UserOut,UserLogin
 from sqlalchemy.orm import Session
-from utils.auth_utils import verify_password,get_db,get_user_by_email,authenticate_user,get_password_hash,decode_access_token,create_access_token,ACCESS_TOKEN_EXPIRY_DURATION,get_current_user
+from utils.auth_utils import verify_password,get_db,get_user_by_email,authenticate_user,authenticate,create_user,get_password_hash,decode_access_token,create_access_token,ACCESS_TOKEN_EXPIRY_DURATION,get_current_user_record
+from utils.db_utils import run_db
+from utils.password_hashing import password_hasher
+from starlette.concurrency import run_in_threadpool
 from db.models import User
 
 
@@ -21,20 +24,17 @@ router=APIRouter(prefix="/auth",tags=["auth"])
 
 
 @router.post('/register',response_model=UserOut,status_code=status.HTTP_201_CREATED)
-def register(user_in:UserCreate,db:Session=Depends(get_db)):
-    user=get_user_by_email(db,user_in.email)
+async def register(user_in:UserCreate,db:Session=Depends(get_db)):
+    user=await run_db(db,get_user_by_email,user_in.email)
     if user:
         raise HTTPException(status_code=400,detail="Email already registered")
-    hashed=get_password_hash(user_in.password)
-    user=User(email=user_in.email,name=user_in.name,password_hash=hashed)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    hashed=await password_hasher.hash(user_in.password)
+    user=await run_db(db,create_user,user_in.email,user_in.name,hashed)
     return user
 
 @router.post('/token',response_model=Token)
-def login_for_access_token(form_data:OAuth2PasswordRequestForm=Depends(),db:Session=Depends(get_db)):
-    user=authenticate_user(db,form_data.username,form_data.password)
+async def login_for_access_token(form_data:OAuth2PasswordRequestForm=Depends(),db:Session=Depends(get_db)):
+    user=await authenticate(db,form_data.username,form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="couldn't validate credentials")
     expires=timedelta(minutes=ACCESS_TOKEN_EXPIRY_DURATION)
@@ -43,8 +43,8 @@ def login_for_access_token(form_data:OAuth2PasswordRequestForm=Depends(),db:Sess
     return {"access_token":access_token,"token_type":"Bearer"}
 
 @router.post("/token_json",response_model=Token)
-def get_access_token_json(user_in:UserLogin,db:Session=Depends(get_db)):
-    user=authenticate_user(db,user_in.email,user_in.password)
+async def get_access_token_json(user_in:UserLogin,db:Session=Depends(get_db)):
+    user=await authenticate(db,user_in.email,user_in.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="couldn't validate credentials")
     expires=timedelta(minutes=ACCESS_TOKEN_EXPIRY_DURATION)
@@ -57,7 +57,7 @@ def get_access_token_json(user_in:UserLogin,db:Session=Depends(get_db)):
 
 
 @router.get("/me",response_model=UserOut)
-def read_own_profile(current_user:User=Depends(get_current_user)):
+async def read_own_profile(current_user:User=Depends(get_current_user_record)):
     return current_user
 
 
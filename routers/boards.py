@@ -1,71 +1,106 @@
-from routers.auth import get_current_user
-from schemas.boards_schemas import BoardCreate,BoardOut,BoardUpdate,DeleteBoardResponse,AddMemberModel,UpdateMemberModel,BoardMemberResponse
+from schemas.boards_schemas import BoardCreate,BoardOut,BoardListPage,BoardImportResult,BoardUpdate,DeleteBoardResponse,AddMemberModel,UpdateMemberModel,BoardMemberResponse
 from commands.boards import CreateBoardCommand,UpdateBoardCommand,DeleteBoardCommand,AddBoardMemberCommand,UpdateBoardMemberRoleCommand,RemoveBoardMemberCommand
 from queries.boards import GetBoardQuery,ListBoardsQuery,ListAccessibleBoardsQuery
 from queries.feed import ActivityFeedQuery
-from queries.handlers import BoardQueryHandler,ActivityQueryHandler
-from commands.handlers import BoardCommandHandler,BoardMemberHandler
+from queries.handlers import AsyncBoardQueryHandler,AsyncActivityQueryHandler
+from commands.handlers import AsyncBoardCommandHandler,AsyncBoardMemberHandler
 from sqlalchemy.orm import Session
 from db.models import User,Board,BoardMembers
-from utils.auth_utils import get_current_user,get_db
-from fastapi import APIRouter,Depends,HTTPException
+from utils.auth_utils import get_current_user,get_db,Principal
+from schemas.feed_schemas import ActivityFeedPage
+from utils.pagination_utils import DEFAULT_PAGE_SIZE,MAX_PAGE_SIZE
+from fastapi import APIRouter,Depends,HTTPException,Query,Request,Response,Header
+from fastapi.responses import StreamingResponse
+from utils.version_utils import check_board_etag
+from utils.permission_utils import BoardPermissionService
+from utils.db_utils import run_db
+from utils import export_utils
+from utils.import_utils import BoardImporter,iter_lines
+from utils.serialization_utils import fast_response
+from typing import Optional,Literal
 
 router=APIRouter(tags=["boards"])
 
 @router.post('/boards',response_model=BoardOut)
-def create_board(board_data:BoardCreate,current_user:User=Depends(get_current_user),db:Session=Depends(get_db)):
+async def create_board(board_data:BoardCreate,current_user:Principal=Depends(get_current_user),db:Session=Depends(get_db)):
     command=CreateBoardCommand(name=board_data.name,description=board_data.description,user_id=current_user.id)
-    return BoardCommandHandler(db).handle(command)
-
+    return await AsyncBoardCommandHandler(db).handle(command)
+
+
+@router.post("/boards/import",response_model=BoardImportResult)
+async def import_boards(request:Request,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    """Import an NDJSON body of board and card records (see BoardImporter) in one transaction."""
+    importer=BoardImporter(current_user.id)
+    lines=[]
+    try:
+        async for line in iter_lines(request.stream()):
+            lines.append(line)
+            if len(lines)>=importer.chunk_rows:
+                await run_db(db,importer.add_lines,lines)
+                lines=[]
+        await run_db(db,importer.add_lines,lines)
+        return await run_db(db,importer.finish)
+    except Exception:
+        await run_db(db,lambda session:session.rollback())
+        raise
 
 @router.get("/boards/{id}",response_model=BoardOut)
-def get_board(id:int,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def get_board(id:int,response:Response,if_none_match:Optional[str]=Header(None),db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    etag,not_modified=await check_board_etag(db,id,current_user.id,if_none_match)
+    if not_modified:
+        return Response(status_code=304,headers={"ETag":etag})
     query=GetBoardQuery(id,current_user.id)
-    return BoardQueryHandler(db).handle(query)
+    board=await AsyncBoardQueryHandler(db).handle(query)
+    if etag:
+        response.headers["ETag"]=etag
+    return board
 
-@router.get("/boards")
-def list_boards(db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
-    query=ListAccessibleBoardsQuery(current_user.id)
-    return BoardQueryHandler(db).handle(query)
+@router.get("/boards",response_model=BoardListPage)
+async def list_boards(cursor:Optional[str]=None,limit:int=Query(DEFAULT_PAGE_SIZE,ge=1,le=MAX_PAGE_SIZE),order:Literal["desc","asc"]="desc",db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    query=ListAccessibleBoardsQuery(current_user.id,cursor=cursor,limit=limit,order=order)
+    return fast_response(await AsyncBoardQueryHandler(db).handle(query),BoardListPage)
 
 @router.patch("/boards/{id}",response_model=BoardOut)
-def update_board(id:int,board_update:BoardUpdate,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def update_board(id:int,board_update:BoardUpdate,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=UpdateBoardCommand(name=board_update.name,description=board_update.description,user_id=current_user.id,board_id=id)
-    return BoardCommandHandler(db).handle(command)
+    return await AsyncBoardCommandHandler(db).handle(command)
 
 @router.delete("/boards/{id}")
-def delete_board(id:int,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def delete_board(id:int,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=DeleteBoardCommand(board_id=id,user_id=current_user.id)
-    BoardCommandHandler(db).handle(command)
+    await AsyncBoardCommandHandler(db).handle(command)
     return {"message": "Board deleted successfully"}
     
 @router.post("/boards/{board_id}/members",response_model=BoardMemberResponse)
-def add_member(board_id:int,payload:AddMemberModel,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def add_member(board_id:int,payload:AddMemberModel,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=AddBoardMemberCommand(board_id=board_id,owner_id=current_user.id,target_user_id=payload.user_id,role=payload.role)
-    return BoardMemberHandler(db).handle(command)
+    return await AsyncBoardMemberHandler(db).handle(command)
 
 @router.patch('/boards/{board_id}/members/{user_id}',response_model=BoardMemberResponse)
-def change_role(board_id:int,user_id:int,payload:UpdateMemberModel,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def change_role(board_id:int,user_id:int,payload:UpdateMemberModel,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=UpdateBoardMemberRoleCommand(board_id=board_id,owner_id=current_user.id,target_user_id=user_id,new_role=payload.role)
-    return BoardMemberHandler(db).handle(command)
+    return await AsyncBoardMemberHandler(db).handle(command)
 
 @router.delete("/boards/{board_id}/members/{user_id}")
-def remove_member(board_id:int,user_id:int,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def remove_member(board_id:int,user_id:int,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=RemoveBoardMemberCommand(board_id=board_id,owner_id=current_user.id,target_user_id=user_id)
-    BoardMemberHandler(db).handle(command)
+    await AsyncBoardMemberHandler(db).handle(command)
     return {"message":"member removed"}
 
-@router.get("/boards/{board_id}/feed")
-def get_activity_feed(board_id:int,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
-    query=ActivityFeedQuery(board_id=board_id,user_id=current_user.id)
-    return ActivityQueryHandler(db).handle(query)
-
-
-    
-
-
-
-
+@router.get("/boards/{board_id}/feed",response_model=ActivityFeedPage)
+async def get_activity_feed(board_id:int,before:Optional[str]=None,after:Optional[str]=None,limit:int=Query(DEFAULT_PAGE_SIZE,ge=1,le=MAX_PAGE_SIZE),db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    query=ActivityFeedQuery(board_id=board_id,user_id=current_user.id,before=before,after=after,limit=limit)
+    return fast_response(await AsyncActivityQueryHandler(db).handle(query),ActivityFeedPage)
 
 
+EXPORT_MEDIA_TYPES={"ndjson":"application/x-ndjson","csv":"text/csv"}
 
+@router.get("/boards/{id}/export")
+async def export_board(id:int,format:Literal["ndjson","csv"]="ndjson",db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    await run_db(db,BoardPermissionService.require_member,id,current_user.id)
+    # a sync generator: Starlette drains it in the threadpool, one chunk of rows at a time
+    return StreamingResponse(
+        export_utils.iter_board_export(id,format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition":f'attachment; filename="board-{id}.{format}"'},
+    )
@@ -1,41 +1,59 @@
-from fastapi import APIRouter,Depends,HTTPException,status
+from fastapi import APIRouter,Depends,HTTPException,status,Response,Header
+from typing import Optional
+from utils.version_utils import check_board_etag
+from utils.card_cache import card_list_cache
 from db.models import User,Board,Card
-from commands.cards import CreateCardCommand,UpdateCardCommand,DeleteCardCommand
-from queries.cards import GetCardQuery,ListCardQuery
-from queries.handlers import CardQueryHandler
-from commands.handlers import CardCommandHandler
-from schemas.card_schemas import CardCreate,CardOut,CardUpdate,DeleteCardResponse
-from utils.auth_utils import get_current_user,get_db
+from commands.cards import CreateCardCommand,UpdateCardCommand,DeleteCardCommand,MoveCardCommand,BatchCardCommand
+from queries.cards import GetCardQuery
+from queries.handlers import AsyncCardQueryHandler
+from commands.handlers import AsyncCardCommandHandler
+from schemas.card_schemas import CardCreate,CardOut,CardUpdate,CardMove,CardBatch,CardBatchResult,DeleteCardResponse
+from utils.auth_utils import get_current_user,get_db,Principal
 from sqlalchemy.orm import Session
 router=APIRouter(tags=["cards"])
 
 @router.post("/boards/{id}/cards",response_model=CardOut)
-def create_card(id:int,card_data:CardCreate,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def create_card(id:int,card_data:CardCreate,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=CreateCardCommand(board_id=id,user_id=current_user.id,position=card_data.position,title=card_data.title,description=card_data.description)
-    return CardCommandHandler(db).handle(command)
+    return await AsyncCardCommandHandler(db).handle(command)
  
+@router.post("/boards/{id}/cards:batch",response_model=CardBatchResult)
+async def batch_cards(id:int,batch:CardBatch,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    command=BatchCardCommand(board_id=id,user_id=current_user.id,operations=[operation.model_dump() for operation in batch.operations])
+    return await AsyncCardCommandHandler(db).handle(command)
+
 @router.get("/boards/{id}/cards")
-def get_cards(id:int,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
-    query=ListCardQuery(board_id=id,user_id=current_user.id)
-    return CardQueryHandler(db).handle(query)
+async def get_cards(id:int,if_none_match:Optional[str]=Header(None),db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    etag,not_modified=await check_board_etag(db,id,current_user.id,if_none_match)
+    if not_modified:
+        return Response(status_code=304,headers={"ETag":etag})
+    body=await card_list_cache.get_or_load(db,id,current_user.id)
+    # already serialized by the cache: sent as is, without a second encode
+    return Response(content=body,media_type="application/json",headers={"ETag":etag} if etag else None)
 
 
 @router.get("/boards/{board_id}/cards/{card_id}",response_model=CardOut)
-def get_card_by_id(board_id:int,card_id:int,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def get_card_by_id(board_id:int,card_id:int,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     query=GetCardQuery(id=card_id,board_id=board_id,user_id=current_user.id)
-    return CardQueryHandler(db).handle(query)
+    return await AsyncCardQueryHandler(db).handle(query)
 
 @router.patch("/boards/{board_id}/cards/{card_id}",response_model=CardOut)
-def update_card(board_id:int,card_id:int,card_data:CardUpdate,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def update_card(board_id:int,card_id:int,card_data:CardUpdate,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=UpdateCardCommand(id=card_id,title=card_data.title,description=card_data.description,position=card_data.position,board_id=board_id,user_id=current_user.id)
-    return CardCommandHandler(db).handle(command)
+    return await AsyncCardCommandHandler(db).handle(command)
     
 
 
+@router.post("/boards/{board_id}/cards/{card_id}/move",response_model=CardOut)
+async def move_card(board_id:int,card_id:int,move:CardMove,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    command=MoveCardCommand(id=card_id,board_id=board_id,user_id=current_user.id,after_id=move.after_card_id,before_id=move.before_card_id)
+    return await AsyncCardCommandHandler(db).handle(command)
+
+
 @router.delete("/boards/{board_id}/cards/{card_id}")
-def delete_card(board_id:int,card_id:int,db:Session=Depends(get_db),current_user:User=Depends(get_current_user)):
+async def delete_card(board_id:int,card_id:int,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     command=DeleteCardCommand(id=card_id,board_id=board_id,user_id=current_user.id)
-    CardCommandHandler(db).handle(command)
+    await AsyncCardCommandHandler(db).handle(command)
     return {
         "message":"Card deleted successfully!"
     }
@@ -0,0 +1,18 @@
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter,Header,HTTPException,status
+from utils.metrics import collect_metrics
+
+# unset keeps GET /metrics switched off; scrapers send it in the X-Metrics-Token header
+METRICS_TOKEN=os.getenv("METRICS_TOKEN")
+
+router=APIRouter(tags=["metrics"])
+
+@router.get("/metrics")
+async def get_metrics(x_metrics_token:Optional[str]=Header(None)):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Not Found")
+    if x_metrics_token is None or not hmac.compare_digest(x_metrics_token.encode(),METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="invalid metrics token")
+    return collect_metrics()
@@ -0,0 +1,16 @@
+from fastapi import APIRouter,Depends,Query
+from typing import Optional
+from sqlalchemy.orm import Session
+from queries.search import SearchCardsQuery
+from queries.handlers import AsyncSearchQueryHandler
+from schemas.search_schemas import CardSearchPage
+from utils.auth_utils import get_current_user,get_db,Principal
+from utils.pagination_utils import DEFAULT_PAGE_SIZE,MAX_PAGE_SIZE
+from utils.serialization_utils import fast_response
+
+router=APIRouter(tags=["search"])
+
+@router.get("/search/cards",response_model=CardSearchPage)
+async def search_cards(q:str=Query(...,min_length=1,max_length=200),cursor:Optional[str]=None,limit:int=Query(DEFAULT_PAGE_SIZE,ge=1,le=MAX_PAGE_SIZE),db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
+    query=SearchCardsQuery(user_id=current_user.id,q=q,cursor=cursor,limit=limit)
+    return fast_response(await AsyncSearchQueryHandler(db).handle(query),CardSearchPage)
@@ -1,11 +1,74 @@
+import os
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from utils.auth_utils import decode_access_token
+from utils.auth_utils import authenticate_token
 from utils.permission_utils import BoardPermissionService
 from utils.connection_manager import manager
-from db.database import SessionLocal
+from db.database import WsSessionLocal as SessionLocal
+from utils.db_utils import run_db
+from utils.feed_utils import load_missed_activity
+from utils.json_utils import dumps
 
 router = APIRouter(tags=["sockets"])
 
+WS_MAX_BOARDS = int(os.getenv("WS_MAX_BOARDS", "100"))
+
+
+def parse_id(value) -> int:
+    # bools are ints and floats would truncate, so only ints and numeric strings are ids
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"invalid id: {value!r}")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"invalid id: {value!r}") from None
+
+
+def parse_ids(values) -> list[int]:
+    if not isinstance(values, list):
+        raise ValueError("board_ids must be a list")
+    return [parse_id(value) for value in values]
+
+
+def parse_join(message: dict):
+    """Return (single, requested board ids, last activity id per board), or raise ValueError for a malformed join."""
+    single = "board_ids" not in message
+    if single and "board_id" not in message:
+        raise ValueError("join needs board_id or board_ids")
+    requested = [parse_id(message["board_id"])] if single else parse_ids(message["board_ids"])
+    last_ids = message.get("last_activity_ids") or {}
+    if not isinstance(last_ids, dict):
+        raise ValueError("last_activity_ids must be an object")
+    last_activity_ids = {parse_id(board_id): parse_id(last_id) for board_id, last_id in last_ids.items()}
+    if single and message.get("last_activity_id") is not None:
+        last_activity_ids[requested[0]] = parse_id(message["last_activity_id"])
+    return single, requested, last_activity_ids
+
+
+def parse_leave(message: dict, joined_boards: set[int]) -> set[int]:
+    if "board_ids" in message:
+        return set(parse_ids(message["board_ids"]))
+    if message.get("board_id") is not None:
+        return {parse_id(message["board_id"])}
+    return set(joined_boards)
+
+
+async def replay_missed_activity(board_id: int, ws: WebSocket, last_activity_id: int):
+    # subscribe first: anything committed after the query below is then published to us live
+    await manager.wait_subscribed(board_id)
+    db = SessionLocal()
+    try:
+        frames = await run_db(db, load_missed_activity, board_id, last_activity_id)
+    except Exception as e:
+        print("WS REPLAY FAILED:", e)
+        frames = None
+    finally:
+        db.close()
+
+    if frames is None:
+        frames = [dumps({"type": "resync_required", "board_id": board_id})]
+    print("WS REPLAY → board:", board_id, "frames:", len(frames))
+    await manager.finish_replay(board_id, ws, frames, last_activity_id)
+
 
 @router.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
@@ -21,78 +84,110 @@ async def websocket_endpoint(ws: WebSocket):
         return
 
     try:
-        payload = decode_access_token(token)
-        print("WS AUTH OK → payload:", payload)
+        principal = authenticate_token(token)
+        print("WS AUTH OK → user:", principal.id)
     except Exception as e:
         print("WS AUTH FAILED:", e)
         await ws.close(code=1008)
         return
 
-    user_id = payload["id"]
-    board_id = None
+    user_id = principal.id
+    # ?format=mux: every event frame is sent as [board_id,event] so one socket can serve many boards
+    mux = ws.query_params.get("format") == "mux"
+    joined_boards: set[int] = set()
 
     try:
         while True:
-            message = await ws.receive_json()
+            try:
+                message = await ws.receive_json()
+            except (ValueError, KeyError):
+                # not JSON, or a binary frame
+                await ws.send_json({"type": "error", "message": "messages must be JSON text"})
+                continue
             print("WS MESSAGE RECEIVED:", message)
 
-            if message["type"] == "join":
+            message_type = message.get("type") if isinstance(message, dict) else None
+            if message_type not in ("join", "leave"):
+                print("WS MESSAGE REJECTED → type:", message_type)
+                await ws.send_json({"type": "error", "message": "unknown message type"})
+                continue
+
+            try:
+                if message_type == "join":
+                    single, requested, last_activity_ids = parse_join(message)
+                else:
+                    leaving = parse_leave(message, joined_boards)
+            except ValueError as e:
+                print("WS MESSAGE REJECTED:", e)
+                await ws.send_json({"type": "error", "message": str(e)})
+                continue
+
+            if message_type == "join":
                 print("JOIN REQUEST → user:", user_id)
+                print("JOIN BOARD IDS:", requested)
 
-                if board_id is not None:
-                    print("JOIN REJECTED → already joined")
+                new_boards = [board_id for board_id in dict.fromkeys(requested) if board_id not in joined_boards]
+                if len(joined_boards) + len(new_boards) > WS_MAX_BOARDS:
+                    print("JOIN REJECTED → too many boards")
                     await ws.send_json({
                         "type": "error",
-                        "message": "already joined a board"
+                        "message": f"at most {WS_MAX_BOARDS} boards per connection"
                     })
                     continue
 
-                requested_board_id = int(message["board_id"])
-                print("JOIN BOARD ID:", requested_board_id)
-
-                db = SessionLocal()
-                try:
-                    BoardPermissionService.require_member(
-                        db=db,
-                        board_id=requested_board_id,
-                        user_id=user_id
-                    )
-                    print("BOARD PERMISSION OK")
-                except Exception as e:
-                    print("BOARD PERMISSION FAILED:", e)
+                allowed = set()
+                if new_boards:
+                    db = SessionLocal()
+                    try:
+                        allowed = await run_db(
+                            db,
+                            BoardPermissionService.member_boards,
+                            new_boards,
+                            user_id
+                        )
+                    except Exception as e:
+                        print("BOARD PERMISSION FAILED:", e)
+                    finally:
+                        db.close()
+
+                denied = [board_id for board_id in new_boards if board_id not in allowed]
+                if denied:
+                    print("BOARD PERMISSION FAILED:", denied)
                     await ws.send_json({
                         "type": "error",
-                        "message": "unauthorized board access"
+                        "message": "unauthorized board access",
+                        "board_ids": denied
                     })
-                    continue
-                finally:
-                    db.close()
 
-                board_id = requested_board_id
-                await manager.connect(board_id, ws)
+                added = [board_id for board_id in new_boards if board_id in allowed]
+                for board_id in added:
+                    # a resuming client gets live frames only after the replay, so nothing arrives twice or out of order
+                    await manager.connect(board_id, ws, replay=board_id in last_activity_ids, mux=mux)
+                    joined_boards.add(board_id)
+                print("WS JOINED → boards:", added, "total:", len(joined_boards))
 
-                print(
-                    "WS JOINED → board:", board_id,
-                    "connections:",
-                    len(manager.active_connections.get(board_id, []))
-                )
+                confirmed = [board_id for board_id in requested if board_id in joined_boards]
+                if not single:
+                    await ws.send_json({"type": "joined", "board_ids": confirmed})
+                elif confirmed:
+                    await ws.send_json({"type": "joined", "board_id": confirmed[0]})
 
-                await ws.send_json({
-                    "type": "joined",
-                    "board_id": board_id
-                })
+                for board_id in added:
+                    if board_id in last_activity_ids:
+                        await replay_missed_activity(board_id, ws, last_activity_ids[board_id])
 
-            elif message["type"] == "leave":
-                print("LEAVE REQUEST → board:", board_id)
+            else:
+                print("LEAVE REQUEST → boards:", leaving)
 
-                if board_id is not None:
+                for board_id in leaving & joined_boards:
                     await manager.disconnect(board_id, ws)
-                    print("WS LEFT → board:", board_id)
-                    board_id = None
+                    joined_boards.discard(board_id)
+                print("WS LEFT → boards:", leaving, "remaining:", len(joined_boards))
 
     except WebSocketDisconnect:
         print("WS DISCONNECT")
 
-        if board_id is not None:
-            await manager.disconnect(board_id, ws)
-            print("WS CLEANUP DISCONNECT → board:", board_id)
+    finally:
+        # also runs when the handler fails, so no writer task or subscription outlives the socket
+        await manager.remove(ws)
+        print("WS CLEANUP DISCONNECT → boards:", joined_boards)
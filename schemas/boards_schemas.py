@@ -19,6 +19,14 @@ class BoardOut(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class BoardListItem(BoardOut):
+    role:BoardRole
+    card_count:int
+
+class BoardListPage(BaseModel):
+    items:list[BoardListItem]
+    next_cursor:Optional[str]=None
+
 class BoardUpdate(BaseModel):
     
     name:Optional[str]=None
@@ -46,5 +54,8 @@ class BoardMemberResponse(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
-    
 
+class BoardImportResult(BaseModel):
+    created_boards:list[int]
+    boards:dict[int,int]
+    cards:int
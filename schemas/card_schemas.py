@@ -1,11 +1,13 @@
-from pydantic import BaseModel,ConfigDict
+from pydantic import BaseModel,ConfigDict,Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional,Literal,Union,Annotated
+
+MAX_BATCH_OPERATIONS=5000
 class CardCreate(BaseModel):
     
     title:str
     description:str
-    position:float
+    position:Optional[float]=None
 
     model_config=ConfigDict(from_attributes=True)
 
@@ -30,6 +32,42 @@ class CardUpdate(BaseModel):
 
     model_config=ConfigDict(from_attributes=True)
 
+class CardMove(BaseModel):
+    after_card_id:Optional[int]=None
+    before_card_id:Optional[int]=None
+
+class CardCreateOperation(BaseModel):
+    op:Literal["create"]
+    title:str
+    description:str=""
+    position:Optional[float]=None
+
+class CardUpdateOperation(BaseModel):
+    op:Literal["update"]
+    id:int
+    title:Optional[str]=None
+    description:Optional[str]=None
+    position:Optional[float]=None
+
+class CardMoveOperation(BaseModel):
+    op:Literal["move"]
+    id:int
+    after_card_id:Optional[int]=None
+    before_card_id:Optional[int]=None
+
+class CardDeleteOperation(BaseModel):
+    op:Literal["delete"]
+    id:int
+
+class CardBatch(BaseModel):
+    operations:list[Annotated[Union[CardCreateOperation,CardUpdateOperation,CardMoveOperation,CardDeleteOperation],Field(discriminator="op")]]=Field(min_length=1,max_length=MAX_BATCH_OPERATIONS)
+
+class CardBatchResult(BaseModel):
+    created_ids:list[int]
+    updated:int
+    moved:int
+    deleted:int
+
 class DeleteCardResponse(BaseModel):
     name:str
     message:str="Card deleted successfully!"
@@ -0,0 +1,17 @@
+from pydantic import BaseModel,ConfigDict
+from datetime import datetime
+from typing import Any,Optional
+
+class ActivityOut(BaseModel):
+    id:int
+    actor_id:int
+    message:str
+    activity_type:str
+    created_at:Optional[datetime]=None
+    metadata_info:Optional[Any]=None
+
+    model_config=ConfigDict(from_attributes=True)
+
+class ActivityFeedPage(BaseModel):
+    items:list[ActivityOut]
+    next_cursor:Optional[str]=None
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Optional
+from schemas.card_schemas import CardOut
+
+class CardSearchHit(CardOut):
+    rank:float
+
+class CardSearchPage(BaseModel):
+    items:list[CardSearchHit]
+    next_cursor:Optional[str]=None
@@ -0,0 +1,140 @@
+"""Batching consumer for activity events.
+
+Producers push events onto the `activity:pending` Redis list with
+`enqueue_activities`. The consumer moves up to ACTIVITY_BATCH_SIZE of them
+into its own processing list, waiting at most ACTIVITY_BATCH_WAIT_MS after
+the first one, and records the whole batch with `record_activities`. Items
+stay in the processing list until the batch is committed, so a crashed
+consumer replays them on restart (at-least-once). A batch that still fails
+after ACTIVITY_BATCH_RETRIES attempts is recorded one event at a time, and
+events that fail on their own are moved to the `activity:dead` list so one
+malformed event cannot stall the queue. Connection errors are an outage, not
+a bad event, and are retried until the database or Redis is back.
+
+    python -m tasks.activity_consumer
+"""
+import os
+import json
+import socket
+import time
+from datetime import datetime,timezone
+from redis.exceptions import ConnectionError as RedisConnectionError,TimeoutError as RedisTimeoutError
+from sqlalchemy.exc import InterfaceError,OperationalError
+from utils.metrics import register_metrics
+from utils.redis_utils import redis_client
+from .process import record_activities
+
+ACTIVITY_QUEUE="activity:pending"
+ACTIVITY_BATCH_SIZE=int(os.getenv("ACTIVITY_BATCH_SIZE","500"))
+ACTIVITY_BATCH_WAIT_MS=int(os.getenv("ACTIVITY_BATCH_WAIT_MS","200"))
+ACTIVITY_BATCH_RETRIES=int(os.getenv("ACTIVITY_BATCH_RETRIES","3"))
+ACTIVITY_DEAD_LETTER="activity:dead"
+# errors that say nothing about the events themselves; dead-lettering on these would empty the queue during an outage
+OUTAGE_ERRORS=(OperationalError,InterfaceError,RedisConnectionError,RedisTimeoutError,ConnectionError)
+
+
+def enqueue_activities(events:list[dict],client=redis_client):
+    pipe=client.pipeline(transaction=False)
+    for event in events:
+        pipe.rpush(ACTIVITY_QUEUE,json.dumps(event))
+    pipe.execute()
+
+
+class ActivityBatchConsumer:
+    def __init__(self,client=redis_client,batch_size:int=ACTIVITY_BATCH_SIZE,wait_ms:int=ACTIVITY_BATCH_WAIT_MS,name:str|None=None,retries:int=ACTIVITY_BATCH_RETRIES,retry_delay:float=1.0):
+        self.client=client
+        self.batch_size=batch_size
+        self.wait=wait_ms/1000
+        self.retries=max(1,retries)
+        self.retry_delay=retry_delay
+        self.processing=f"activity:processing:{name or socket.gethostname()}"
+        self.counts={"batches":0,"events":0,"retries":0,"dead_lettered":0}
+
+    def next_batch(self,block_timeout:float=1.0):
+        first=self.client.blmove(ACTIVITY_QUEUE,self.processing,block_timeout,"LEFT","RIGHT")
+        if first is None:
+            return []
+        batch=[first]
+        deadline=time.monotonic()+self.wait
+        while len(batch)<self.batch_size:
+            available=min(self.batch_size-len(batch),self.client.llen(ACTIVITY_QUEUE))
+            if available:
+                pipe=self.client.pipeline(transaction=False)
+                for _ in range(available):
+                    pipe.lmove(ACTIVITY_QUEUE,self.processing,"LEFT","RIGHT")
+                batch.extend(item for item in pipe.execute() if item is not None)
+                continue
+            remaining=deadline-time.monotonic()
+            if remaining<=0:
+                break
+            item=self.client.blmove(ACTIVITY_QUEUE,self.processing,remaining,"LEFT","RIGHT")
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def process(self,batch):
+        record_activities([json.loads(item) for item in batch])
+        self.client.delete(self.processing)
+
+    def dead_letter(self,item,error:Exception):
+        raw=item.decode() if isinstance(item,bytes) else item
+        self.client.rpush(ACTIVITY_DEAD_LETTER,json.dumps({"event":raw,"error":repr(error),"failed_at":datetime.now(timezone.utc).isoformat()}))
+        self.counts["dead_lettered"]+=1
+        print("ACTIVITY DEAD LETTER →",repr(error),raw)
+
+    def process_each(self,batch):
+        for item in batch:
+            while True:
+                try:
+                    record_activities([json.loads(item)])
+                    break
+                except OUTAGE_ERRORS as e:
+                    print("activity event failed on an outage, retrying:",e)
+                    time.sleep(self.retry_delay)
+                except Exception as e:
+                    self.dead_letter(item,e)
+                    break
+        self.client.delete(self.processing)
+
+    def handle(self,batch):
+        attempt=0
+        while True:
+            try:
+                self.process(batch)
+                break
+            except OUTAGE_ERRORS as e:
+                print("activity batch failed on an outage, retrying:",e)
+            except Exception as e:
+                attempt+=1
+                if attempt>=self.retries:
+                    print(f"activity batch failed {attempt} times, recording events one at a time:",e)
+                    self.process_each(batch)
+                    break
+                print(f"activity batch failed (attempt {attempt}/{self.retries}), retrying:",e)
+            self.counts["retries"]+=1
+            time.sleep(self.retry_delay)
+        self.counts["batches"]+=1
+        self.counts["events"]+=len(batch)
+
+    def recover(self):
+        leftovers=self.client.lrange(self.processing,0,-1)
+        if leftovers:
+            print(f"replaying {len(leftovers)} activity events left by a previous run")
+            self.handle(leftovers)
+
+    def stats(self):
+        return {**self.counts,"dead_letter_backlog":self.client.llen(ACTIVITY_DEAD_LETTER)}
+
+    def run(self):
+        self.recover()
+        while True:
+            batch=self.next_batch()
+            if batch:
+                self.handle(batch)
+
+
+if __name__=="__main__":
+    consumer=ActivityBatchConsumer()
+    register_metrics("activity_consumer",consumer.stats)
+    consumer.run()
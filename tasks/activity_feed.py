@@ -1,5 +1,5 @@
 from db.models import AuditLog,AuditAction,ActivityFeed,User
-from db.database import SessionLocal
+from db.database import WorkerSessionLocal as SessionLocal
 from .celery_config import celery_app
 
 class ActivityMessageBuilder:
@@ -1,11 +1,14 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
 from kombu import Queue
+from celery.signals import worker_process_init
+from db.database import worker_engine
 
 broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 backend_url = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
 
-celery_app = Celery("board_app", broker=broker_url, backend=backend_url, include=["tasks.process"])
+celery_app = Celery("board_app", broker=broker_url, backend=backend_url, include=["tasks.process","tasks.rebalance","tasks.partitions"])
 celery_app.conf.task_queues = (Queue("default"), Queue("activity"))
 celery_app.conf.task_routes = {
     "tasks.activity.*": {
@@ -13,3 +16,16 @@ celery_app.conf.task_routes = {
     }
 }
 celery_app.conf.broker_connection_retry_on_startup = True
+# `celery -A tasks.celery_config beat`: next months' partitions exist long before the first row needs them
+celery_app.conf.beat_schedule = {
+    "maintain-log-partitions": {
+        "task": "tasks.maintenance.partitions",
+        "schedule": crontab(hour=3, minute=17),
+    }
+}
+
+
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    # prefork children must not reuse connections inherited from the parent process
+    worker_engine.dispose(close=False)
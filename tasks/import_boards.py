@@ -0,0 +1,53 @@
+"""Import boards and cards from an NDJSON file straight into the database.
+
+    python -m tasks.import_boards export.ndjson --user-id 1
+
+Same record format and validation as `POST /boards/import`; the file is read
+line by line and written in chunks of `--chunk-rows`, all in one transaction.
+"""
+import argparse
+import sys
+import time
+from fastapi import HTTPException
+from db.database import WorkerSessionLocal as SessionLocal
+from utils.import_utils import BoardImporter,IMPORT_CHUNK_ROWS
+
+
+def import_file(path:str,user_id:int,chunk_rows:int=IMPORT_CHUNK_ROWS):
+    started=time.perf_counter()
+
+    def progress(summary):
+        elapsed=time.perf_counter()-started
+        print(f"{summary['cards']} cards imported in {elapsed:.1f}s ({summary['cards']/max(elapsed,1e-9):,.0f}/s)")
+
+    importer=BoardImporter(user_id,chunk_rows=chunk_rows,progress=progress)
+    db=SessionLocal()
+    try:
+        with open(path,encoding="utf-8") as f:
+            lines=[]
+            for line in f:
+                lines.append(line)
+                if len(lines)>=chunk_rows:
+                    importer.add_lines(db,lines)
+                    lines=[]
+            importer.add_lines(db,lines)
+        return importer.finish(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--user-id",type=int,required=True)
+    parser.add_argument("--chunk-rows",type=int,default=IMPORT_CHUNK_ROWS)
+    args=parser.parse_args()
+    try:
+        summary=import_file(args.path,args.user_id,args.chunk_rows)
+    except HTTPException as e:
+        print("import failed:",e.detail,file=sys.stderr)
+        sys.exit(1)
+    print(f"created boards {summary['created_boards']}, {summary['cards']} cards in total")
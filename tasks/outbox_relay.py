@@ -0,0 +1,66 @@
+"""Relay for the transactional outbox.
+
+Command handlers write `OutboxEvent` rows in the same transaction as the
+change they describe. This relay moves them in batches onto the
+`activity:pending` queue drained by `tasks.activity_consumer`, and deletes
+them only after the push succeeded, so delivery is at-least-once. Each
+event carries its row id and timestamp as event_id and created_at, which
+`record_activities` uses to skip events it has already recorded. Rebalance
+requests staged by card moves are not activities: the relay dispatches one
+`tasks.cards.rebalance` per board in the batch instead.
+
+    python -m tasks.outbox_relay
+"""
+import os
+import time
+from sqlalchemy import select,delete
+from db.database import WorkerSessionLocal as SessionLocal
+from db.models import OutboxEvent
+from utils.outbox_utils import REBALANCE_REQUESTED
+from .activity_consumer import enqueue_activities
+from .rebalance import rebalance_board_positions
+
+OUTBOX_BATCH_SIZE=int(os.getenv("OUTBOX_BATCH_SIZE","500"))
+OUTBOX_POLL_INTERVAL_MS=int(os.getenv("OUTBOX_POLL_INTERVAL_MS","200"))
+
+
+def relay_outbox_batch(batch_size:int=OUTBOX_BATCH_SIZE):
+    db=SessionLocal()
+    try:
+        # SKIP LOCKED lets several relays share the table without handing out the same rows
+        rows=db.execute(select(OutboxEvent).order_by(OutboxEvent.id).limit(batch_size).with_for_update(skip_locked=True)).scalars().all()
+        if not rows:
+            return 0
+        activities=[
+            {"event_id":row.id,"actor_id":row.actor_id,"board_id":row.board_id,"action":row.action,"payload":row.payload,"created_at":row.created_at.isoformat()}
+            for row in rows if row.action!=REBALANCE_REQUESTED
+        ]
+        if activities:
+            enqueue_activities(activities)
+        # a burst of dense moves on one board needs a single rebalance
+        for board_id in sorted({row.board_id for row in rows if row.action==REBALANCE_REQUESTED}):
+            rebalance_board_positions.delay(board_id)
+        db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([row.id for row in rows])))
+        db.commit()
+        return len(rows)
+    except Exception as e:
+        print("outbox relay failed:",e)
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run():
+    while True:
+        try:
+            relayed=relay_outbox_batch()
+        except Exception:
+            relayed=0
+            time.sleep(1)
+        if relayed<OUTBOX_BATCH_SIZE:
+            time.sleep(OUTBOX_POLL_INTERVAL_MS/1000)
+
+
+if __name__=="__main__":
+    run()
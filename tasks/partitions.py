@@ -0,0 +1,21 @@
+from db.database import WorkerSessionLocal as SessionLocal
+from utils.partition_utils import maintain_partitions
+from .celery_config import celery_app
+
+
+@celery_app.task(name="tasks.maintenance.partitions")
+def maintain_log_partitions():
+    db=SessionLocal()
+    try:
+        summary=maintain_partitions(db)
+        print("PARTITION MAINTENANCE →",summary)
+        if summary["moved_from_default"]:
+            # the default partition only fills up when this job has not run for months
+            print("PARTITION MAINTENANCE ALERT → rows moved out of the default partition:",summary["moved_from_default"])
+        return summary
+    except Exception as e:
+        print(e)
+        db.rollback()
+        raise
+    finally:
+        db.close()
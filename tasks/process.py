@@ -1,11 +1,12 @@
-import os
+from datetime import datetime
+from sqlalchemy import select,insert
 from db.models import AuditLog,AuditAction,ActivityFeed,User
-from db.database import SessionLocal
+from db.database import WorkerSessionLocal as SessionLocal
 from .celery_config import celery_app
-import  redis
-import json
-
-redis_client = redis.from_url(os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"))
+from utils.redis_utils import redis_client,publish_board_event
+from utils.json_utils import dumps
+from utils.feed_utils import activity_payload
+from utils.db_utils import insert_many_on_conflict_do_nothing
 
 
 class ActivityMessageBuilder:
@@ -23,6 +24,12 @@ class ActivityMessageBuilder:
             return f"removed a card from board id {audit.board_id}"
         elif audit.action==AuditAction.CARD_UPDATED:
             return f"{name} updated the card with title:{audit.payload['old']['title']},desc:{audit.payload['old']['description']},position:{audit.payload['old']['position']} to title:{audit.payload['new']['title']},desc:{audit.payload['new']['description']},position:{audit.payload['new']['position']}" 
+        elif audit.action==AuditAction.CARD_MOVED:
+            return f"{name} moved the card {audit.payload['title']} from position {audit.payload['old_position']} to {audit.payload['new_position']}"
+        elif audit.action==AuditAction.CARDS_BATCH:
+            return f"{name} changed cards in bulk: {audit.payload['created']} created, {audit.payload['updated']} updated, {audit.payload['moved']} moved, {audit.payload['deleted']} deleted"
+        elif audit.action==AuditAction.BOARD_IMPORTED:
+            return f"{name} imported {audit.payload['cards']} cards into board-{audit.board_id}"
         elif audit.action==AuditAction.MEMBER_ADDED:
             return f"{name} added a member to the board-{audit.payload['board_id']} with user id {audit.payload['user_id']} and role {audit.payload['role']}"
         elif audit.action==AuditAction.MEMBER_REMOVED:
@@ -32,25 +39,66 @@ class ActivityMessageBuilder:
         
         return f"{name} performed an action"
 
-@celery_app.task(name="tasks.activity.record")
-def record_activity(actor_id:int,board_id:int,action,payload):
+def record_activities(events:list[dict]):
+    """Persist a batch of activity events in one transaction and fan them out in one Redis round trip.
+
+    Each event carries actor_id, board_id, action and payload. Events relayed
+    from the outbox also carry event_id and created_at; one whose audit row
+    already exists was recorded by an earlier delivery and is skipped.
+    """
+    if not events:
+        return []
     db=SessionLocal()
     try:
-        actor=db.get(User,actor_id)
-        audit=AuditLog(actor_id=actor_id,board_id=board_id,action=action,payload=payload)
-        db.add(audit)
-        db.flush()
-        message=ActivityMessageBuilder.build(audit=audit,name=actor.name)
-        feed=ActivityFeed(board_id=board_id,actor_id=actor_id,activity_type=action,message=message,metadata_info=payload)
-        db.add(feed)
+        actor_ids={event["actor_id"] for event in events}
+        names=dict(db.execute(select(User.id,User.name).where(User.id.in_(actor_ids))).all())
+        now=datetime.now()
+        audit_rows=[]
+        feed_rows=[]
+        seen=set()
+        for event in events:
+            # a relay that pushed a batch and failed to commit pushes it again, possibly into the same consumer batch
+            if event.get("event_id") is not None:
+                if event["event_id"] in seen:
+                    continue
+                seen.add(event["event_id"])
+            if event["actor_id"] not in names:
+                print("skipping activity for unknown actor:",event["actor_id"])
+                continue
+            audit=AuditLog(actor_id=event["actor_id"],board_id=event["board_id"],action=event["action"],payload=event["payload"])
+            created_at=datetime.fromisoformat(event["created_at"]) if event.get("created_at") else now
+            audit_rows.append({"event_id":event.get("event_id"),"actor_id":event["actor_id"],"board_id":event["board_id"],"action":event["action"],"payload":event["payload"],"created_at":created_at})
+            feed_rows.append({"board_id":event["board_id"],"actor_id":event["actor_id"],"activity_type":event["action"],"message":ActivityMessageBuilder.build(audit=audit,name=names[event["actor_id"]]),"metadata_info":event["payload"],"created_at":created_at})
+        if not feed_rows:
+            return []
+        inserted=set(insert_many_on_conflict_do_nothing(db,AuditLog,audit_rows,["event_id","created_at"],AuditLog.event_id))
+        feed_rows=[feed for audit,feed in zip(audit_rows,feed_rows) if audit["event_id"] is None or audit["event_id"] in inserted]
+        if not feed_rows:
+            print("skipping activity batch already recorded")
+            return []
+        feed_ids=db.scalars(insert(ActivityFeed).returning(ActivityFeed.id,sort_by_parameter_order=True),feed_rows).all()
         db.commit()
-        db.refresh(feed)
-        redis_payload={"type": "activity", "activity_id":feed.id,"board_id":feed.board_id,"actor_id":feed.actor_id,"activity_type":feed.activity_type,"message":feed.message,"created_at":feed.created_at.isoformat()}
-        channel=f"board:{feed.board_id}"
-        redis_client.publish(channel,json.dumps(redis_payload))
     except Exception as e:
         print(e)
         db.rollback()
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+    published=[]
+    pipe=redis_client.pipeline(transaction=False)
+    for feed_id,feed in zip(feed_ids,feed_rows):
+        redis_payload=activity_payload(feed_id,feed["board_id"],feed["actor_id"],feed["activity_type"],feed["message"],feed["created_at"])
+        publish_board_event(pipe,feed["board_id"],dumps(redis_payload))
+        published.append(redis_payload)
+    try:
+        pipe.execute()
+    except Exception as e:
+        # rows are committed; retrying the batch would duplicate them, live clients catch up from the feed
+        print("failed to publish activity batch:",e)
+    return published
+
+
+@celery_app.task(name="tasks.activity.record_batch")
+def record_activity_batch(events:list[dict]):
+    record_activities(events)
@@ -0,0 +1,24 @@
+from sqlalchemy import select
+from db.models import Board
+from db.database import WorkerSessionLocal as SessionLocal
+from utils.ordering_utils import rebalance_positions
+from utils.version_utils import bump_board_version
+from .celery_config import celery_app
+
+
+@celery_app.task(name="tasks.cards.rebalance")
+def rebalance_board_positions(board_id:int):
+    db=SessionLocal()
+    try:
+        # moves lock the same board row, so none computes a midpoint from keys being rewritten
+        db.execute(select(Board.id).where(Board.id==board_id).with_for_update())
+        updated=rebalance_positions(db,board_id)
+        bump_board_version(db,board_id)
+        db.commit()
+        return updated
+    except Exception as e:
+        print(e)
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -1,3 +1,7 @@
+import os
+# cheap bcrypt in the request threads; the process pool has its own test
+os.environ.setdefault("BCRYPT_WORKERS","0")
+os.environ.setdefault("BCRYPT_ROUNDS","4")
 from main import app
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
@@ -53,31 +57,29 @@ def clean_database(db_session):
         db_session.execute(table.delete())
     db_session.commit()
 
+@pytest.fixture(autouse=True)
+def clear_membership_cache():
+    """Row ids are reused between tests, so cached roles and principals must not leak across them."""
+    from utils.membership_cache import membership_cache
+    from utils.auth_utils import token_cache
+    membership_cache.clear()
+    token_cache.clear()
+    yield
+    membership_cache.clear()
+    token_cache.clear()
+
 @pytest.fixture(autouse=True)
 def mock_celery_tasks(db_session):
-    """Mock Celery tasks to run synchronously for testing."""
-    from tasks import process, log
+    """Point the task modules at the test session."""
+    from tasks import process, outbox_relay
     import db.database
     original = db.database.SessionLocal
     db.database.SessionLocal = lambda: db_session
     # Also patch in the task modules
     process.SessionLocal = lambda: db_session
-    log.SessionLocal = lambda: db_session
+    outbox_relay.SessionLocal = lambda: db_session
     try:
-        with patch.object(process.record_activity, 'delay') as mock_record, \
-             patch.object(log.log_audit, 'delay') as mock_log:
-            # Make delay return a mock that calls the function synchronously
-            def sync_record(*args, **kwargs):
-                process.record_activity(*args, **kwargs)
-                return MagicMock()
-            
-            def sync_log(*args, **kwargs):
-                log.log_audit(*args, **kwargs)
-                return MagicMock()
-            
-            mock_record.side_effect = sync_record
-            mock_log.side_effect = sync_log
-            yield mock_record, mock_log
+        yield
     finally:
         db.database.SessionLocal = original
 
@@ -93,22 +95,30 @@ def mock_redis():
         mock_async_instance.pubsub.return_value = MagicMock()
         yield mock_sync_instance, mock_async_instance
 
-@pytest.fixture
-def client(db_session):
-    print("get_db id:", id(get_db))
-
-    # Create a test app without lifespan to avoid starting background tasks
+def build_test_app():
+    """Create a test app without lifespan to avoid starting background tasks."""
     from fastapi import FastAPI
     from routers.auth import router as auth_router
     from routers.boards import router as boards_router
     from routers.cards import router as cards_router
     from routers.sockets import router as ws_router
+    from routers.metrics import router as metrics_router
+    from routers.search import router as search_router
 
     test_app = FastAPI()
     test_app.include_router(auth_router)
     test_app.include_router(boards_router)
     test_app.include_router(cards_router)
     test_app.include_router(ws_router)
+    test_app.include_router(metrics_router)
+    test_app.include_router(search_router)
+    return test_app
+
+@pytest.fixture
+def client(db_session):
+    print("get_db id:", id(get_db))
+
+    test_app = build_test_app()
 
     def override_get_db():
         yield db_session
@@ -120,6 +130,27 @@ def client(db_session):
 
     test_app.dependency_overrides.clear()
 
+@pytest.fixture
+def async_client(db_file, db_session):
+    """Same app served from an aiosqlite AsyncSession, as with ASYNC_DB=1."""
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import NullPool
+
+    # NullPool: aiosqlite connections must not outlive the TestClient event loop
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_file}", poolclass=NullPool)
+    AsyncTestSessionLocal = async_sessionmaker(bind=async_engine)
+    test_app = build_test_app()
+
+    async def override_get_db():
+        async with AsyncTestSessionLocal() as db:
+            yield db
+
+    test_app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(test_app) as c:
+        yield c
+
+    test_app.dependency_overrides.clear()
 
 
 @pytest.fixture
@@ -0,0 +1,217 @@
+"""In-process stand-in for a Redis server's pub/sub and streams, shared by several simulated API instances."""
+import asyncio
+import fnmatch
+import time
+from collections import defaultdict
+import redis
+
+
+class FakeRedisServer:
+    def __init__(self):
+        self.channels = defaultdict(set)
+        self.commands = []
+        self.streams = {}
+        # stream -> group -> {"last": index of the next undelivered entry, "pending": delivered but unacked ids,
+        #                     "consumers": consumer name -> monotonic time of its last read}
+        self.groups = defaultdict(dict)
+        self.sequence = 0
+        self.stream_written = asyncio.Event()
+        # set to simulate a failover: stream reads raise ConnectionError until cleared
+        self.unreachable = False
+
+    def publish(self, channel, data):
+        if isinstance(data, str):
+            data = data.encode()
+        receivers = list(self.channels.get(channel, ()))
+        for pubsub in receivers:
+            pubsub.deliver({"type": "message", "pattern": None, "channel": channel.encode(), "data": data})
+        return len(receivers)
+
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        self.sequence += 1
+        entry_id = f"{self.sequence}-0".encode()
+        fields = {key.encode(): value.encode() if isinstance(value, str) else value for key, value in fields.items()}
+        entries = self.streams.setdefault(name, [])
+        entries.append((entry_id, fields))
+        if maxlen is not None and len(entries) > maxlen:
+            trimmed = len(entries) - maxlen
+            del entries[:trimmed]
+            for group in self.groups[name].values():
+                group["last"] = max(0, group["last"] - trimmed)
+        self.stream_written.set()
+        return entry_id
+
+    def subscriber_count(self, channel):
+        return len(self.channels.get(channel, ()))
+
+    def client(self):
+        return FakeRedisClient(self)
+
+
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.subscribed = set()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, message):
+        self.queue.put_nowait(message)
+
+    async def subscribe(self, *channels):
+        self.server.commands.append(("SUBSCRIBE", channels))
+        for channel in channels:
+            self.server.channels[channel].add(self)
+            self.subscribed.add(channel)
+
+    async def unsubscribe(self, *channels):
+        self.server.commands.append(("UNSUBSCRIBE", channels))
+        for channel in channels or list(self.subscribed):
+            self.server.channels[channel].discard(self)
+            self.subscribed.discard(channel)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        await self.unsubscribe()
+
+
+class FakeRedisClient:
+    def __init__(self, server):
+        self.server = server
+
+    def pubsub(self):
+        return FakePubSub(self.server)
+
+    async def xadd(self, name, fields, maxlen=None, approximate=True):
+        return self.server.xadd(name, fields, maxlen, approximate)
+
+    async def xgroup_create(self, name, groupname, id="$", mkstream=False):
+        groups = self.server.groups[name]
+        if groupname in groups:
+            raise redis.ResponseError("BUSYGROUP Consumer Group name already exists")
+        entries = self.server.streams.setdefault(name, [])
+        groups[groupname] = {"last": len(entries) if id == "$" else 0, "pending": set(), "consumers": {}}
+        return True
+
+    async def xgroup_destroy(self, name, groupname):
+        return 1 if self.server.groups[name].pop(groupname, None) else 0
+
+    def _read(self, groupname, consumername, streams, count):
+        response = []
+        for name, start in streams.items():
+            group = self.server.groups[name].get(groupname)
+            if group is None:
+                raise redis.ResponseError(f"NOGROUP No such key '{name}' or consumer group '{groupname}'")
+            group["consumers"][consumername] = time.monotonic()
+            entries = self.server.streams.get(name, [])
+            if start == ">":
+                batch = entries[group["last"]:group["last"] + (count or len(entries))]
+                group["last"] += len(batch)
+                group["pending"].update(entry_id for entry_id, _ in batch)
+            else:
+                batch = [entry for entry in entries if entry[0] in group["pending"]][:count]
+            response.append([name.encode(), batch])
+        return response
+
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None):
+        if self.server.unreachable:
+            raise redis.ConnectionError("Error 111 connecting to redis:6379. Connection refused.")
+        response = self._read(groupname, consumername, streams, count)
+        # like Redis, only reads of new entries (">") block
+        if block is not None and ">" in streams.values() and not any(entries for _, entries in response):
+            self.server.stream_written.clear()
+            try:
+                await asyncio.wait_for(self.server.stream_written.wait(), block / 1000)
+            except asyncio.TimeoutError:
+                pass
+            response = self._read(groupname, consumername, streams, count)
+        return response
+
+    async def scan_iter(self, match=None, count=None):
+        for name in list(self.server.streams):
+            if match is None or fnmatch.fnmatchcase(name, match):
+                yield name.encode()
+
+    async def xinfo_groups(self, name):
+        return [{"name": group.encode(), "pending": len(info["pending"])} for group, info in self.server.groups[name].items()]
+
+    async def xinfo_consumers(self, name, groupname):
+        now = time.monotonic()
+        return [{"name": consumer.encode(), "idle": int((now - seen) * 1000)} for consumer, seen in self.server.groups[name][groupname]["consumers"].items()]
+
+    async def xack(self, name, groupname, *ids):
+        group = self.server.groups[name].get(groupname)
+        if group is None:
+            return 0
+        acked = group["pending"] & set(ids)
+        group["pending"] -= acked
+        return len(acked)
+
+    async def close(self):
+        pass
+
+
+class FakeWebSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed_with = None
+        self.unblock = asyncio.Event()
+        if not blocked:
+            self.unblock.set()
+
+    async def send_text(self, frame):
+        await self.unblock.wait()
+        self.sent.append(frame)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def settle(rounds=5):
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+
+class FakeSyncRedis:
+    """Blocking-client stand-in for the key/value commands used by the caches."""
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def eval(self, script, numkeys, *args):
+        # only the compare-and-delete lock release is used
+        key, token = args[0], args[1]
+        if self.data.get(key) == token.encode():
+            return self.delete(key)
+        return 0
+
+
+class FakeAsyncRedis(FakeSyncRedis):
+    """The same commands on the asyncio client's awaitable interface."""
+    async def get(self, key):
+        return FakeSyncRedis.get(self, key)
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        return FakeSyncRedis.set(self, key, value, nx, px, ex)
+
+    async def delete(self, *keys):
+        return FakeSyncRedis.delete(self, *keys)
+
+    async def eval(self, script, numkeys, *args):
+        key, token = args[0], args[1]
+        if self.data.get(key) == token.encode():
+            return FakeSyncRedis.delete(self, key)
+        return 0
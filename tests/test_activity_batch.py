@@ -0,0 +1,164 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from db.models import User, Board, ActivityFeed, AuditLog, AuditAction, OutboxEvent
+from sqlalchemy.exc import OperationalError
+from tasks import process, outbox_relay, activity_consumer
+
+
+def _seed(db_session):
+    user = User(email="batch@example.com", name="Batcher", password_hash="x")
+    db_session.add(user)
+    db_session.flush()
+    board = Board(name="Batch Board", description="", created_by=user.id)
+    db_session.add(board)
+    db_session.commit()
+    return user.id, board.id
+
+
+def test_record_activities_writes_batch_and_publishes_once(db_session):
+    user_id, board_id = _seed(db_session)
+    events = [
+        {"actor_id": user_id, "board_id": board_id, "action": AuditAction.CARD_CREATED,
+         "payload": {"id": i, "title": f"card {i}", "description": "", "position": i, "created_by": user_id}}
+        for i in range(3)
+    ]
+
+    with patch.object(process, "redis_client") as mock_redis:
+        published = process.record_activities(events)
+
+    pipe = mock_redis.pipeline.return_value
+    assert pipe.publish.call_count == 3
+    pipe.execute.assert_called_once()
+    assert [event["message"] for event in published] == [
+        f"Batcher created the card with title:card {i},description:" for i in range(3)
+    ]
+
+    feeds = db_session.query(ActivityFeed).filter_by(board_id=board_id).order_by(ActivityFeed.id).all()
+    assert [feed.id for feed in feeds] == [event["activity_id"] for event in published]
+    assert db_session.query(AuditLog).filter_by(board_id=board_id).count() == 3
+
+
+def test_publish_failure_does_not_fail_committed_batch(db_session):
+    user_id, board_id = _seed(db_session)
+    event = {"actor_id": user_id, "board_id": board_id, "action": AuditAction.BOARD_DELETED, "payload": None}
+
+    with patch.object(process, "redis_client") as mock_redis:
+        mock_redis.pipeline.return_value.execute.side_effect = ConnectionError("redis down")
+        published = process.record_activities([event])
+
+    assert len(published) == 1
+    assert db_session.query(ActivityFeed).filter_by(board_id=board_id).count() == 1
+
+
+def test_streams_transport_appends_to_capped_board_streams(db_session, monkeypatch):
+    import utils.redis_utils
+    monkeypatch.setattr(utils.redis_utils, "EVENT_TRANSPORT", "streams")
+    user_id, board_id = _seed(db_session)
+    event = {"actor_id": user_id, "board_id": board_id, "action": AuditAction.BOARD_DELETED, "payload": None}
+
+    with patch.object(process, "redis_client") as mock_redis:
+        process.record_activities([event, event])
+
+    pipe = mock_redis.pipeline.return_value
+    assert pipe.publish.call_count == 0
+    assert [call.args[0] for call in pipe.xadd.call_args_list] == [f"board:{board_id}:stream"] * 2
+    assert pipe.xadd.call_args.kwargs["approximate"] is True
+    pipe.execute.assert_called_once()
+
+
+def test_commands_write_outbox_and_relay_drains_it(client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id = client.post("/boards", headers=headers, json={"name": "Outbox Board", "description": "d"}).json()["id"]
+    client.post(f"/boards/{board_id}/cards", headers=headers, json={"title": "Card", "description": "", "position": 1})
+
+    pending = db_session.query(OutboxEvent).filter_by(board_id=board_id).order_by(OutboxEvent.id).all()
+    assert [event.action for event in pending] == [AuditAction.BOARD_CREATED, AuditAction.CARD_CREATED]
+
+    with patch.object(outbox_relay, "enqueue_activities") as mock_enqueue:
+        assert outbox_relay.relay_outbox_batch() == 2
+
+    events = mock_enqueue.call_args.args[0]
+    assert [event["action"] for event in events] == [AuditAction.BOARD_CREATED, AuditAction.CARD_CREATED]
+    assert db_session.query(OutboxEvent).count() == 0
+
+
+def test_relayed_events_are_recorded_once(client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id = client.post("/boards", headers=headers, json={"name": "Outbox Board", "description": "d"}).json()["id"]
+    with patch.object(outbox_relay, "enqueue_activities") as mock_enqueue:
+        outbox_relay.relay_outbox_batch()
+    events = json.loads(json.dumps(mock_enqueue.call_args.args[0]))
+
+    with patch.object(process, "redis_client") as mock_redis:
+        assert len(process.record_activities(events)) == 1
+        assert process.record_activities(events) == []
+
+    assert db_session.query(AuditLog).filter_by(board_id=board_id).count() == 1
+    assert db_session.query(ActivityFeed).filter_by(board_id=board_id).count() == 1
+    assert mock_redis.pipeline.return_value.execute.call_count == 1
+
+
+def test_duplicate_event_in_one_batch_is_recorded_once(db_session):
+    user_id, board_id = _seed(db_session)
+    event = {"event_id": 41, "actor_id": user_id, "board_id": board_id, "action": AuditAction.BOARD_DELETED,
+             "payload": None, "created_at": "2026-10-18T12:00:00"}
+
+    with patch.object(process, "redis_client") as mock_redis:
+        published = process.record_activities([event, dict(event)])
+
+    assert len(published) == 1
+    assert mock_redis.pipeline.return_value.publish.call_count == 1
+    assert db_session.query(AuditLog).filter_by(board_id=board_id).count() == 1
+    assert db_session.query(ActivityFeed).filter_by(board_id=board_id).count() == 1
+
+
+def test_outbox_rows_survive_failed_relay(client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    client.post("/boards", headers=headers, json={"name": "Outbox Board", "description": "d"})
+
+    with patch.object(outbox_relay, "enqueue_activities", side_effect=ConnectionError("redis down")):
+        with pytest.raises(ConnectionError):
+            outbox_relay.relay_outbox_batch()
+
+    assert db_session.query(OutboxEvent).count() == 1
+
+
+def _card_event(user_id, board_id, i, **payload):
+    return json.dumps({"actor_id": user_id, "board_id": board_id, "action": AuditAction.CARD_CREATED,
+                       "payload": {"id": i, "title": f"card {i}", "description": "", "position": i, "created_by": user_id, **payload}})
+
+
+def test_failing_event_is_dead_lettered_after_retries(db_session):
+    user_id, board_id = _seed(db_session)
+    bad = json.dumps({"actor_id": user_id, "board_id": board_id, "action": AuditAction.CARD_CREATED, "payload": {"id": 2}})
+    batch = [_card_event(user_id, board_id, 1), bad, _card_event(user_id, board_id, 3)]
+    client = MagicMock()
+    consumer = activity_consumer.ActivityBatchConsumer(client=client, name="test", retries=2, retry_delay=0)
+
+    with patch.object(process, "redis_client"):
+        consumer.handle(batch)
+
+    messages = [row.message for row in db_session.query(ActivityFeed).filter_by(board_id=board_id).order_by(ActivityFeed.id)]
+    assert messages == ["Batcher created the card with title:card 1,description:", "Batcher created the card with title:card 3,description:"]
+    client.rpush.assert_called_once()
+    queue, entry = client.rpush.call_args.args
+    assert queue == activity_consumer.ACTIVITY_DEAD_LETTER
+    assert json.loads(entry)["event"] == bad
+    assert "KeyError" in json.loads(entry)["error"]
+    client.delete.assert_called_with("activity:processing:test")
+    assert consumer.counts["dead_lettered"] == 1
+    assert consumer.counts["retries"] == 1
+
+
+def test_outage_is_retried_without_dead_lettering():
+    client = MagicMock()
+    consumer = activity_consumer.ActivityBatchConsumer(client=client, name="test", retries=1, retry_delay=0)
+    outage = OperationalError("INSERT", {}, Exception("connection refused"))
+
+    with patch.object(activity_consumer, "record_activities", side_effect=[outage, outage, None]) as record:
+        consumer.handle(['{"actor_id": 1}'])
+
+    assert record.call_count == 3
+    client.rpush.assert_not_called()
+    assert consumer.counts["dead_lettered"] == 0
@@ -0,0 +1,74 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from db.models import Board, Card, User
+
+
+def test_board_and_card_flow_on_async_session(async_client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+
+    board = async_client.post("/boards", headers=headers, json={"name": "Async Board", "description": "aiosqlite"})
+    assert board.status_code == 200
+    board_id = board.json()["id"]
+
+    card = async_client.post(
+        f"/boards/{board_id}/cards",
+        headers=headers,
+        json={"title": "Async Card", "description": "", "position": 1}
+    )
+    assert card.status_code == 200
+
+    update = async_client.patch(f"/boards/{board_id}", headers=headers, json={"name": "Renamed"})
+    assert update.status_code == 200
+    assert update.json()["name"] == "Renamed"
+
+    boards = async_client.get("/boards", headers=headers).json()
+    assert [item["id"] for item in boards["items"]] == [board_id]
+    assert boards["items"][0]["card_count"] == 1
+
+    cards = async_client.get(f"/boards/{board_id}/cards", headers=headers).json()
+    assert [item["title"] for item in cards] == ["Async Card"]
+
+    db_session.expire_all()
+    assert db_session.get(Board, board_id).name == "Renamed"
+    assert db_session.get(Card, card.json()["id"]) is not None
+
+
+def test_async_session_enforces_membership(async_client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    owner = db_session.query(User).filter_by(email="bob@example.com").first()
+    # created directly, so bob has no membership row for it
+    foreign = Board(name="Foreign", description="", created_by=owner.id)
+    db_session.add(foreign)
+    db_session.commit()
+
+    response = async_client.get(f"/boards/{foreign.id}/cards", headers=headers)
+    assert response.status_code == 403
+
+
+def test_async_login(async_client, user_setup):
+    response = async_client.post("/auth/token_json", json={"email": "bob@example.com", "password": "secretpw"})
+    assert response.status_code == 200
+    me = async_client.get("/auth/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"})
+    assert me.json()["email"] == "bob@example.com"
+
+
+def test_async_session_keeps_redis_off_the_event_loop(async_client, db_session, user_setup, other_user_setup, monkeypatch):
+    """Version cache writes and membership publishes go through the asyncio client after run_sync returns."""
+    import utils.membership_cache
+    import utils.version_utils
+    sent = []
+    blocking = MagicMock(side_effect=AssertionError("blocking Redis call on the event loop"))
+    monkeypatch.setattr(utils.version_utils, "cache_board_version", blocking)
+    monkeypatch.setattr(utils.membership_cache, "_publish", blocking)
+    monkeypatch.setattr(utils.version_utils, "_ASYNC_SET_IF_NEWER", AsyncMock(side_effect=lambda keys, args: sent.append(("version", keys[0], args[0]))))
+    monkeypatch.setattr(utils.membership_cache.async_redis_client, "publish", AsyncMock(side_effect=lambda channel, message: sent.append((channel, message))))
+    headers = {"Authorization": f"Bearer {user_setup}"}
+
+    board_id = async_client.post("/boards", headers=headers, json={"name": "Async Board", "description": ""}).json()["id"]
+    response = async_client.post(f"/boards/{board_id}/members", headers=headers, json={"user_id": other_user_setup, "role": "viewer"})
+    assert response.status_code == 200
+
+    blocking.assert_not_called()
+    assert ("version", f"board:{board_id}:version", 2) in sent
+    assert ("board:members", json.dumps({"board_id": board_id, "user_id": other_user_setup})) in sent
@@ -66,3 +66,89 @@ def test_expired_token(client,db_session):
 
 
 
+def test_verified_token_cache_skips_user_query(client,db_session,monkeypatch):
+    from sqlalchemy import event
+    from utils import auth_utils
+    user=User(email="cached@example.com",password_hash="x",name="Cached")
+    db_session.add(user)
+    db_session.commit()
+    user_id=user.id
+    token=create_access_token(user_id,timedelta(minutes=5))
+    headers={"Authorization":f"Bearer {token}"}
+
+    decodes=[]
+    decode=auth_utils.decode_access_token
+    monkeypatch.setattr(auth_utils,"decode_access_token",lambda t:decodes.append(t) or decode(t))
+    statements=[]
+    listener=lambda conn,cursor,statement,*args:statements.append(statement)
+    event.listen(db_session.get_bind(),"before_cursor_execute",listener)
+    try:
+        for _ in range(3):
+            assert client.get("/boards",headers=headers).status_code==200
+    finally:
+        event.remove(db_session.get_bind(),"before_cursor_execute",listener)
+    assert len(decodes)==1
+    assert not any("FROM users" in statement for statement in statements)
+    assert auth_utils.token_cache.stats()["hits"]>=2
+
+    assert client.get("/auth/me",headers=headers).json()["id"]==user_id
+
+
+def test_expired_token_is_not_served_from_cache():
+    from jose import JWTError
+    from utils.auth_utils import authenticate_token,token_cache,Principal
+    import hashlib
+    token=create_access_token(7,timedelta(minutes=5))
+    token_cache.set(hashlib.sha256(token.encode()).digest(),Principal(id=7,exp=0))
+    assert authenticate_token(token).id==7
+    assert authenticate_token(token).exp>0
+    with pytest.raises(JWTError):
+        authenticate_token(create_access_token(7,timedelta(seconds=-10)))
+
+
+def test_login_rehashes_when_cost_changes(client,db_session):
+    from passlib.context import CryptContext
+    from utils.password_hashing import BCRYPT_ROUNDS
+    old_hash=CryptContext(schemes=["bcrypt"],bcrypt__rounds=BCRYPT_ROUNDS+1).hash("pw")
+    user=User(email="rehash@example.com",password_hash=old_hash,name="Old")
+    db_session.add(user)
+    db_session.commit()
+
+    response=client.post("/auth/token_json",json={"email":"rehash@example.com","password":"pw"})
+    assert response.status_code==200
+    db_session.refresh(user)
+    assert user.password_hash!=old_hash
+    assert user.password_hash.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    assert client.post("/auth/token_json",json={"email":"rehash@example.com","password":"pw"}).status_code==200
+
+
+def test_password_hasher_rejects_when_full():
+    import asyncio
+    import time
+    from fastapi import HTTPException
+    from utils.password_hashing import PasswordHasher
+    hasher=PasswordHasher(workers=0,max_pending=1)
+
+    async def storm():
+        return await asyncio.gather(hasher.run(time.sleep,0.2),hasher.run(time.sleep,0.2),return_exceptions=True)
+
+    results=asyncio.run(storm())
+    rejected=[result for result in results if isinstance(result,HTTPException)]
+    assert len(rejected)==1 and rejected[0].status_code==503
+    assert hasher.stats()["rejected"]==1 and hasher.stats()["in_flight"]==0
+
+
+def test_password_hasher_process_pool():
+    import asyncio
+    from utils.password_hashing import PasswordHasher
+    hasher=PasswordHasher(workers=1,max_pending=4)
+
+    async def roundtrip():
+        hashed=await hasher.hash("s3cret")
+        return await hasher.verify_and_update("s3cret",hashed),await hasher.verify_and_update("wrong",hashed)
+
+    try:
+        assert asyncio.run(roundtrip())==((True,None),(False,None))
+    finally:
+        hasher.shutdown()
+    assert hasher.stats()["completed"]==3
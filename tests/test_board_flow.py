@@ -1,6 +1,7 @@
 import pytest
 from fastapi import HTTPException
-from db.models import Board
+from datetime import datetime,timedelta
+from db.models import Board,User,ActivityFeed,BoardMembers,BoardRole
 
 def test_create_board(client,db_session,user_setup):
     token=user_setup
@@ -186,3 +187,221 @@ def test_update_member(client,db_session,user_setup,member_user_setup):
     assert update_member_role.status_code==200
 
 
+
+
+def test_activity_feed_pagination(client,db_session,user_setup):
+    token = user_setup
+    headers={"Authorization": f"Bearer {token}"}
+    board_id=client.post("/boards",headers=headers,json={"name":"Feed Board","description":"feed"}).json()["id"]
+    user=db_session.query(User).filter_by(email="bob@example.com").first()
+    db_session.query(ActivityFeed).filter_by(board_id=board_id).delete()
+
+    base=datetime(2026,1,1)
+    for i in range(5):
+        db_session.add(ActivityFeed(board_id=board_id,actor_id=user.id,activity_type="CARD_CREATED",message=f"event {i}",created_at=base+timedelta(minutes=i)))
+    db_session.commit()
+
+    first=client.get(f"/boards/{board_id}/feed?limit=2",headers=headers).json()
+    assert [item["message"] for item in first["items"]]==["event 4","event 3"]
+    assert first["next_cursor"] is not None
+
+    second=client.get(f"/boards/{board_id}/feed",params={"limit":2,"before":first["next_cursor"]},headers=headers).json()
+    assert [item["message"] for item in second["items"]]==["event 2","event 1"]
+
+    newer=client.get(f"/boards/{board_id}/feed",params={"limit":10,"after":second["next_cursor"]},headers=headers).json()
+    assert [item["message"] for item in newer["items"]]==["event 4","event 3","event 2"]
+    assert newer["next_cursor"] is None
+
+    bad=client.get(f"/boards/{board_id}/feed",params={"before":"not-a-cursor"},headers=headers)
+    assert bad.status_code==400
+
+
+def test_add_existing_member_is_rejected(client,db_session,user_setup,member_user_setup):
+    token = user_setup
+    headers={"Authorization": f"Bearer {token}"}
+    board_id=client.post("/boards",headers=headers,json={"name":"Dup Board","description":""}).json()["id"]
+    db_session.add(BoardMembers(board_id=board_id,user_id=member_user_setup,role=BoardRole.viewer))
+    db_session.commit()
+
+    response=client.post(f"/boards/{board_id}/members",headers=headers,json={"user_id":member_user_setup,"role":"editor"})
+    assert response.status_code==400
+    assert db_session.query(BoardMembers).filter_by(board_id=board_id,user_id=member_user_setup).count()==1
+
+
+def test_list_accessible_boards(client,db_session,user_setup,member_user_setup):
+    token = user_setup
+    headers={"Authorization": f"Bearer {token}"}
+    empty=client.get("/boards",headers=headers)
+    assert empty.status_code==200
+    assert empty.json()=={"items":[],"next_cursor":None}
+
+    board_ids=[client.post("/boards",headers=headers,json={"name":f"Board {i}","description":""}).json()["id"] for i in range(3)]
+    client.post(f"/boards/{board_ids[0]}/cards",headers=headers,json={"title":"Card","description":"","position":1})
+    # a board the user is not a member of must not show up
+    db_session.add(Board(name="Foreign",description="",created_by=member_user_setup))
+    db_session.commit()
+
+    first=client.get("/boards?limit=2",headers=headers).json()
+    assert [board["id"] for board in first["items"]]==[board_ids[2],board_ids[1]]
+    assert all(board["role"]=="owner" for board in first["items"])
+
+    second=client.get("/boards",params={"limit":2,"cursor":first["next_cursor"]},headers=headers).json()
+    assert [board["id"] for board in second["items"]]==[board_ids[0]]
+    assert second["items"][0]["card_count"]==1
+    assert second["next_cursor"] is None
+
+
+def test_websocket_join_replays_missed_activity(client,db_session,user_setup,TestSessionLocal,monkeypatch):
+    import routers.sockets
+    import utils.feed_utils
+    monkeypatch.setattr(routers.sockets,"SessionLocal",TestSessionLocal)
+    token=user_setup
+    headers={"Authorization":f"Bearer {token}"}
+    board_id=client.post("/boards",headers=headers,json={"name":"Live","description":"d"}).json()["id"]
+    db_session.query(ActivityFeed).filter_by(board_id=board_id).delete()
+    user=db_session.query(User).filter_by(email="bob@example.com").first()
+    feeds=[ActivityFeed(board_id=board_id,actor_id=user.id,activity_type="CARD_CREATED",message=f"event {i}") for i in range(3)]
+    db_session.add_all(feeds)
+    db_session.commit()
+    ids=[feed.id for feed in feeds]
+
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        ws.send_json({"type":"join","board_id":board_id,"last_activity_id":ids[0]})
+        assert ws.receive_json()=={"type":"joined","board_id":board_id}
+        assert [ws.receive_json()["activity_id"] for _ in range(2)]==ids[1:]
+
+    monkeypatch.setattr(utils.feed_utils,"WS_REPLAY_LIMIT",1)
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        ws.send_json({"type":"join","board_id":board_id,"last_activity_id":0})
+        assert ws.receive_json()["type"]=="joined"
+        assert ws.receive_json()=={"type":"resync_required","board_id":board_id}
+
+
+def test_websocket_joins_many_boards_on_one_connection(client,db_session,user_setup,member_user_setup,TestSessionLocal,monkeypatch):
+    import routers.sockets
+    monkeypatch.setattr(routers.sockets,"SessionLocal",TestSessionLocal)
+    token=user_setup
+    headers={"Authorization":f"Bearer {token}"}
+    first,second=[client.post("/boards",headers=headers,json={"name":f"Dash {i}","description":"d"}).json()["id"] for i in range(2)]
+    private=Board(name="Private",description="d",created_by=member_user_setup)
+    db_session.add(private)
+    db_session.commit()
+    foreign=private.id
+    db_session.query(ActivityFeed).delete()
+    user=db_session.query(User).filter_by(email="bob@example.com").first()
+    feed=ActivityFeed(board_id=second,actor_id=user.id,activity_type="CARD_CREATED",message="missed")
+    db_session.add(feed)
+    db_session.commit()
+
+    with client.websocket_connect(f"/ws?token={token}&format=mux") as ws:
+        ws.send_json({"type":"join","board_ids":[first,second,foreign],"last_activity_ids":{str(second):0}})
+        assert ws.receive_json()=={"type":"error","message":"unauthorized board access","board_ids":[foreign]}
+        assert ws.receive_json()=={"type":"joined","board_ids":[first,second]}
+        board_id,event=ws.receive_json()
+        assert (board_id,event["activity_id"])==(second,feed.id)
+
+        ws.send_json({"type":"leave","board_ids":[first]})
+        ws.send_json({"type":"join","board_ids":[second]})
+        assert ws.receive_json()=={"type":"joined","board_ids":[second]}
+
+
+def test_export_streams_board_members_cards_and_audit(client,db_session,user_setup,member_user_setup,TestSessionLocal,monkeypatch):
+    import csv
+    import json
+    from utils import export_utils
+    from db.models import AuditLog
+    monkeypatch.setattr(export_utils,"SessionLocal",TestSessionLocal)
+    monkeypatch.setattr(export_utils,"EXPORT_CHUNK_ROWS",2)
+    token=user_setup
+    headers={"Authorization":f"Bearer {token}"}
+    board_id=client.post("/boards",headers=headers,json={"name":"Export","description":"d"}).json()["id"]
+    for i in range(3):
+        client.post(f"/boards/{board_id}/cards",headers=headers,json={"title":f"card {i}","description":""})
+    user=db_session.query(User).filter_by(email="bob@example.com").first()
+    db_session.add(AuditLog(actor_id=user.id,board_id=board_id,action="CARD_CREATED",payload={"title":"card 0"}))
+    db_session.commit()
+
+    response=client.get(f"/boards/{board_id}/export",headers=headers)
+    assert response.status_code==200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records=[json.loads(line) for line in response.text.splitlines()]
+    assert [record["record_type"] for record in records]==["board","member","card","card","card","audit"]
+    assert records[1]["role"]=="owner"
+    assert records[-1]["payload"]=={"title":"card 0"}
+
+    response=client.get(f"/boards/{board_id}/export",params={"format":"csv"},headers=headers)
+    rows=list(csv.DictReader(response.text.splitlines()))
+    assert [row["record_type"] for row in rows]==["board","member","card","card","card","audit"]
+    assert rows[2]["title"]=="card 0"
+
+    outsider=client.post("/auth/token_json",json={"email":"sarah@example.com","password":"secretpw"}).json()["access_token"]
+    assert client.get(f"/boards/{board_id}/export",headers={"Authorization":f"Bearer {outsider}"}).status_code==403
+
+
+def test_import_streams_boards_and_cards_in_one_transaction(client,db_session,user_setup):
+    import json
+    from db.models import Card,OutboxEvent,AuditAction
+    headers={"Authorization":f"Bearer {user_setup}"}
+    ndjson_headers={**headers,"Content-Type":"application/x-ndjson"}
+    existing=client.post("/boards",headers=headers,json={"name":"Existing","description":"d"}).json()["id"]
+    db_session.query(OutboxEvent).delete()
+    db_session.commit()
+
+    records=[{"type":"board","ref":"p1","name":"Imported","description":"from elsewhere"}]
+    records+=[{"type":"card","board":"p1","title":f"card {i}","description":""} for i in range(5)]
+    records+=[{"type":"card","board_id":existing,"title":"extra","description":"x","position":7}]
+    body="\n".join(json.dumps(record) for record in records)
+    response=client.post("/boards/import",headers=ndjson_headers,content=body.encode())
+    assert response.status_code==200
+    summary=response.json()
+    (imported,)=summary["created_boards"]
+    assert summary["cards"]==6
+    assert summary["boards"]=={str(imported):5,str(existing):1}
+
+    titles=[card["title"] for card in client.get(f"/boards/{imported}/cards",headers=headers).json()]
+    assert titles==[f"card {i}" for i in range(5)]
+    events=db_session.query(OutboxEvent).order_by(OutboxEvent.board_id).all()
+    assert {event.action for event in events}=={AuditAction.BOARD_IMPORTED}
+    assert sorted(event.payload["cards"] for event in events)==[1,5]
+
+    bad=body+"\n"+json.dumps({"type":"card","board":"p1","description":"no title"})
+    response=client.post("/boards/import",headers=ndjson_headers,content=bad.encode())
+    assert response.status_code==422
+    assert response.json()["detail"]["line"]==len(records)+1
+    db_session.expire_all()
+    assert db_session.query(Card).count()==6
+
+
+def test_websocket_rejects_malformed_messages_and_cleans_up(client,user_setup,TestSessionLocal,monkeypatch):
+    import pytest
+    import routers.sockets
+    from utils.connection_manager import manager
+    monkeypatch.setattr(routers.sockets,"SessionLocal",TestSessionLocal)
+    token=user_setup
+    headers={"Authorization":f"Bearer {token}"}
+    board_id=client.post("/boards",headers=headers,json={"name":"Strict","description":"d"}).json()["id"]
+
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()=={"type":"error","message":"messages must be JSON text"}
+        ws.send_json({"board_id":board_id})
+        assert ws.receive_json()=={"type":"error","message":"unknown message type"}
+        ws.send_json({"type":"join","board_id":"abc"})
+        assert ws.receive_json()["type"]=="error"
+        ws.send_json({"type":"join","board_ids":[board_id],"last_activity_ids":[1]})
+        assert ws.receive_json()=={"type":"error","message":"last_activity_ids must be an object"}
+        ws.send_json({"type":"join","board_id":board_id})
+        assert ws.receive_json()=={"type":"joined","board_id":board_id}
+    assert board_id not in manager.active_connections
+    assert not manager.clients
+
+    async def broken_replay(*args):
+        raise RuntimeError("replay exploded")
+    monkeypatch.setattr(routers.sockets,"replay_missed_activity",broken_replay)
+    with pytest.raises(RuntimeError):
+        with client.websocket_connect(f"/ws?token={token}") as ws:
+            ws.send_json({"type":"join","board_id":board_id,"last_activity_id":0})
+            assert ws.receive_json()["type"]=="joined"
+            ws.receive_json()
+    assert board_id not in manager.active_connections
+    assert not manager.clients
@@ -1,5 +1,5 @@
 import pytest
-from db.models import Board, Card
+from db.models import Board, Card, OutboxEvent
 def test_create_card(client, db_session, user_setup):
     token = user_setup
 
@@ -181,3 +181,266 @@ def test_delete_card(client, db_session, user_setup):
     
     db_card = db_session.get(Card, card["id"])
     assert db_card is None
+
+
+def _board_with_cards(client, headers, count):
+    board_id = client.post("/boards", headers=headers, json={"name": "Ordered", "description": "d"}).json()["id"]
+    card_ids = [client.post(f"/boards/{board_id}/cards", headers=headers, json={"title": f"card {i}", "description": ""}).json()["id"] for i in range(count)]
+    return board_id, card_ids
+
+
+def _order(client, headers, board_id):
+    return [card["id"] for card in client.get(f"/boards/{board_id}/cards", headers=headers).json()]
+
+
+def test_cards_without_position_are_appended(client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, card_ids = _board_with_cards(client, headers, 3)
+    assert _order(client, headers, board_id) == card_ids
+    positions = [db_session.get(Card, card_id).position for card_id in card_ids]
+    assert positions == [1024.0, 2048.0, 3072.0]
+
+
+def test_move_card_between_neighbours_writes_one_row(client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, (a, b, c) = _board_with_cards(client, headers, 3)
+
+    response = client.post(f"/boards/{board_id}/cards/{c}/move", headers=headers, json={"after_card_id": a, "before_card_id": b})
+    assert response.status_code == 200
+    assert response.json()["position"] == 1536.0
+    assert _order(client, headers, board_id) == [a, c, b]
+
+    # one anchor is enough: the other side is the next card along
+    client.post(f"/boards/{board_id}/cards/{a}/move", headers=headers, json={"after_card_id": b})
+    client.post(f"/boards/{board_id}/cards/{b}/move", headers=headers, json={"before_card_id": c})
+    assert _order(client, headers, board_id) == [b, c, a]
+
+    response = client.post(f"/boards/{board_id}/cards/{a}/move", headers=headers, json={"after_card_id": b, "before_card_id": b})
+    assert response.status_code == 400
+
+
+def test_repeated_moves_trigger_rebalance(client, db_session, user_setup, monkeypatch):
+    from tasks import outbox_relay
+    from tasks.rebalance import rebalance_board_positions
+    from utils.outbox_utils import REBALANCE_REQUESTED
+    scheduled = []
+    monkeypatch.setattr(outbox_relay.rebalance_board_positions, "delay", scheduled.append)
+    monkeypatch.setattr(outbox_relay, "enqueue_activities", lambda events: None)
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, (a, b, c) = _board_with_cards(client, headers, 3)
+
+    # keep dropping alternately into the ever-shrinking gap after the first card
+    moving = [b, c]
+    for i in range(40):
+        client.post(f"/boards/{board_id}/cards/{moving[i % 2]}/move", headers=headers, json={"after_card_id": a})
+    # staged with the move, not sent to the broker on the request path
+    assert scheduled == []
+    assert db_session.query(OutboxEvent).filter_by(board_id=board_id, action=REBALANCE_REQUESTED).count() > 1
+    outbox_relay.relay_outbox_batch()
+    assert scheduled == [board_id]
+    assert db_session.query(OutboxEvent).count() == 0
+    order = _order(client, headers, board_id)
+
+    from tasks import rebalance
+    monkeypatch.setattr(rebalance, "SessionLocal", lambda: db_session)
+    assert rebalance_board_positions(board_id) == 3
+    db_session.expire_all()
+    assert _order(client, headers, board_id) == order
+    positions = sorted(card.position for card in db_session.query(Card).filter_by(board_id=board_id))
+    assert positions == [1024.0, 2048.0, 3072.0]
+
+
+def test_batch_applies_all_operations_in_one_transaction(client, db_session, user_setup):
+    from db.models import OutboxEvent, AuditAction
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, (a, b, c) = _board_with_cards(client, headers, 3)
+    db_session.query(OutboxEvent).delete()
+    db_session.commit()
+
+    response = client.post(f"/boards/{board_id}/cards:batch", headers=headers, json={"operations": [
+        {"op": "create", "title": "new 1"},
+        {"op": "create", "title": "new 2", "description": "second"},
+        {"op": "update", "id": a, "title": "renamed"},
+        {"op": "move", "id": c, "before_card_id": a},
+        {"op": "delete", "id": b},
+    ]})
+    assert response.status_code == 200
+    result = response.json()
+    assert len(result["created_ids"]) == 2
+    assert (result["updated"], result["moved"], result["deleted"]) == (1, 1, 1)
+
+    cards = client.get(f"/boards/{board_id}/cards", headers=headers).json()
+    assert [card["id"] for card in cards] == [c, a] + result["created_ids"]
+    assert cards[1]["title"] == "renamed"
+    assert [event.action for event in db_session.query(OutboxEvent).filter_by(board_id=board_id)] == [AuditAction.CARDS_BATCH]
+
+
+def test_batch_is_rejected_as_a_whole(client, db_session, user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, (a, b) = _board_with_cards(client, headers, 2)
+
+    response = client.post(f"/boards/{board_id}/cards:batch", headers=headers, json={"operations": [
+        {"op": "update", "id": a, "title": "changed"},
+        {"op": "delete", "id": 999999},
+    ]})
+    assert response.status_code == 404
+    db_session.expire_all()
+    assert db_session.get(Card, a).title == "card 0"
+
+    response = client.post(f"/boards/{board_id}/cards:batch", headers=headers, json={"operations": [{"op": "archive", "id": a}]})
+    assert response.status_code == 422
+
+
+def test_conditional_get_returns_304_until_the_board_changes(client, db_session, user_setup, other_user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, (a,) = _board_with_cards(client, headers, 1)
+
+    first = client.get(f"/boards/{board_id}/cards", headers=headers)
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert client.get(f"/boards/{board_id}", headers=headers).headers["ETag"] == etag
+
+    cached = client.get(f"/boards/{board_id}/cards", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    client.patch(f"/boards/{board_id}/cards/{a}", headers=headers, json={"title": "changed"})
+    fresh = client.get(f"/boards/{board_id}/cards", headers={**headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert fresh.json()[0]["title"] == "changed"
+
+    outsider = client.post("/auth/token_json", json={"email": "alice@example.com", "password": "secretpw"}).json()["access_token"]
+    response = client.get(f"/boards/{board_id}/cards", headers={"Authorization": f"Bearer {outsider}", "If-None-Match": fresh.headers["ETag"]})
+    assert response.status_code == 403
+
+
+def test_failed_version_write_drops_the_cached_version(client, db_session, user_setup, monkeypatch):
+    from unittest.mock import AsyncMock, MagicMock
+    from tests.redis_harness import FakeAsyncRedis, FakeSyncRedis
+    from utils import version_utils
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, (a,) = _board_with_cards(client, headers, 1)
+    store, sync = FakeAsyncRedis(), FakeSyncRedis()
+    sync.data = store.data
+    monkeypatch.setattr(version_utils, "async_redis_client", store)
+    monkeypatch.setattr(version_utils, "redis_client", sync)
+    monkeypatch.setattr(version_utils, "_ASYNC_SET_IF_NEWER", AsyncMock())
+    monkeypatch.setattr(version_utils, "_SET_IF_NEWER", MagicMock(side_effect=ConnectionError("redis failing over")))
+
+    etag = client.get(f"/boards/{board_id}/cards", headers=headers).headers["ETag"]
+    version = db_session.get(Board, board_id).version
+    store.data[version_utils.board_version_key(board_id)] = str(version).encode()
+    assert client.get(f"/boards/{board_id}/cards", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # the post-commit write of the new version fails: the old one must not keep answering
+    client.patch(f"/boards/{board_id}/cards/{a}", headers=headers, json={"title": "changed"})
+    assert version_utils.board_version_key(board_id) not in store.data
+    fresh = client.get(f"/boards/{board_id}/cards", headers={**headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()[0]["title"] == "changed"
+
+
+def test_card_list_is_served_from_cache_until_a_write(client, db_session, user_setup, monkeypatch):
+    from utils.card_cache import card_list_cache
+    from tests.redis_harness import FakeAsyncRedis
+    monkeypatch.setattr(card_list_cache, "client", FakeAsyncRedis())
+    monkeypatch.setattr(card_list_cache, "counts", dict.fromkeys(card_list_cache.counts, 0))
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, (a, b) = _board_with_cards(client, headers, 2)
+
+    first = client.get(f"/boards/{board_id}/cards", headers=headers)
+    second = client.get(f"/boards/{board_id}/cards", headers=headers)
+    assert first.json() == second.json()
+    assert (card_list_cache.counts["misses"], card_list_cache.counts["hits"]) == (1, 1)
+
+    client.post(f"/boards/{board_id}/cards/{b}/move", headers=headers, json={"before_card_id": a})
+    moved = client.get(f"/boards/{board_id}/cards", headers=headers).json()
+    assert [card["id"] for card in moved] == [b, a]
+    assert card_list_cache.counts["misses"] == 2
+    assert not [key for key in card_list_cache.client.data if key.endswith(":lock")]
+    import routers.metrics
+    monkeypatch.setattr(routers.metrics, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics", headers={"X-Metrics-Token": "scrape-me"}).json()["card_list_cache"]["hits"] == 1
+
+
+def test_fast_serialization_matches_the_response_models(client, db_session, user_setup, monkeypatch):
+    from db.models import ActivityFeed
+    from utils import serialization_utils
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    board_id, card_ids = _board_with_cards(client, headers, 3)
+    board = db_session.get(Board, board_id)
+    db_session.add(ActivityFeed(board_id=board_id, actor_id=board.created_by, activity_type="CARD_CREATED", message="made", metadata_info={"card_id": card_ids[0]}))
+    db_session.commit()
+
+    def responses():
+        return [client.get(path, headers=headers) for path in (f"/boards/{board_id}/cards", "/boards", f"/boards/{board_id}/feed")]
+
+    expected = [response.json() for response in responses()]
+    for mode in ("validate", "trusted"):
+        monkeypatch.setattr(serialization_utils, "FAST_SERIALIZATION", mode)
+        got = responses()
+        assert all(response.headers["content-type"] == "application/json" for response in got)
+        assert [response.json() for response in got] == expected
+
+
+def test_search_ranks_cards_across_member_boards(client, db_session, user_setup, other_user_setup):
+    headers = {"Authorization": f"Bearer {user_setup}"}
+    from datetime import timedelta
+    from utils.auth_utils import create_access_token
+    other_headers = {"Authorization": f"Bearer {create_access_token(other_user_setup, timedelta(minutes=5))}"}
+    first = client.post("/boards", headers=headers, json={"name": "Roadmap", "description": "d"}).json()["id"]
+    second = client.post("/boards", headers=headers, json={"name": "Ops", "description": "d"}).json()["id"]
+    foreign = client.post("/boards", headers=other_headers, json={"name": "Private", "description": "d"}).json()["id"]
+
+    def card(board_id, title, description, card_headers=headers):
+        return client.post(f"/boards/{board_id}/cards", headers=card_headers, json={"title": title, "description": description}).json()["id"]
+
+    in_title = card(first, "Design review", "walk through the mockups")
+    in_description = card(second, "Sprint planning", "bring the designs for review")
+    card(second, "Rotate keys", "yearly chore")
+    card(foreign, "Design secrets", "not yours", other_headers)
+
+    response = client.get("/search/cards", params={"q": "design"}, headers=headers)
+    assert response.status_code == 200
+    hits = response.json()["items"]
+    assert [hit["id"] for hit in hits] == [in_title, in_description]
+    assert hits[0]["rank"] > hits[1]["rank"] and hits[0]["board_id"] == first
+
+    seen, cursor = [], None
+    while True:
+        page = client.get("/search/cards", params={"q": "review", "limit": 1, **({"cursor": cursor} if cursor else {})}, headers=headers).json()
+        seen += [hit["id"] for hit in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted([in_title, in_description])
+
+    client.patch(f"/boards/{first}/cards/{in_title}", headers=headers, json={"title": "Architecture review"})
+    client.delete(f"/boards/{second}/cards/{in_description}", headers=headers)
+    assert client.get("/search/cards", params={"q": "design"}, headers=headers).json()["items"] == []
+    assert [hit["id"] for hit in client.get("/search/cards", params={"q": "architecture"}, headers=headers).json()["items"]] == [in_title]
+
+    assert client.get("/search/cards", params={"q": "\"*:"}, headers=headers).json() == {"items": [], "next_cursor": None}
+    assert client.get("/search/cards", params={"q": "design", "cursor": "garbage"}, headers=headers).status_code == 400
+
+
+def test_card_list_cache_waiters_yield_to_the_event_loop():
+    import asyncio
+    from utils.card_cache import CardListCache
+    from tests.redis_harness import FakeAsyncRedis
+
+    async def scenario():
+        cache = CardListCache(client=FakeAsyncRedis())
+
+        async def loader_finishes():
+            await asyncio.sleep(0.05)
+            await cache.client.set("board:1:cards:v1", "[]")
+
+        # the loader only gets to run if waiting does not block the loop
+        loader = asyncio.create_task(loader_finishes())
+        body = await cache._wait_for("board:1:cards:v1")
+        await loader
+        return body
+
+    assert asyncio.run(scenario()) == "[]"
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import pytest
+from utils.connection_manager import ConnectionManager, SLOW_CONSUMER_CLOSE_CODE
+from tests.redis_harness import FakeWebSocket, settle
+
+
+def test_slow_client_does_not_stall_board():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2, slow_consumer_policy="drop_oldest")
+        fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+        await manager.connect(1, fast)
+        await manager.connect(1, slow)
+
+        for i in range(4):
+            await manager.broadcast(1, {"type": "activity", "n": i})
+            await settle()
+
+        assert [json.loads(frame)["n"] for frame in fast.sent] == [0, 1, 2, 3]
+        # the first frame is stuck in the blocked send, the queue holds only the newest two
+        slow.unblock.set()
+        await settle()
+        assert [json.loads(frame)["n"] for frame in slow.sent] == [0, 2, 3]
+        assert manager.stats()["boards"][1]["dropped"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_policy_closes_slow_client():
+    async def scenario():
+        manager = ConnectionManager(queue_size=1, slow_consumer_policy="disconnect")
+        fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+        await manager.connect(1, fast)
+        await manager.connect(1, slow)
+
+        for i in range(3):
+            await manager.broadcast_frame(1, json.dumps({"n": i}))
+            await settle()
+
+        assert slow.closed_with == SLOW_CONSUMER_CLOSE_CODE
+        assert manager.active_connections[1] == {fast}
+        assert len(fast.sent) == 3
+        assert manager.stats()["boards"][1]["disconnected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_send_removes_socket():
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, frame):
+            raise RuntimeError("connection reset")
+
+    async def scenario():
+        manager = ConnectionManager()
+        broken = BrokenWebSocket()
+        await manager.connect(1, broken)
+        await manager.broadcast(1, {"type": "activity"})
+        await settle()
+        assert broken not in manager.clients
+        assert 1 not in manager.active_connections
+
+    asyncio.run(scenario())
+
+
+def test_replay_holds_live_frames_and_drops_duplicates():
+    async def scenario():
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        await manager.connect(1, ws, replay=True)
+        # published while the replay query runs: 11 is also in the replay, 12 is not
+        await manager.broadcast(1, {"type": "activity", "activity_id": 11})
+        await manager.broadcast(1, {"type": "activity", "activity_id": 12})
+        await settle()
+        assert ws.sent == []
+
+        replayed = [json.dumps({"type": "activity", "activity_id": i}) for i in (10, 11)]
+        # the client's own last id, not the newest replayed one
+        await manager.finish_replay(1, ws, replayed, last_activity_id=9)
+        await manager.broadcast(1, {"type": "activity", "activity_id": 13})
+        await settle()
+        assert [json.loads(frame)["activity_id"] for frame in ws.sent] == [10, 11, 12, 13]
+
+    asyncio.run(scenario())
+
+
+def test_replay_skips_held_frames_that_were_also_replayed():
+    async def scenario():
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        await manager.connect(1, ws, replay=True)
+        await manager.broadcast(1, {"type": "activity", "activity_id": 7})
+        await manager.broadcast(1, {"type": "resync_required", "board_id": 1})
+
+        replayed = [json.dumps({"type": "activity", "activity_id": i}) for i in (6, 7)]
+        await manager.finish_replay(1, ws, replayed, last_activity_id=5)
+        await settle()
+        assert [json.loads(frame).get("activity_id") for frame in ws.sent] == [6, 7, None]
+
+    asyncio.run(scenario())
+
+
+def test_replay_keeps_held_frames_committed_out_of_order():
+    async def scenario():
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        await manager.connect(1, ws, replay=True)
+        # 11 committed before 10, so the replay query saw 11 but not 10; 10 and 4 (already seen) arrive live
+        await manager.broadcast(1, {"type": "activity", "activity_id": 11})
+        await manager.broadcast(1, {"type": "activity", "activity_id": 10})
+        await manager.broadcast(1, {"type": "activity", "activity_id": 4})
+
+        replayed = [json.dumps({"type": "activity", "activity_id": 11})]
+        await manager.finish_replay(1, ws, replayed, last_activity_id=5)
+        await settle()
+        assert [json.loads(frame)["activity_id"] for frame in ws.sent] == [11, 10]
+
+    asyncio.run(scenario())
+
+
+def test_mux_sockets_get_board_tagged_frames():
+    async def scenario():
+        manager = ConnectionManager()
+        plain, muxed = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(1, plain)
+        for board_id in (1, 2):
+            await manager.connect(board_id, muxed, mux=True)
+
+        await manager.broadcast(1, {"n": 1})
+        await manager.broadcast(2, {"n": 2})
+        await settle()
+        assert [json.loads(frame) for frame in plain.sent] == [{"n": 1}]
+        assert [json.loads(frame) for frame in muxed.sent] == [[1, {"n": 1}], [2, {"n": 2}]]
+
+        await manager.remove(muxed)
+        assert manager.active_connections.keys() == {1}
+        assert muxed not in manager.clients
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import pytest
+import db.database
+
+
+def test_metrics_exposes_db_pools(client, monkeypatch):
+    import routers.metrics
+    monkeypatch.setattr(routers.metrics, "METRICS_TOKEN", "scrape-me")
+    response = client.get("/metrics", headers={"X-Metrics-Token": "scrape-me"})
+    assert response.status_code == 200
+    assert set(response.json()["db_pools"]) >= {"api", "worker", "ws"}
+
+
+def test_metrics_need_the_configured_token(client, monkeypatch):
+    import routers.metrics
+    monkeypatch.setattr(routers.metrics, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(routers.metrics, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"X-Metrics-Token": "guess"}).status_code == 403
+
+
+def test_pool_settings_per_role(monkeypatch):
+    monkeypatch.setattr(db.database, "database_url", "postgresql+psycopg2://u:p@db/taskboard")
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_WORKER_POOL_SIZE", "4")
+
+    assert db.database.engine_options("api")["pool_size"] == 20
+    assert db.database.engine_options("worker")["pool_size"] == 4
+    assert db.database.engine_options("api")["echo"] is False
+
+
+def test_pgbouncer_mode_disables_client_pool(monkeypatch):
+    from sqlalchemy.pool import NullPool
+    monkeypatch.setattr(db.database, "database_url", "postgresql+psycopg2://u:p@db/taskboard")
+    monkeypatch.setattr(db.database, "DB_PGBOUNCER", True)
+
+    assert db.database.engine_options("api") == {"echo": False, "poolclass": NullPool}
+    async_url = db.database.to_async_url(db.database.database_url)
+    assert async_url.query["prepared_statement_cache_size"] == "0"
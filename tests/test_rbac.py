@@ -2,9 +2,14 @@
 Comprehensive RBAC (Role-Based Access Control) tests.
 Tests role-based permissions for board operations, member management, and card operations.
 """
+import json
 import pytest
+from unittest.mock import MagicMock
 from fastapi import HTTPException
-from db.models import Board, BoardMembers, BoardRole, Card
+from sqlalchemy import event
+from db.models import Board, BoardMembers, BoardRole, Card, User
+from utils.permission_utils import BoardPermissionService
+from utils.membership_cache import membership_cache, publish_membership_change, apply_membership_change
 
 
 class TestBoardOwnerPermissions:
@@ -580,3 +585,83 @@ class TestPermissionValidation:
         ).first()
         assert owner_membership is not None
         assert owner_membership.role == BoardRole.owner
+
+
+class TestMembershipCache:
+    """Tests for the cached membership lookups behind BoardPermissionService."""
+
+    def _seed(self, db_session, role):
+        user = User(email="cache@example.com", name="Cache", password_hash="x")
+        db_session.add(user)
+        db_session.flush()
+        board = Board(name="Cached", description="", created_by=user.id)
+        db_session.add(board)
+        db_session.flush()
+        db_session.add(BoardMembers(board_id=board.id, user_id=user.id, role=role))
+        db_session.commit()
+        return board.id, user.id
+
+    def test_role_change_invalidates_cached_membership(self, db_session):
+        """A published membership change must drop the cached role."""
+        board_id, user_id = self._seed(db_session, BoardRole.editor)
+        allowed = {BoardRole.owner, BoardRole.editor}
+        BoardPermissionService.require_role(db_session, board_id, user_id, allowed)
+
+        membership = db_session.query(BoardMembers).filter_by(board_id=board_id, user_id=user_id).first()
+        membership.role = BoardRole.viewer
+        db_session.commit()
+        # still served from the cache until the change is published
+        assert BoardPermissionService.require_role(db_session, board_id, user_id, allowed).role == BoardRole.editor
+
+        publish_membership_change(db_session, board_id, user_id)
+        with pytest.raises(HTTPException) as exc:
+            BoardPermissionService.require_role(db_session, board_id, user_id, allowed)
+        assert exc.value.status_code == 403
+
+    def test_remote_invalidation_drops_whole_board(self, db_session):
+        """Invalidations received over Redis without a user id clear every member of the board."""
+        board_id, user_id = self._seed(db_session, BoardRole.viewer)
+        BoardPermissionService.require_member(db_session, board_id, user_id)
+        assert membership_cache.get(board_id, user_id) is not None
+
+        apply_membership_change(json.dumps({"board_id": board_id, "user_id": None}))
+        assert membership_cache.get(board_id, user_id) is None
+
+    def test_member_boards_checks_many_boards_in_one_query(self, db_session):
+        """Cache misses for a batch of boards are resolved together and cached."""
+        board_id, user_id = self._seed(db_session, BoardRole.viewer)
+        other = Board(name="Other", description="", created_by=user_id)
+        db_session.add(other)
+        db_session.commit()
+        other_id = other.id
+
+        statements = []
+        listen = lambda *args: statements.append(args[2])
+        event.listen(db_session.get_bind(), "before_cursor_execute", listen)
+        try:
+            assert BoardPermissionService.member_boards(db_session, [board_id, other_id], user_id) == {board_id}
+            assert BoardPermissionService.member_boards(db_session, [board_id], user_id) == {board_id}
+        finally:
+            event.remove(db_session.get_bind(), "before_cursor_execute", listen)
+        assert len(statements) == 1
+
+    def test_invalidation_during_lookup_is_not_overwritten(self, db_session):
+        """A role read before a concurrent removal must not be cached after the removal is applied."""
+        board_id, user_id = self._seed(db_session, BoardRole.editor)
+        invalidate = lambda *args: apply_membership_change(json.dumps({"board_id": board_id, "user_id": user_id}))
+        event.listen(db_session.get_bind(), "after_cursor_execute", invalidate)
+        try:
+            assert BoardPermissionService.require_member(db_session, board_id, user_id).role == BoardRole.editor
+            assert BoardPermissionService.member_boards(db_session, [board_id], user_id) == {board_id}
+        finally:
+            event.remove(db_session.get_bind(), "after_cursor_execute", invalidate)
+        assert membership_cache.get(board_id, user_id) is None
+        assert membership_cache.stats()["stale_sets_skipped"] == 2
+
+    def test_failed_publish_is_counted(self, db_session, monkeypatch):
+        """Publishing an invalidation never fails the request; the failure shows up in the metrics."""
+        import utils.membership_cache
+        monkeypatch.setattr(utils.membership_cache.redis_client, "publish", MagicMock(side_effect=ConnectionError("redis down")))
+        failures = membership_cache.stats()["publish_failures"]
+        publish_membership_change(db_session, 1, 2)
+        assert membership_cache.stats()["publish_failures"] == failures + 1
@@ -0,0 +1,69 @@
+from datetime import datetime,timedelta
+from db.models import ActivityFeed,AuditLog,User
+from utils.partition_utils import maintain_partitions,create_partition,create_partition_sql,add_months,RETENTION_POLICIES
+
+
+def test_partition_ranges_cover_whole_months():
+    assert add_months(datetime(2026,11,1),2)==datetime(2027,1,1)
+    assert add_months(datetime(2026,1,1),-1)==datetime(2025,12,1)
+    assert create_partition_sql("activity_feeds",datetime(2026,12,1))==(
+        "CREATE TABLE IF NOT EXISTS activity_feeds_p2026_12 PARTITION OF activity_feeds "
+        "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')"
+    )
+
+
+def test_unpartitioned_tables_fall_back_to_deleting_expired_rows(db_session):
+    user=User(email="retention@example.com",name="r",password_hash="x")
+    db_session.add(user)
+    db_session.commit()
+    now=datetime(2026,10,18)
+    for age in (10,89,91,400):
+        created_at=now-timedelta(days=age)
+        db_session.add(ActivityFeed(board_id=1,actor_id=user.id,activity_type="CARD_CREATED",message=f"{age} days",created_at=created_at))
+        db_session.add(AuditLog(actor_id=user.id,board_id=1,action="CARD_CREATED",payload={},created_at=created_at))
+    db_session.commit()
+
+    policies=[policy._replace(keep_days=90) if policy.table=="activity_feeds" else policy._replace(keep_days=None) for policy in RETENTION_POLICIES]
+    summary=maintain_partitions(db_session,now=now,policies=policies)
+
+    assert summary["deleted"]=={"activity_feeds":2}
+    assert sorted(feed.message for feed in db_session.query(ActivityFeed))==["10 days","89 days"]
+    assert db_session.query(AuditLog).count()==4
+
+
+class RecordingSession:
+    """Answers the catalog lookups of create_partition and records every statement it is sent."""
+    def __init__(self,default,default_has_rows):
+        self.default=default
+        self.default_has_rows=default_has_rows
+        self.statements=[]
+
+    def scalar(self,statement,params=None):
+        sql=str(statement)
+        return self.default if "pg_partitioned_table" in sql else self.default_has_rows
+
+    def execute(self,statement,params=None):
+        self.statements.append(" ".join(str(statement).split()))
+        return type("Result",(),{"rowcount":3})()
+
+
+def test_new_month_takes_its_rows_from_the_default_partition():
+    policy=next(policy for policy in RETENTION_POLICIES if policy.table=="audit_logs")
+    db=RecordingSession("audit_logs_default",True)
+
+    assert create_partition(db,policy,datetime(2026,12,1))==3
+    assert [statement.split(" (")[0] if statement.startswith("INSERT") else statement for statement in db.statements]==[
+        "ALTER TABLE audit_logs DETACH PARTITION audit_logs_default",
+        create_partition_sql("audit_logs",datetime(2026,12,1)),
+        "INSERT INTO audit_logs_p2026_12",
+        "DELETE FROM audit_logs_default WHERE created_at>=:start AND created_at<:end",
+        "ALTER TABLE audit_logs ATTACH PARTITION audit_logs_default DEFAULT",
+    ]
+
+
+def test_new_month_is_created_directly_when_the_default_partition_has_none_of_its_rows():
+    policy=next(policy for policy in RETENTION_POLICIES if policy.table=="audit_logs")
+    db=RecordingSession("audit_logs_default",False)
+
+    assert create_partition(db,policy,datetime(2026,12,1))==0
+    assert db.statements==[create_partition_sql("audit_logs",datetime(2026,12,1))]
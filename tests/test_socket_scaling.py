@@ -0,0 +1,243 @@
+"""Several API instances sharing one (stand-in) Redis: subscriptions follow local sockets."""
+import asyncio
+import json
+import pytest
+from utils.connection_manager import ConnectionManager
+from utils.feed_utils import redis_listener, redis_stream_listener, remove_idle_stream_groups
+from utils.membership_cache import MEMBERSHIP_CHANNEL, membership_cache
+from tests.redis_harness import FakeRedisServer, FakeWebSocket, settle
+
+
+async def wait_for_flush():
+    await asyncio.sleep(0.05)
+
+
+async def start_instances(server, count):
+    managers = [ConnectionManager() for _ in range(count)]
+    tasks = [asyncio.create_task(redis_listener(manager, client=server.client())) for manager in managers]
+    await settle()
+    return managers, tasks
+
+
+async def stop(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_events_only_reach_instances_with_local_sockets():
+    async def scenario():
+        server = FakeRedisServer()
+        (first, second), tasks = await start_instances(server, 2)
+        ws = FakeWebSocket()
+        await first.connect(1, ws)
+        await wait_for_flush()
+
+        assert server.subscriber_count("board:1") == 1
+        assert server.publish("board:1", json.dumps({"type": "activity", "board_id": 1})) == 1
+        assert server.publish("board:2", "{}") == 0
+        await settle()
+        assert len(ws.sent) == 1
+
+        await first.disconnect(1, ws)
+        await wait_for_flush()
+        assert server.subscriber_count("board:1") == 0
+        await stop(tasks)
+
+    asyncio.run(scenario())
+
+
+def test_subscription_changes_are_batched():
+    async def scenario():
+        server = FakeRedisServer()
+        (manager,), tasks = await start_instances(server, 1)
+        sockets = [FakeWebSocket() for _ in range(3)]
+        for board_id, ws in enumerate(sockets, start=1):
+            await manager.connect(board_id, ws)
+        # a leave and re-join inside the flush window nets out
+        await manager.disconnect(3, sockets[2])
+        await manager.connect(3, sockets[2])
+        await wait_for_flush()
+
+        board_commands = [command for command in server.commands if command[1] != (MEMBERSHIP_CHANNEL,)]
+        assert board_commands == [("SUBSCRIBE", ("board:1", "board:2", "board:3"))]
+        await stop(tasks)
+
+    asyncio.run(scenario())
+
+
+def test_membership_invalidation_reaches_every_instance():
+    async def scenario():
+        server = FakeRedisServer()
+        managers, tasks = await start_instances(server, 2)
+        membership_cache.set(5, 9, "editor")
+
+        assert server.publish(MEMBERSHIP_CHANNEL, json.dumps({"board_id": 5, "user_id": 9})) == 2
+        await settle()
+        assert membership_cache.get(5, 9) is None
+        await stop(tasks)
+
+    asyncio.run(scenario())
+
+
+def test_stream_events_survive_a_listener_restart():
+    async def scenario():
+        server = FakeRedisServer()
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        await manager.connect(1, ws)
+        listener = asyncio.create_task(redis_stream_listener(manager, client=server.client(), group="api-1"))
+        await wait_for_flush()
+        assert server.groups["board:1:stream"].keys() == {"api-1"}
+        # a second instance without sockets on the board does not read it
+        other = asyncio.create_task(redis_stream_listener(ConnectionManager(), client=server.client(), group="api-2"))
+        await wait_for_flush()
+
+        server.xadd("board:1:stream", {"data": json.dumps({"n": 1})})
+        await wait_for_flush()
+        await stop([listener])
+
+        server.xadd("board:1:stream", {"data": json.dumps({"n": 2})})
+        # delivered to the group but never acknowledged, as if the listener died mid-batch
+        await server.client().xreadgroup("api-1", "api-1", {"board:1:stream": ">"}, count=1)
+        server.xadd("board:1:stream", {"data": json.dumps({"n": 3})})
+
+        listener = asyncio.create_task(redis_stream_listener(manager, client=server.client(), group="api-1"))
+        await wait_for_flush()
+        assert [json.loads(frame)["n"] for frame in ws.sent] == [1, 2, 3]
+        assert server.groups["board:1:stream"]["api-1"]["pending"] == set()
+        assert server.groups["board:1:stream"].keys() == {"api-1"}
+
+        await manager.disconnect(1, ws)
+        await wait_for_flush()
+        assert server.groups["board:1:stream"] == {}
+        await stop([listener, other])
+
+    asyncio.run(scenario())
+
+
+def test_stream_listener_resumes_after_losing_redis():
+    async def scenario():
+        server = FakeRedisServer()
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        await manager.connect(1, ws)
+        listener = asyncio.create_task(redis_stream_listener(manager, client=server.client(), group="api-1"))
+        await wait_for_flush()
+
+        server.unreachable = True
+        server.xadd("board:1:stream", {"data": json.dumps({"n": 1})})
+        await wait_for_flush()
+        assert not listener.done()
+        server.unreachable = False
+        await asyncio.sleep(0.3)
+
+        assert [json.loads(frame)["n"] for frame in ws.sent] == [1]
+        assert server.groups["board:1:stream"]["api-1"]["pending"] == set()
+        await stop([listener])
+
+    asyncio.run(scenario())
+
+
+def test_resumed_group_reads_its_pending_entries_first():
+    async def scenario():
+        server = FakeRedisServer()
+        manager = ConnectionManager()
+        first = FakeWebSocket()
+        await manager.connect(1, first)
+        listener = asyncio.create_task(redis_stream_listener(manager, client=server.client(), group="api-1"))
+        await wait_for_flush()
+        server.xadd("board:1:stream", {"data": json.dumps({"n": 1})})
+        await wait_for_flush()
+
+        # board 2's group survives from before a restart, with an entry delivered but never acknowledged
+        client = server.client()
+        await client.xgroup_create("board:2:stream", "api-1", id="$", mkstream=True)
+        server.xadd("board:2:stream", {"data": json.dumps({"n": 2})})
+        await client.xreadgroup("api-1", "api-1", {"board:2:stream": ">"}, count=1)
+
+        second = FakeWebSocket()
+        await manager.connect(2, second)
+        await wait_for_flush()
+        await wait_for_flush()
+
+        assert [json.loads(frame)["n"] for frame in second.sent] == [2]
+        assert server.groups["board:2:stream"]["api-1"]["pending"] == set()
+        await stop([listener])
+
+    asyncio.run(scenario())
+
+
+def test_startup_removes_groups_of_instances_that_are_gone():
+    async def scenario():
+        server = FakeRedisServer()
+        client = server.client()
+        for group in ("api-1", "api-gone", "api-never-read"):
+            await client.xgroup_create("board:1:stream", group, id="$", mkstream=True)
+        server.xadd("board:1:stream", {"data": "{}"})
+        for group in ("api-1", "api-gone"):
+            await client.xreadgroup(group, group, {"board:1:stream": ">"}, count=10)
+        server.groups["board:1:stream"]["api-gone"]["consumers"]["api-gone"] -= 7200
+
+        assert await remove_idle_stream_groups(client, keep="api-2", max_idle_ms=3600000) == [("board:1:stream", "api-gone")]
+        assert server.groups["board:1:stream"].keys() == {"api-1", "api-never-read"}
+
+    asyncio.run(scenario())
+
+
+def test_streams_transport_requires_an_instance_id(monkeypatch):
+    import utils.redis_utils
+    monkeypatch.setattr(utils.redis_utils, "EVENT_TRANSPORT", "streams")
+    monkeypatch.setattr(utils.redis_utils, "INSTANCE_ID", None)
+    with pytest.raises(RuntimeError):
+        utils.redis_utils.require_instance_id()
+    monkeypatch.setattr(utils.redis_utils, "INSTANCE_ID", "api-0")
+    utils.redis_utils.require_instance_id()
+
+
+def test_redis_listener_forwards_raw_frames():
+    raw = b'{"type":"activity","activity_id":7,"board_id":3,"message":"caf\xc3\xa9"}'
+
+    async def scenario():
+        server = FakeRedisServer()
+        (manager,), tasks = await start_instances(server, 1)
+        ws = FakeWebSocket()
+        await manager.connect(3, ws)
+        await wait_for_flush()
+        server.publish("board:3", raw)
+        await settle()
+        await stop(tasks)
+        return ws.sent
+
+    assert asyncio.run(scenario()) == [raw.decode()]
+
+
+def test_changes_during_a_flush_are_applied():
+    from utils.feed_utils import BoardSubscriptions
+
+    class SlowPubSub:
+        def __init__(self):
+            self.subscribed = set()
+            self.gate = asyncio.Event()
+
+        async def subscribe(self, *channels):
+            await self.gate.wait()
+            self.subscribed.update(channels)
+
+        async def unsubscribe(self, *channels):
+            self.subscribed.difference_update(channels)
+
+    async def scenario():
+        pubsub = SlowPubSub()
+        subscriptions = BoardSubscriptions(pubsub, flush_delay=0)
+        subscriptions.board_opened(1)
+        await settle()
+        # the first SUBSCRIBE is still in flight
+        subscriptions.board_opened(2)
+        subscriptions.board_closed(1)
+        pubsub.gate.set()
+        await asyncio.wait_for(subscriptions.ready(2), 1)
+        await settle()
+        return pubsub.subscribed, subscriptions.subscribed
+
+    assert asyncio.run(scenario()) == ({"board:2"}, {2})
@@ -1,22 +1,32 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict,namedtuple
 from datetime import datetime,timedelta
 from jose import jwt,JWTError
-from passlib.context import CryptContext
 import os
 from fastapi import Depends,HTTPException,status
 from fastapi.security import OAuth2PasswordBearer
 
 from db.models import User,BoardMembers,BoardRole
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from db.database import SessionLocal
+from db.database import SessionLocal,AsyncSessionLocal
+from utils.db_utils import run_db
+from utils.metrics import register_metrics
+from utils.password_hashing import password_hasher,hash_password,verify_password
 from dotenv import load_dotenv
 load_dotenv()
 ALGORITHM='HS256'
 SECRET_KEY=os.getenv("SECRET_KEY")
 ACCESS_TOKEN_EXPIRY_DURATION=60*24
+TOKEN_CACHE_SIZE=int(os.getenv("TOKEN_CACHE_SIZE","10000"))
 
-pwd_context=CryptContext(schemes=["bcrypt"])
-
-def get_db():
+async def get_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
     db=SessionLocal()
     try:
         yield db
@@ -34,11 +44,31 @@ def authenticate_user(db:Session,email:str,password:str):
         return None
     return user
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def authenticate(db,email:str,password:str):
+    user=await run_db(db,get_user_by_email,email)
+    if not user:
+        return None
+    # bcrypt is CPU bound: it runs in the hashing pool, off the event loop and the API threadpool
+    valid,new_hash=await password_hasher.verify_and_update(password,user.password_hash)
+    if not valid:
+        return None
+    if new_hash:
+        await run_db(db,set_password_hash,user.id,new_hash)
+    return user
+
+def create_user(db:Session,email:str,name:str,password_hash:str):
+    user=User(email=email,name=name,password_hash=password_hash)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
 
-def verify_password(actual_password,hashed_password):
-    return pwd_context.verify(actual_password,hashed_password)
+def set_password_hash(db:Session,user_id:int,password_hash:str):
+    db.execute(update(User).where(User.id==user_id).values(password_hash=password_hash))
+    db.commit()
+
+def get_password_hash(password):
+    return hash_password(password)
 
 def create_access_token(id,expires_time_delta):
     
@@ -57,25 +87,91 @@ def decode_access_token(token):
         raise
 
 
+# who the token says the caller is; endpoints that need the User row ask for get_current_user_record
+Principal=namedtuple("Principal",["id","exp"])
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of sha256(token) -> Principal, each entry living until the token's `exp`.
+
+    Only tokens that passed signature and expiry checks are stored, so a hit
+    skips the HMAC and claim validation entirely; garbage tokens always take
+    the full decode path and never push real ones out.
+    """
+    def __init__(self,maxsize:int=TOKEN_CACHE_SIZE):
+        self.maxsize=maxsize
+        self._entries:OrderedDict[bytes,Principal]=OrderedDict()
+        self._lock=threading.Lock()
+        self.counts={"hits":0,"misses":0}
+
+    def get(self,key:bytes):
+        with self._lock:
+            principal=self._entries.get(key)
+            if principal is not None and principal.exp<=time.time():
+                del self._entries[key]
+                principal=None
+            if principal is None:
+                self.counts["misses"]+=1
+                return None
+            self._entries.move_to_end(key)
+            self.counts["hits"]+=1
+            return principal
+
+    def set(self,key:bytes,principal:Principal):
+        if self.maxsize<=0:
+            return principal
+        with self._lock:
+            self._entries[key]=principal
+            self._entries.move_to_end(key)
+            while len(self._entries)>self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size":len(self._entries),**self.counts}
+
+
+token_cache=VerifiedTokenCache()
+register_metrics("token_cache",token_cache.stats)
+
+
+def authenticate_token(token:str)->Principal:
+    """Principal for a bearer token, verifying it only the first time it is seen; raises JWTError."""
+    key=hashlib.sha256(token.encode()).digest()
+    principal=token_cache.get(key)
+    if principal is not None:
+        return principal
+    payload=decode_access_token(token)
+    try:
+        principal=Principal(id=int(payload["id"]),exp=float(payload["exp"]))
+    except (KeyError,TypeError,ValueError):
+        raise JWTError("token is missing its id or exp claim")
+    return token_cache.set(key,principal)
+
+
 oauth2_scheme=OAuth2PasswordBearer(tokenUrl="/auth/token")
-def get_current_user(token:str=Depends(oauth2_scheme),db:Session=Depends(get_db))->User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+async def get_current_user(token:str=Depends(oauth2_scheme))->Principal:
     try:
-        payload=decode_access_token(token)
-        user_id=int(payload.get("id"))
-        if user_id is None:
-            raise credentials_exception
+        return authenticate_token(token)
     except JWTError:
-        raise credentials_exception
-    
-    user=db.query(User).get(user_id)
-    if not user:
-        raise credentials_exception
-    return user
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    
 
+async def get_current_user_record(principal:Principal=Depends(get_current_user),db:Session=Depends(get_db))->User:
+    user=await run_db(db,lambda session:session.get(User,principal.id))
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
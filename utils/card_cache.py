@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+import uuid
+import threading
+from fastapi import HTTPException,status
+from queries.cards import ListCardQuery
+from queries.handlers import CardQueryHandler
+from utils.serialization_utils import encode
+from schemas.card_schemas import CardOut
+from utils.metrics import register_metrics
+from utils.permission_utils import BoardPermissionService
+from utils.db_utils import run_db
+from utils.redis_utils import async_redis_client
+from utils.version_utils import load_board_version
+
+CARD_CACHE_TTL=int(os.getenv("CARD_CACHE_TTL","300"))
+CARD_CACHE_LOCK_MS=int(os.getenv("CARD_CACHE_LOCK_MS","2000"))
+CARD_CACHE_WAIT_MS=int(os.getenv("CARD_CACHE_WAIT_MS","500"))
+
+_RELEASE_LOCK="""
+if redis.call('GET',KEYS[1])==ARGV[1] then
+  return redis.call('DEL',KEYS[1])
+end
+return 0
+"""
+
+
+class CardListCache:
+    """Serialized card lists in Redis, keyed by board version.
+
+    Every write bumps the board version, so a write never has to touch the
+    cache: readers simply move on to the new key and stale ones expire after
+    CARD_CACHE_TTL. On a miss one reader per key loads from the database
+    under a short SET NX lock while the others wait briefly for its result.
+    Redis is only ever awaited on the asyncio client and only the database
+    load goes through run_db, so waiters never hold up the event loop.
+    """
+    def __init__(self,client=async_redis_client):
+        self.client=client
+        self._lock=threading.Lock()
+        self.counts={"hits":0,"misses":0,"waited":0,"uncached_loads":0,"errors":0}
+
+    def _count(self,name:str):
+        with self._lock:
+            self.counts[name]+=1
+
+    async def get_or_load(self,db,board_id:int,user_id:int)->str:
+        """The board's card list as a JSON document."""
+        await run_db(db,BoardPermissionService.require_member,board_id,user_id)
+        version=await load_board_version(db,board_id)
+        if version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Board not found")
+        key=f"board:{board_id}:cards:v{version}"
+        body=None
+        try:
+            cached=await self.client.get(key)
+            if cached is not None:
+                self._count("hits")
+                return cached.decode()
+            self._count("misses")
+            token=uuid.uuid4().hex
+            if await self.client.set(f"{key}:lock",token,nx=True,px=CARD_CACHE_LOCK_MS):
+                try:
+                    body=await self._load(db,board_id,user_id)
+                    await self.client.set(key,body,ex=CARD_CACHE_TTL)
+                    return body
+                finally:
+                    await self.client.eval(_RELEASE_LOCK,1,f"{key}:lock",token)
+            body=await self._wait_for(key)
+            if body is not None:
+                self._count("waited")
+                return body
+        except HTTPException:
+            raise
+        except Exception as e:
+            self._count("errors")
+            print("card list cache unavailable:",e)
+        if body is not None:
+            # loaded, but Redis failed while storing it or releasing the lock
+            return body
+        self._count("uncached_loads")
+        return await self._load(db,board_id,user_id)
+
+    async def _wait_for(self,key:str)->str|None:
+        deadline=time.monotonic()+CARD_CACHE_WAIT_MS/1000
+        while time.monotonic()<deadline:
+            await asyncio.sleep(0.01)
+            cached=await self.client.get(key)
+            if cached is not None:
+                return cached.decode()
+        return None
+
+    async def _load(self,db,board_id:int,user_id:int)->str:
+        return await run_db(db,lambda session:encode(CardQueryHandler(session).handle(ListCardQuery(board_id=board_id,user_id=user_id)),list[CardOut]).decode())
+
+    def stats(self):
+        with self._lock:
+            counts=dict(self.counts)
+        lookups=counts["hits"]+counts["misses"]
+        counts["hit_ratio"]=round(counts["hits"]/lookups,4) if lookups else None
+        return counts
+
+
+card_list_cache=CardListCache()
+register_metrics("card_list_cache",card_list_cache.stats)
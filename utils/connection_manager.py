@@ -1,53 +1,210 @@
+import os
+import json
+import time
+import asyncio
 from collections import defaultdict
 from fastapi import WebSocket
+from utils.metrics import register_metrics
+from utils.json_utils import dumps
 
-class ConnectionManager:
+WS_SEND_QUEUE_SIZE=int(os.getenv("WS_SEND_QUEUE_SIZE","256"))
+# drop_oldest: a lagging client loses its oldest queued frames; disconnect: it is closed and must resync
+WS_SLOW_CONSUMER_POLICY=os.getenv("WS_SLOW_CONSUMER_POLICY","drop_oldest")
+SLOW_CONSUMER_CLOSE_CODE=1013
+
+
+def mux_frame(board_id:int,frame:str)->str:
+    """The compact multiplexed form, `[board_id,event]`, for sockets joined to several boards."""
+    return f"[{board_id},{frame}]"
+
+
+def _activity_id(frame:str)->float:
+    """Id of an `activity` frame; other frames sort after everything so they are never deduplicated."""
+    try:
+        activity_id=json.loads(frame).get("activity_id")
+    except (ValueError,AttributeError):
+        return float("inf")
+    return activity_id if isinstance(activity_id,int) else float("inf")
+
+
+class ClientConnection:
+    """One socket's bounded send queue, drained by a dedicated writer task."""
+    def __init__(self,ws:WebSocket,manager,maxsize:int,policy:str,mux:bool=False):
+        self.ws=ws
+        self.manager=manager
+        self.policy=policy
+        self.mux=mux
+        self.queue:asyncio.Queue[str]=asyncio.Queue(maxsize=maxsize)
+        self.dropped=0
+        # board_id -> live frames held back while the socket is replaying missed activity for that board
+        self.pending:dict[int,list[str]]={}
+        self.writer=asyncio.create_task(self._write())
+
+    def offer(self,frame:str)->bool:
+        """Queue a frame without waiting; False means the client should be disconnected."""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            if self.policy=="disconnect":
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(frame)
+            self.dropped+=1
+            return True
+
+    async def _write(self):
+        try:
+            while True:
+                frame=await self.queue.get()
+                await self.ws.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("WS SEND FAILED:",repr(e))
+            await self.manager.remove(self.ws)
+
+    async def close(self,code:int|None=None):
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        if code is not None:
+            try:
+                await self.ws.close(code=code)
+            except Exception:
+                pass
+
+
+class BoardFanoutStats:
     def __init__(self):
+        self.messages=0
+        self.frames=0
+        self.dropped=0
+        self.disconnected=0
+        self.last_fanout_ms=0.0
+
+
+class ConnectionManager:
+    def __init__(self,queue_size:int=WS_SEND_QUEUE_SIZE,slow_consumer_policy:str=WS_SLOW_CONSUMER_POLICY):
         self.active_connections: dict[int, set[WebSocket]] = defaultdict(set)
-        
-    async def connect(self, board_id: int, ws: WebSocket):
+        self.clients: dict[WebSocket, ClientConnection] = {}
+        self.boards_by_socket: dict[WebSocket, set[int]] = defaultdict(set)
+        self.fanout_stats: dict[int, BoardFanoutStats] = defaultdict(BoardFanoutStats)
+        self.queue_size=queue_size
+        self.slow_consumer_policy=slow_consumer_policy
+        # set by the Redis listener; told when a board gains its first or loses its last local socket
+        self.subscriptions=None
+
+    async def connect(self, board_id: int, ws: WebSocket, replay: bool = False, mux: bool = False):
+        """Start delivering the board's frames; with `replay`, hold them until `finish_replay`.
+
+        `mux` is fixed by the socket's first join and wraps every frame as `[board_id,event]`.
+        """
+        if ws not in self.clients:
+            self.clients[ws]=ClientConnection(ws,self,self.queue_size,self.slow_consumer_policy,mux)
+        if replay:
+            self.clients[ws].pending[board_id]=[]
+        if not self.active_connections.get(board_id) and self.subscriptions is not None:
+            self.subscriptions.board_opened(board_id)
         self.active_connections[board_id].add(ws)
-        
+        self.boards_by_socket[ws].add(board_id)
+
+
+    async def wait_subscribed(self, board_id: int):
+        """Once this returns, events published for the board reach this instance."""
+        if self.subscriptions is not None:
+            await self.subscriptions.ready(board_id)
+
+    async def finish_replay(self, board_id: int, ws: WebSocket, frames: list[str], last_activity_id: int):
+        """Queue the replayed frames, then the live frames held meanwhile minus those already replayed."""
+        client=self.clients.get(ws)
+        if client is None:
+            return
+        held=client.pending.pop(board_id,[])
+        # held frames overlap the replay when they were committed before the query read them. Ids commit out of
+        # order across consumers, so a held id below the newest replayed one may still be missing from the replay
+        replayed={activity_id for activity_id in map(_activity_id,frames) if activity_id!=float("inf")}
+        fresh=[frame for frame in held if _activity_id(frame)>last_activity_id and _activity_id(frame) not in replayed]
+        for frame in frames+fresh:
+            if client.mux:
+                frame=mux_frame(board_id,frame)
+            if not client.offer(frame):
+                await self.remove(ws,code=SLOW_CONSUMER_CLOSE_CODE)
+                return
 
     async def disconnect(self, board_id: int, ws: WebSocket):
+        client=self.clients.get(ws)
+        if client is not None:
+            client.pending.pop(board_id,None)
         self.active_connections[board_id].discard(ws)
-        
-
+        self.boards_by_socket[ws].discard(board_id)
         if not self.active_connections[board_id]:
-            print(f"BOARD {board_id} HAS NO ACTIVE CONNECTIONS")
+            del self.active_connections[board_id]
+            self.fanout_stats.pop(board_id,None)
+            if self.subscriptions is not None:
+                self.subscriptions.board_closed(board_id)
+        if not self.boards_by_socket[ws]:
+            del self.boards_by_socket[ws]
+            client=self.clients.pop(ws,None)
+            if client is not None:
+                await client.close()
 
-    async def broadcast(self, board_id: int, message: dict):
-        connections = self.active_connections.get(board_id, set())
+    async def remove(self, ws: WebSocket, code: int | None = None):
+        """Drop a socket from every board, e.g. after a failed send or for a slow consumer."""
+        client=self.clients.get(ws)
+        for board_id in list(self.boards_by_socket.get(ws,())):
+            await self.disconnect(board_id,ws)
+        if client is not None and code is not None:
+            await client.close(code)
 
-        print(
-            f"BROADCAST ATTEMPT → board={board_id} "
-            f"connections={len(connections)} "
-            f"payload_type={message.get('type')}"
-        )
+    async def broadcast(self, board_id: int, message: dict):
+        await self.broadcast_frame(board_id,dumps(message))
 
+    async def broadcast_frame(self, board_id: int, frame: str):
+        """Fan an already-encoded text frame out to every socket on the board without awaiting any of them."""
+        connections = self.active_connections.get(board_id)
         if not connections:
-            print(f"BROADCAST ABORTED → no connections for board {board_id}")
             return
 
-        dead_sockets = []
-
+        started=time.perf_counter()
+        stats=self.fanout_stats[board_id]
+        stats.messages+=1
+        slow_sockets=[]
+        muxed=None
         for ws in connections:
-            try:
-                await ws.send_json(message)
-                print("WS MESSAGE SENT")
-            except Exception as e:
-                print("WS SEND FAILED:", repr(e))
-                dead_sockets.append(ws)
+            client=self.clients[ws]
+            if board_id in client.pending:
+                client.pending[board_id].append(frame)
+                continue
+            if client.mux and muxed is None:
+                muxed=mux_frame(board_id,frame)
+            dropped=client.dropped
+            if client.offer(muxed if client.mux else frame):
+                stats.frames+=1
+                stats.dropped+=client.dropped-dropped
+            else:
+                slow_sockets.append(ws)
 
-        # cleanup broken sockets
-        for ws in dead_sockets:
-            self.active_connections[board_id].discard(ws)
-            print("REMOVED DEAD SOCKET")
+        for ws in slow_sockets:
+            stats.disconnected+=1
+            await self.remove(ws,code=SLOW_CONSUMER_CLOSE_CODE)
+        stats.last_fanout_ms=(time.perf_counter()-started)*1000
 
-        print(
-            f"BROADCAST COMPLETE → board={board_id} "
-            f"remaining_connections={len(self.active_connections[board_id])}"
-        )
+    def stats(self):
+        return {
+            "connections":len(self.clients),
+            "boards":{
+                board_id:{
+                    "connections":len(self.active_connections.get(board_id,())),
+                    "messages":stats.messages,
+                    "frames":stats.frames,
+                    "dropped":stats.dropped,
+                    "disconnected":stats.disconnected,
+                    "last_fanout_ms":round(stats.last_fanout_ms,3),
+                }
+                for board_id,stats in self.fanout_stats.items()
+            },
+        }
 
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
+register_metrics("websocket_fanout",manager.stats)
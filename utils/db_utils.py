@@ -0,0 +1,83 @@
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql,sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+
+def dialect_insert(db,table):
+    dialect=db.get_bind().dialect.name
+    if dialect=="postgresql":
+        return postgresql.insert(table)
+    if dialect=="sqlite":
+        return sqlite.insert(table)
+    return insert(table)
+
+
+def insert_on_conflict_do_nothing(db,table,values:dict,index_elements:list[str]):
+    """Single round-trip INSERT that skips rows violating `index_elements`; returns rows inserted."""
+    stmt=dialect_insert(db,table).values(**values)
+    if hasattr(stmt,"on_conflict_do_nothing"):
+        return db.execute(stmt.on_conflict_do_nothing(index_elements=index_elements)).rowcount
+    try:
+        with db.begin_nested():
+            return db.execute(stmt).rowcount
+    except IntegrityError:
+        return 0
+
+
+def insert_many_on_conflict_do_nothing(db,table,rows:list[dict],index_elements:list[str],returning):
+    """Bulk INSERT that skips rows violating `index_elements`; returns `returning` for the rows inserted."""
+    stmt=dialect_insert(db,table)
+    if hasattr(stmt,"on_conflict_do_nothing"):
+        return db.scalars(stmt.on_conflict_do_nothing(index_elements=index_elements).returning(returning),rows).all()
+    inserted=[]
+    for row in rows:
+        try:
+            with db.begin_nested():
+                inserted.append(db.scalar(insert(table).values(**row).returning(returning)))
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def after_db_io(session,call,async_call):
+    """Run non-database I/O (Redis) caused by work on `session`.
+
+    Inside `run_db` on an AsyncSession the sync code runs on the event loop
+    itself, where a blocking Redis call would stall every request, so
+    `async_call` is queued and awaited once `run_sync` returns. Everywhere
+    else (threadpool mode, Celery workers) `call` runs right away.
+    """
+    pending=session.info.get("deferred_io")
+    if pending is None:
+        call()
+    else:
+        pending.append(async_call)
+
+
+async def run_db(db,fn,*args,**kwargs):
+    """Call `fn(session, *args)` without blocking the event loop, for both session flavours.
+
+    An AsyncSession runs it through `run_sync` (I/O awaits on the driver), a
+    plain Session runs it in the threadpool like a sync endpoint would.
+    """
+    if isinstance(db,AsyncSession):
+        pending=db.info["deferred_io"]=[]
+        try:
+            return await db.run_sync(fn,*args,**kwargs)
+        finally:
+            db.info.pop("deferred_io",None)
+            for async_call in pending:
+                await async_call()
+    return await run_in_threadpool(fn,db,*args,**kwargs)
+
+
+class AsyncHandler:
+    handler_class=None
+
+    def __init__(self,db):
+        self.db=db
+
+    async def handle(self,message):
+        return await run_db(self.db,lambda session:self.handler_class(session).handle(message))
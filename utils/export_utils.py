@@ -0,0 +1,65 @@
+import os
+import csv
+import io
+import enum
+from datetime import datetime
+from sqlalchemy import select
+from db.database import SessionLocal
+from db.models import Board,BoardMembers,Card,AuditLog
+from utils.json_utils import dumps
+
+EXPORT_CHUNK_ROWS=int(os.getenv("EXPORT_CHUNK_ROWS","1000"))
+
+CSV_COLUMNS=["record_type","id","board_id","user_id","role","name","title","description","position","is_complete","action","payload","created_by","actor_id","created_at","updated_at"]
+
+
+def _plain(value):
+    if isinstance(value,datetime):
+        return value.isoformat()
+    if isinstance(value,enum.Enum):
+        return value.value
+    return value
+
+
+def _sections(board_id:int):
+    """(record_type, statement) pairs in export order; each is read with a server-side cursor."""
+    return [
+        ("board",select(Board.id,Board.name,Board.description,Board.created_by,Board.created_at,Board.updated_at).where(Board.id==board_id)),
+        ("member",select(BoardMembers.user_id,BoardMembers.role).where(BoardMembers.board_id==board_id).order_by(BoardMembers.id)),
+        ("card",select(Card.id,Card.title,Card.description,Card.position,Card.is_complete,Card.created_by,Card.created_at,Card.updated_at).where(Card.board_id==board_id).order_by(Card.position,Card.id)),
+        ("audit",select(AuditLog.id,AuditLog.actor_id,AuditLog.action,AuditLog.payload,AuditLog.created_at).where(AuditLog.board_id==board_id).order_by(AuditLog.id)),
+    ]
+
+
+def _csv_line(writer,buffer,record:dict)->str:
+    writer.writerow([dumps(value) if isinstance(value,(dict,list)) else value for value in (record.get(column) for column in CSV_COLUMNS)])
+    line=buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return line
+
+
+def iter_board_export(board_id:int,format:str="ndjson",session_factory=None,chunk_rows:int|None=None):
+    """Yield the board, its members, cards and audit history as NDJSON or CSV text chunks.
+
+    Rows are fetched `chunk_rows` at a time (`yield_per`, a server-side cursor
+    on Postgres) and each chunk is written out before the next is read, so
+    memory does not grow with the board. Runs on its own session because the
+    response outlives the request's.
+    """
+    buffer=io.StringIO()
+    writer=csv.writer(buffer)
+    if format=="csv":
+        yield _csv_line(writer,buffer,{column:column for column in CSV_COLUMNS})
+    db=(session_factory or SessionLocal)()
+    try:
+        for record_type,stmt in _sections(board_id):
+            result=db.execute(stmt.execution_options(yield_per=chunk_rows or EXPORT_CHUNK_ROWS))
+            for rows in result.partitions():
+                lines=[]
+                for row in rows:
+                    record={"record_type":record_type,"board_id":board_id,**{key:_plain(value) for key,value in row._mapping.items()}}
+                    lines.append(_csv_line(writer,buffer,record) if format=="csv" else dumps(record)+"\n")
+                yield "".join(lines)
+    finally:
+        db.close()
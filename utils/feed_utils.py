@@ -1,9 +1,15 @@
 import os
 import asyncio
-from db.database import SessionLocal
+from sqlalchemy import select
+from db.database import WsSessionLocal as SessionLocal
 from db.models import ActivityFeed
 import redis.asyncio as redis
-import json
+from utils.redis_utils import REDIS_URL,INSTANCE_ID,board_stream
+from utils.membership_cache import MEMBERSHIP_CHANNEL,apply_membership_change
+from utils.json_utils import dumps
+
+# a client further behind than this gets `resync_required` and refetches the feed instead
+WS_REPLAY_LIMIT=int(os.getenv("WS_REPLAY_LIMIT","500"))
 
 last_sent_activity_id: dict[int, int] = {}
 
@@ -52,13 +58,243 @@ async def activity_feed_dispatcher(manager):
         finally:
             db.close()
 
-REDIS_URL = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
+def activity_payload(activity_id,board_id,actor_id,activity_type,message,created_at):
+    """The `activity` event as published on `board:{id}` and replayed to resuming sockets."""
+    return {"type":"activity","activity_id":activity_id,"board_id":board_id,"actor_id":actor_id,"activity_type":activity_type,"message":message,"created_at":created_at.isoformat()}
+
+
+def load_missed_activity(db,board_id:int,last_activity_id:int,limit:int|None=None):
+    """Encoded frames for the board's activity after `last_activity_id`, oldest first.
+
+    Returns None when more than `limit` (default WS_REPLAY_LIMIT) rows were missed.
+    """
+    limit=limit or WS_REPLAY_LIMIT
+    rows=db.execute(
+        select(ActivityFeed.id,ActivityFeed.board_id,ActivityFeed.actor_id,ActivityFeed.activity_type,ActivityFeed.message,ActivityFeed.created_at)
+        .where(ActivityFeed.board_id==board_id,ActivityFeed.id>last_activity_id)
+        .order_by(ActivityFeed.id.asc())
+        .limit(limit+1)
+    ).all()
+    if len(rows)>limit:
+        return None
+    return [dumps(activity_payload(*row)) for row in rows]
+
+
+SUBSCRIPTION_FLUSH_MS=int(os.getenv("SUBSCRIPTION_FLUSH_MS","10"))
+STREAM_READ_COUNT=int(os.getenv("STREAM_READ_COUNT","500"))
+STREAM_BLOCK_MS=int(os.getenv("STREAM_BLOCK_MS","100"))
+# another instance's group none of whose consumers has read for this long belongs to an instance that is gone
+STREAM_GROUP_MAX_IDLE_MS=int(os.getenv("STREAM_GROUP_MAX_IDLE_MS","3600000"))
+# a lost Redis connection is retried after this, doubling up to STREAM_RETRY_MAX_MS
+STREAM_RETRY_MS=int(os.getenv("STREAM_RETRY_MS","100"))
+STREAM_RETRY_MAX_MS=int(os.getenv("STREAM_RETRY_MAX_MS","5000"))
+REDIS_CONNECTION_ERRORS=(redis.ConnectionError,redis.TimeoutError,OSError)
+
+
+class BoardSubscriptions:
+    """Keeps this instance subscribed to exactly the `board:{id}` channels it has local sockets for.
+
+    Joins and leaves only mark the desired set; a flush shortly after sends
+    the difference as one SUBSCRIBE and one UNSUBSCRIBE, so bursts of
+    reconnects are batched and a leave followed by a re-join costs nothing.
+    """
+    def __init__(self,pubsub,flush_delay:float=SUBSCRIPTION_FLUSH_MS/1000):
+        self.pubsub=pubsub
+        self.flush_delay=flush_delay
+        self.wanted:set[int]=set()
+        self.subscribed:set[int]=set()
+        self._flush_task=None
+
+    def board_opened(self,board_id:int):
+        self.wanted.add(board_id)
+        self._schedule_flush()
+
+    def board_closed(self,board_id:int):
+        self.wanted.discard(board_id)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task=asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    async def ready(self,board_id:int):
+        """Wait until the board's channel subscription has been sent."""
+        if board_id in self.wanted and board_id not in self.subscribed and self._flush_task is not None:
+            await asyncio.shield(self._flush_task)
+
+    async def flush(self):
+        # joins and leaves that arrive while a command is in flight are picked up by the next round
+        while self.wanted!=self.subscribed:
+            to_subscribe=self.wanted-self.subscribed
+            to_unsubscribe=self.subscribed-self.wanted
+            if to_subscribe:
+                await self._subscribe(sorted(to_subscribe))
+                self.subscribed|=to_subscribe
+            if to_unsubscribe:
+                await self._unsubscribe(sorted(to_unsubscribe))
+                self.subscribed-=to_unsubscribe
+
+    async def _subscribe(self,board_ids:list[int]):
+        await self.pubsub.subscribe(*[f"board:{board_id}" for board_id in board_ids])
+
+    async def _unsubscribe(self,board_ids:list[int]):
+        await self.pubsub.unsubscribe(*[f"board:{board_id}" for board_id in board_ids])
+
+
+class BoardStreamSubscriptions(BoardSubscriptions):
+    """The Streams counterpart: this instance's consumer group on each `board:{id}:stream` it has sockets for.
+
+    A group is created at the stream's end when the first local socket joins
+    and destroyed when the last one leaves. Boards in `catching_up` have
+    their group's pending entries (delivered, never acknowledged) read
+    again from "0" before they move on to new entries with ">".
+    """
+    def __init__(self,client,group:str,flush_delay:float=SUBSCRIPTION_FLUSH_MS/1000):
+        super().__init__(None,flush_delay)
+        self.client=client
+        self.group=group
+        self.catching_up:set[int]=set()
+
+    def read_ids(self)->dict[str,str]:
+        return {board_stream(board_id):"0" if board_id in self.catching_up else ">" for board_id in self.subscribed}
+
+    async def _subscribe(self,board_ids:list[int]):
+        for board_id in board_ids:
+            try:
+                await self.client.xgroup_create(board_stream(board_id),self.group,id="$",mkstream=True)
+            except redis.ResponseError as e:
+                # BUSYGROUP: left over from before a listener restart, resume where it stopped
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self.catching_up.add(board_id)
 
-async def redis_listener(manager):
-     client=redis.from_url(REDIS_URL)
+    async def _unsubscribe(self,board_ids:list[int]):
+        for board_id in board_ids:
+            self.catching_up.discard(board_id)
+            await self.client.xgroup_destroy(board_stream(board_id),self.group)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value,bytes) else value
+
+
+async def membership_listener(client):
+    delay=STREAM_RETRY_MS
+    while True:
+        pubsub=client.pubsub()
+        try:
+            await pubsub.subscribe(MEMBERSHIP_CHANNEL)
+            delay=STREAM_RETRY_MS
+            async for message in pubsub.listen():
+                if message and message.get("type")=="message":
+                    apply_membership_change(_decode(message.get("data")))
+        except REDIS_CONNECTION_ERRORS as e:
+            print("membership listener lost Redis, retrying:",e)
+            await asyncio.sleep(delay/1000)
+            delay=min(delay*2,STREAM_RETRY_MAX_MS)
+        finally:
+            await pubsub.close()
+
+
+async def remove_idle_stream_groups(client,keep:str,max_idle_ms:int=STREAM_GROUP_MAX_IDLE_MS)->list[tuple[str,str]]:
+    """Destroy other instances' consumer groups whose consumers have all been idle for `max_idle_ms`.
+
+    A live instance keeps reading every stream it has a group on, so such a
+    group was left by an instance that no longer runs, and its pending
+    entries would otherwise stay in Redis. Groups that were never read hold
+    no pending entries and are left alone.
+    """
+    removed=[]
+    async for stream in client.scan_iter(match="board:*:stream",count=500):
+        stream=_decode(stream)
+        for info in await client.xinfo_groups(stream):
+            group=_decode(info["name"])
+            if group==keep:
+                continue
+            consumers=await client.xinfo_consumers(stream,group)
+            if consumers and all(consumer["idle"]>=max_idle_ms for consumer in consumers):
+                await client.xgroup_destroy(stream,group)
+                removed.append((stream,group))
+    return removed
+
+
+async def redis_stream_listener(manager,client=None,group:str|None=None):
+    """EVENT_TRANSPORT=streams: read board events with XREADGROUP in batches, XACK once broadcast.
+
+    Entries delivered to this group but never acknowledged (a listener that
+    died mid-batch) are read again first, per stream. A lost connection is
+    retried with backoff; the groups keep their position meanwhile.
+    """
+    group=group or INSTANCE_ID
+    client=client or redis.from_url(REDIS_URL)
+    try:
+        removed=await remove_idle_stream_groups(client,group)
+        if removed:
+            print("removed idle stream groups:",removed)
+    except Exception as e:
+        print("idle stream group cleanup failed:",e)
+    membership_task=asyncio.create_task(membership_listener(client))
+    subscriptions=BoardStreamSubscriptions(client,group)
+    for board_id in list(manager.active_connections):
+        subscriptions.board_opened(board_id)
+    manager.subscriptions=subscriptions
+    print("reading board streams as group",group)
+    delay=STREAM_RETRY_MS
+    try:
+        while True:
+            try:
+                # also retries group creation that failed while Redis was away
+                await subscriptions.flush()
+                if not subscriptions.subscribed:
+                    await asyncio.sleep(STREAM_BLOCK_MS/1000)
+                    continue
+                try:
+                    response=await client.xreadgroup(group,group,subscriptions.read_ids(),count=STREAM_READ_COUNT,block=STREAM_BLOCK_MS)
+                except redis.ResponseError as e:
+                    # NOGROUP: a board was unsubscribed while the read was in flight
+                    print("stream read failed:",e)
+                    continue
+                for stream,entries in response or ():
+                    stream=_decode(stream)
+                    board_id=int(stream.split(":")[1])
+                    if not entries:
+                        # nothing left pending for this board: read new entries from now on
+                        subscriptions.catching_up.discard(board_id)
+                        continue
+                    for _,fields in entries:
+                        await manager.broadcast_frame(board_id,_decode(fields.get(b"data",fields.get("data"))))
+                    await client.xack(stream,group,*[entry_id for entry_id,_ in entries])
+                delay=STREAM_RETRY_MS
+            except REDIS_CONNECTION_ERRORS as e:
+                # the groups keep their position; entries read but not acknowledged are read again from "0"
+                print("stream listener lost Redis, retrying:",e)
+                subscriptions.catching_up|=subscriptions.subscribed
+                await asyncio.sleep(delay/1000)
+                delay=min(delay*2,STREAM_RETRY_MAX_MS)
+    except Exception as e:
+        print(e)
+    finally:
+        manager.subscriptions=None
+        membership_task.cancel()
+        await asyncio.gather(membership_task,return_exceptions=True)
+        await client.close()
+
+
+async def redis_listener(manager,client=None):
+     client=client or redis.from_url(REDIS_URL)
      pubsub=client.pubsub()
-     await pubsub.psubscribe("board:*")
-     print("subscribed to board channel")
+     # membership invalidations concern every instance, board events only those with local sockets
+     await pubsub.subscribe(MEMBERSHIP_CHANNEL)
+     subscriptions=BoardSubscriptions(pubsub)
+     for board_id in list(manager.active_connections):
+        subscriptions.board_opened(board_id)
+     await subscriptions.flush()
+     manager.subscriptions=subscriptions
+     print("subscribed to board channels")
      try:
         async for message in pubsub.listen():
             
@@ -71,18 +307,23 @@ async def redis_listener(manager):
             channel=raw_channel.decode() if isinstance(raw_channel,bytes) else raw_channel
             raw_data=message.get("data")
             data=raw_data.decode() if isinstance(raw_data,bytes) else raw_data
-              
-            event=json.loads(data)
-            board_id=int(channel.split(":")[1])
-            await manager.broadcast(board_id,event)
+            if channel==MEMBERSHIP_CHANNEL:
+                apply_membership_change(data)
+                continue
+
+            # the channel name routes the event; the payload goes out as the already-encoded text frame
+            try:
+                board_id=int(channel.split(":")[1])
+            except (IndexError,ValueError):
+                print("ignoring message on unexpected channel:",channel)
+                continue
+            await manager.broadcast_frame(board_id,data)
             
      
      except Exception as e:
         print(e)
      finally:
+        manager.subscriptions=None
         await pubsub.unsubscribe()
         await pubsub.close()
         await client.close()
-                
-
-          
@@ -0,0 +1,146 @@
+import os
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+from fastapi import HTTPException,status
+from pydantic import ValidationError
+from sqlalchemy import insert
+from db.models import Board,BoardMembers,BoardRole,Card,AuditAction
+from schemas.boards_schemas import BoardCreate
+from schemas.card_schemas import CardCreate
+from utils.permission_utils import BoardPermissionService
+from utils.outbox_utils import add_outbox_event
+from utils.ordering_utils import position_between,next_position
+from utils.version_utils import bump_board_version
+
+IMPORT_CHUNK_ROWS=int(os.getenv("IMPORT_CHUNK_ROWS","5000"))
+
+CARD_COLUMNS=["title","description","board_id","position","is_complete","created_by","created_at","updated_at"]
+
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks into text lines without holding more than one line."""
+    tail=b""
+    async for chunk in chunks:
+        tail+=chunk
+        *lines,tail=tail.split(b"\n")
+        for line in lines:
+            yield line.decode()
+    if tail:
+        yield tail.decode()
+
+
+class BoardImporter:
+    """Load NDJSON board and card records in chunks inside one transaction.
+
+    A `{"type": "board", "ref": ..., "name": ..., "description": ...}` line
+    creates a board the importing user owns. A `{"type": "card", ...}` line
+    (validated as CardCreate) targets `"board": ref` from the same file or
+    `"board_id"` of an existing board the user owns. Each board gets one
+    BOARD_IMPORTED activity instead of an event per card.
+    """
+    def __init__(self,user_id:int,chunk_rows:int|None=None,progress=None):
+        self.user_id=user_id
+        self.chunk_rows=chunk_rows or IMPORT_CHUNK_ROWS
+        self.progress=progress
+        self.refs:dict[str,int]={}
+        self.created_boards:list[int]=[]
+        self.next_positions:dict[int,float]={}
+        self.card_counts:dict[int,int]=defaultdict(int)
+        self.pending:list[dict]=[]
+        self.line=0
+
+    def _invalid(self,error):
+        return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,detail={"line":self.line,"error":error})
+
+    def add_lines(self,db,lines:list[str]):
+        for line in lines:
+            self.line+=1
+            if not line.strip():
+                continue
+            try:
+                record=json.loads(line)
+                kind=record.pop("type")
+                if kind=="board":
+                    ref=record.pop("ref",None)
+                    self._add_board(db,BoardCreate(**record),ref)
+                elif kind=="card":
+                    board_ref,board_id=record.pop("board",None),record.pop("board_id",None)
+                    self._add_card(db,CardCreate(**record),self._target_board(db,board_ref,board_id))
+                else:
+                    raise self._invalid(f"unknown record type {kind!r}")
+            except (ValueError,KeyError,TypeError,AttributeError) as e:
+                raise self._invalid(e.errors(include_url=False,include_context=False) if isinstance(e,ValidationError) else str(e))
+
+    def _add_board(self,db,board:BoardCreate,ref:str|None):
+        board_id=db.scalar(insert(Board).values(name=board.name,description=board.description,created_by=self.user_id).returning(Board.id))
+        db.execute(insert(BoardMembers).values(board_id=board_id,user_id=self.user_id,role=BoardRole.owner))
+        if ref is not None:
+            self.refs[str(ref)]=board_id
+        self.created_boards.append(board_id)
+        self.next_positions[board_id]=position_between(None,None)
+        self.card_counts[board_id]+=0
+
+    def _target_board(self,db,board_ref,board_id)->int:
+        if board_ref is not None:
+            if str(board_ref) not in self.refs:
+                raise self._invalid(f"unknown board ref {board_ref!r}")
+            return self.refs[str(board_ref)]
+        if board_id is None:
+            raise self._invalid("card needs a board ref or board_id")
+        board_id=int(board_id)
+        if board_id not in self.next_positions:
+            # one check per existing board for the whole import
+            BoardPermissionService.require_role(db,board_id,self.user_id,{BoardRole.owner})
+            self.next_positions[board_id]=next_position(db,board_id)
+        return board_id
+
+    def _add_card(self,db,card:CardCreate,board_id:int):
+        position=card.position
+        if position is None:
+            position=self.next_positions[board_id]
+        self.next_positions[board_id]=max(self.next_positions[board_id],position_between(position,None))
+        now=datetime.now()
+        self.pending.append({"title":card.title,"description":card.description,"board_id":board_id,"position":position,"is_complete":False,"created_by":self.user_id,"created_at":now,"updated_at":now})
+        self.card_counts[board_id]+=1
+        if len(self.pending)>=self.chunk_rows:
+            self.flush(db)
+
+    def flush(self,db):
+        if not self.pending:
+            return
+        if not self._copy_cards(db):
+            db.execute(insert(Card).values(self.pending))
+        self.pending=[]
+        if self.progress is not None:
+            self.progress(self.summary())
+
+    def _copy_cards(self,db)->bool:
+        """COPY the pending chunk on Postgres (psycopg2); False where COPY is unavailable."""
+        if db.get_bind().dialect.name!="postgresql":
+            return False
+        cursor=db.connection().connection.cursor()
+        if not hasattr(cursor,"copy_expert"):
+            return False
+        buffer=io.StringIO()
+        # quoting every string keeps empty descriptions from being read back as NULL
+        writer=csv.writer(buffer,quoting=csv.QUOTE_NONNUMERIC)
+        for row in self.pending:
+            writer.writerow([row[column].isoformat() if isinstance(row[column],datetime) else row[column] for column in CARD_COLUMNS])
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY cards ({','.join(CARD_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",buffer)
+        return True
+
+    def finish(self,db):
+        self.flush(db)
+        for board_id,cards in self.card_counts.items():
+            if board_id not in self.created_boards:
+                bump_board_version(db,board_id)
+            add_outbox_event(db,actor_id=self.user_id,board_id=board_id,action=AuditAction.BOARD_IMPORTED,payload={"cards":cards,"created":board_id in self.created_boards})
+        db.commit()
+        return self.summary()
+
+    def summary(self):
+        return {"created_boards":self.created_boards,"boards":dict(self.card_counts),"cards":sum(self.card_counts.values())}
@@ -0,0 +1,13 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+
+
+def dumps(obj)->str:
+    """Encode to a JSON text frame, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj,separators=(",",":"))
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict,namedtuple
+from utils.metrics import register_metrics
+from utils.redis_utils import redis_client,async_redis_client
+from utils.db_utils import after_db_io
+
+MEMBERSHIP_CACHE_TTL=float(os.getenv("MEMBERSHIP_CACHE_TTL","30"))
+MEMBERSHIP_CACHE_SIZE=int(os.getenv("MEMBERSHIP_CACHE_SIZE","10000"))
+# matches the board:* pattern the API instances already listen on
+MEMBERSHIP_CHANNEL="board:members"
+
+CachedMembership=namedtuple("CachedMembership",["board_id","user_id","role"])
+
+
+class MembershipCache:
+    """Bounded LRU of (board_id, user_id) -> role with a per-entry TTL.
+
+    Only positive lookups are cached, so a freshly added member is never
+    rejected from a stale entry; removals and role changes are dropped via
+    `invalidate`, locally and on every other instance through Redis. A
+    reader takes `read_started()` before querying the database and passes
+    it to `set`, which drops the row if the key was invalidated meanwhile,
+    so a read that raced a removal cannot cache the old role.
+    """
+    def __init__(self,maxsize:int=MEMBERSHIP_CACHE_SIZE,ttl:float=MEMBERSHIP_CACHE_TTL):
+        self.maxsize=maxsize
+        self.ttl=ttl
+        self._entries:OrderedDict[tuple[int,int],tuple[float,CachedMembership]]=OrderedDict()
+        # (board_id, user_id or None for the whole board) -> monotonic time of the last invalidation
+        self._invalidated_at:dict[tuple[int,int|None],float]={}
+        self._lock=threading.Lock()
+        self.counts={"hits":0,"misses":0,"stale_sets_skipped":0,"invalidations":0,"publish_failures":0}
+
+    def get(self,board_id:int,user_id:int):
+        key=(board_id,user_id)
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is None:
+                self.counts["misses"]+=1
+                return None
+            expires_at,membership=entry
+            if expires_at<time.monotonic():
+                del self._entries[key]
+                self.counts["misses"]+=1
+                return None
+            self._entries.move_to_end(key)
+            self.counts["hits"]+=1
+            return membership
+
+    def read_started(self)->float:
+        return time.monotonic()
+
+    def set(self,board_id:int,user_id:int,role,read_started:float|None=None):
+        membership=CachedMembership(board_id,user_id,role)
+        if self.maxsize<=0 or self.ttl<=0:
+            return membership
+        with self._lock:
+            if read_started is not None and max(self._invalidated_at.get((board_id,user_id),0),self._invalidated_at.get((board_id,None),0))>=read_started:
+                self.counts["stale_sets_skipped"]+=1
+                return membership
+            self._entries[(board_id,user_id)]=(time.monotonic()+self.ttl,membership)
+            self._entries.move_to_end((board_id,user_id))
+            while len(self._entries)>self.maxsize:
+                self._entries.popitem(last=False)
+        return membership
+
+    def invalidate(self,board_id:int,user_id:int|None=None):
+        with self._lock:
+            now=time.monotonic()
+            self._invalidated_at[(board_id,user_id)]=now
+            self.counts["invalidations"]+=1
+            # a read that started before the TTL window would have expired from the cache anyway
+            if len(self._invalidated_at)>self.maxsize:
+                self._invalidated_at={key:at for key,at in self._invalidated_at.items() if at>=now-self.ttl}
+            if user_id is not None:
+                self._entries.pop((board_id,user_id),None)
+                return
+            for key in [key for key in self._entries if key[0]==board_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated_at.clear()
+
+    def count(self,counter:str):
+        with self._lock:
+            self.counts[counter]+=1
+
+    def stats(self):
+        with self._lock:
+            return {"entries":len(self._entries),**self.counts}
+
+
+membership_cache=MembershipCache()
+register_metrics("membership_cache",membership_cache.stats)
+
+
+def publish_membership_change(db,board_id:int,user_id:int|None=None):
+    """Drop the cached membership here, and on every other instance once the publish on `db`'s behalf goes out."""
+    membership_cache.invalidate(board_id,user_id)
+    message=json.dumps({"board_id":board_id,"user_id":user_id})
+    after_db_io(db,lambda:_publish(message),lambda:_async_publish(message))
+
+
+def _publish(message:str):
+    try:
+        redis_client.publish(MEMBERSHIP_CHANNEL,message)
+    except Exception:
+        # other instances fall back to the entry TTL; the count shows up on GET /metrics
+        membership_cache.count("publish_failures")
+
+
+async def _async_publish(message:str):
+    try:
+        await async_redis_client.publish(MEMBERSHIP_CHANNEL,message)
+    except Exception:
+        membership_cache.count("publish_failures")
+
+
+def apply_membership_change(data):
+    event=json.loads(data)
+    membership_cache.invalidate(int(event["board_id"]),event.get("user_id"))
@@ -0,0 +1,10 @@
+_collectors={}
+
+
+def register_metrics(name:str,collect):
+    """Expose `collect()` (a JSON-serializable dict) under `name` on GET /metrics."""
+    _collectors[name]=collect
+
+
+def collect_metrics():
+    return {name:collect() for name,collect in _collectors.items()}
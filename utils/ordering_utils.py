@@ -0,0 +1,103 @@
+import os
+from bisect import bisect_left,bisect_right,insort
+from fastapi import HTTPException,status
+from sqlalchemy import select,update,func
+from db.models import Card
+
+# cards are laid out POSITION_GAP apart; a move writes the midpoint of its new neighbours
+POSITION_GAP=float(os.getenv("CARD_POSITION_GAP","1024"))
+# once neighbours are closer than this the board is queued for a rebalance
+MIN_POSITION_GAP=float(os.getenv("CARD_POSITION_MIN_GAP","1e-6"))
+
+
+def position_between(previous:float|None,following:float|None)->float:
+    if previous is None and following is None:
+        return POSITION_GAP
+    if previous is None:
+        return following-POSITION_GAP
+    if following is None:
+        return previous+POSITION_GAP
+    return (previous+following)/2
+
+
+def is_too_dense(previous:float|None,position:float,following:float|None)->bool:
+    return (previous is not None and position-previous<MIN_POSITION_GAP) or (following is not None and following-position<MIN_POSITION_GAP)
+
+
+def next_position(db,board_id:int)->float:
+    """Position for a card appended to the end of the board, read off ix_cards_board_position."""
+    last=db.scalar(select(func.max(Card.position)).where(Card.board_id==board_id))
+    return position_between(last,None)
+
+
+def rebalance_positions(db,board_id:int):
+    """Respace every card on the board POSITION_GAP apart, keeping their order, in one UPDATE ... FROM."""
+    ranked=(
+        select(Card.id,(func.row_number().over(order_by=(Card.position,Card.id))*POSITION_GAP).label("position"))
+        .where(Card.board_id==board_id)
+        .subquery()
+    )
+    stmt=update(Card).where(Card.id==ranked.c.id).values(position=ranked.c.position).execution_options(synchronize_session=False)
+    return db.execute(stmt).rowcount
+
+
+class BoardLayout:
+    """One board's card order held in memory, so a batch of moves costs one read and one write.
+
+    Keys are card ids; cards not yet inserted use negative placeholder keys.
+    """
+    def __init__(self,rows):
+        self.positions=dict(rows)
+        self.order=sorted((position,key) for key,position in self.positions.items())
+        self.changed=set()
+
+    def __contains__(self,key):
+        return key in self.positions
+
+    def remove(self,key):
+        position=self.positions.pop(key)
+        del self.order[bisect_left(self.order,(position,key))]
+
+    def place(self,key,position:float):
+        self.positions[key]=position
+        insort(self.order,(position,key))
+        self.changed.add(key)
+
+    def append(self,key):
+        self.place(key,position_between(self.order[-1][0] if self.order else None,None))
+
+    def move(self,key,after_key=None,before_key=None)->bool:
+        """Place `key` between its new neighbours; True when the board should be rebalanced."""
+        if after_key is None and before_key is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="after_card_id or before_card_id is required")
+        if key in (after_key,before_key):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="a card cannot be moved next to itself")
+        self.remove(key)
+        previous,following=self._neighbours(after_key,before_key)
+        position=position_between(previous,following)
+        if previous is not None and following is not None and not previous<position<following:
+            self.respace()
+            previous,following=self._neighbours(after_key,before_key)
+            position=position_between(previous,following)
+        self.place(key,position)
+        return is_too_dense(previous,position,following)
+
+    def respace(self):
+        self.order=[((index+1)*POSITION_GAP,key) for index,(_,key) in enumerate(self.order)]
+        self.positions={key:position for position,key in self.order}
+        self.changed.update(self.positions)
+
+    def _neighbours(self,after_key,before_key):
+        for key in (after_key,before_key):
+            if key is not None and key not in self.positions:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"Card {key} not found")
+        if after_key is not None and before_key is not None:
+            previous,following=self.positions[after_key],self.positions[before_key]
+            if previous>=following:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="after_card_id must come before before_card_id")
+            return previous,following
+        if after_key is not None:
+            index=bisect_right(self.order,(self.positions[after_key],after_key))
+            return self.positions[after_key],(self.order[index][0] if index<len(self.order) else None)
+        index=bisect_left(self.order,(self.positions[before_key],before_key))
+        return (self.order[index-1][0] if index>0 else None),self.positions[before_key]
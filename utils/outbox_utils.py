@@ -0,0 +1,15 @@
+from db.models import OutboxEvent
+
+
+def add_outbox_event(db,actor_id:int,board_id:int,action:str,payload):
+    """Stage an activity event on `db`; it is only published if the surrounding transaction commits."""
+    db.add(OutboxEvent(actor_id=actor_id,board_id=board_id,action=action,payload=payload))
+
+
+# not an activity: the outbox relay dispatches tasks.cards.rebalance for it instead of queueing it for the feed
+REBALANCE_REQUESTED="REBALANCE_REQUESTED"
+
+
+def request_rebalance(db,actor_id:int,board_id:int):
+    """Stage a rebalance of the board's card positions, dispatched by the relay once the transaction commits."""
+    add_outbox_event(db,actor_id=actor_id,board_id=board_id,action=REBALANCE_REQUESTED,payload=None)
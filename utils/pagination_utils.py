@@ -0,0 +1,43 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException,status
+
+DEFAULT_PAGE_SIZE=50
+MAX_PAGE_SIZE=200
+
+
+def encode_cursor(*values):
+    raw=json.dumps([value.isoformat() if isinstance(value,datetime) else value for value in values],separators=(",",":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor:str):
+    try:
+        padded=cursor+"="*(-len(cursor)%4)
+        values=json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values,list):
+            raise ValueError("cursor must decode to a list")
+        return values
+    except (ValueError,TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Invalid cursor")
+
+
+def decode_datetime_cursor(cursor:str):
+    """Decode a `(datetime, id)` keyset cursor."""
+    values=decode_cursor(cursor)
+    try:
+        created_at,row_id=values
+        return datetime.fromisoformat(created_at),int(row_id)
+    except (ValueError,TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Invalid cursor")
+
+
+def decode_rank_cursor(cursor:str):
+    """Decode a `(rank, id)` keyset cursor."""
+    values=decode_cursor(cursor)
+    try:
+        rank,row_id=values
+        return float(rank),int(row_id)
+    except (ValueError,TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Invalid cursor")
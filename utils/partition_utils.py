@@ -0,0 +1,138 @@
+import os
+import re
+from collections import namedtuple
+from datetime import datetime,timedelta
+from sqlalchemy import text,delete
+from db.models import ActivityFeed,AuditLog
+
+PARTITION_MONTHS_AHEAD=int(os.getenv("PARTITION_MONTHS_AHEAD","3"))
+
+# keep_days None keeps rows forever; partitions whose range ended cold_after_days ago move to cold_tablespace
+RetentionPolicy=namedtuple("RetentionPolicy",["table","model","keep_days","cold_after_days","cold_tablespace"])
+
+
+def _days(name:str,default:str):
+    days=int(os.getenv(name,default))
+    return days if days>0 else None
+
+
+RETENTION_POLICIES=[
+    RetentionPolicy("activity_feeds",ActivityFeed,_days("ACTIVITY_FEED_RETENTION_DAYS","90"),None,None),
+    RetentionPolicy("audit_logs",AuditLog,_days("AUDIT_LOG_RETENTION_DAYS","0"),_days("AUDIT_LOG_COLD_AFTER_DAYS","90"),os.getenv("AUDIT_LOG_COLD_TABLESPACE")),
+]
+
+
+def month_start(moment:datetime)->datetime:
+    return datetime(moment.year,moment.month,1)
+
+
+def add_months(month:datetime,months:int)->datetime:
+    index=month.year*12+month.month-1+months
+    return datetime(index//12,index%12+1,1)
+
+
+def partition_name(table:str,month:datetime)->str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def create_partition_sql(table:str,month:datetime)->str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table,month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month,1):%Y-%m-%d}')"
+    )
+
+
+def is_partitioned(db,table:str)->bool:
+    return db.scalar(text("SELECT relkind FROM pg_class WHERE relname=:table AND relnamespace=current_schema()::regnamespace"),{"table":table})=="p"
+
+
+def monthly_partitions(db,table:str)->dict[datetime,tuple[str,str]]:
+    """month -> (partition name, tablespace) for the table's `<table>_pYYYY_MM` partitions."""
+    rows=db.execute(text(
+        "SELECT child.relname,coalesce(space.spcname,'') FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid=pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid=pg_inherits.inhrelid "
+        "LEFT JOIN pg_tablespace space ON space.oid=child.reltablespace "
+        "WHERE parent.relname=:table"
+    ),{"table":table}).all()
+    pattern=re.compile(rf"^{table}_p(\d{{4}})_(\d{{2}})$")
+    partitions={}
+    for name,tablespace in rows:
+        match=pattern.match(name)
+        if match:
+            partitions[datetime(int(match[1]),int(match[2]),1)]=(name,tablespace)
+    return partitions
+
+
+def default_partition(db,table:str)->str|None:
+    return db.scalar(text(
+        "SELECT child.relname FROM pg_partitioned_table part "
+        "JOIN pg_class child ON child.oid=part.partdefid "
+        "WHERE part.partrelid=to_regclass(:table)"
+    ),{"table":table})
+
+
+def create_partition(db,policy:RetentionPolicy,month:datetime)->int:
+    """Create the month's partition, moving in any of its rows the DEFAULT partition caught; returns rows moved.
+
+    Postgres refuses a partition whose range matches rows already in the
+    default one (they land there when maintenance has not run for a while),
+    so the default is detached for the move and attached again afterwards.
+    Both steps lock the parent table until the job commits.
+    """
+    table=policy.table
+    default=default_partition(db,table)
+    bounds={"start":month,"end":add_months(month,1)}
+    in_range="created_at>=:start AND created_at<:end"
+    if default is None or not db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})"),bounds):
+        db.execute(text(create_partition_sql(table,month)))
+        return 0
+    columns=",".join(column.name for column in policy.model.__table__.columns)
+    db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    db.execute(text(create_partition_sql(table,month)))
+    moved=db.execute(text(f"INSERT INTO {partition_name(table,month)} ({columns}) SELECT {columns} FROM {default} WHERE {in_range}"),bounds).rowcount
+    db.execute(text(f"DELETE FROM {default} WHERE {in_range}"),bounds)
+    db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    return moved
+
+
+def maintain_partitions(db,now:datetime|None=None,policies=None)->dict:
+    """Create the coming months' partitions and apply each table's retention policy.
+
+    On Postgres, partitions for PARTITION_MONTHS_AHEAD months are created
+    ahead of time; rows for those months that already sit in the DEFAULT
+    partition are moved into them. Partitions whose whole range is older than keep_days are
+    dropped, and those older than cold_after_days move to the cold
+    tablespace. Dropping a partition is instant and leaves nothing to vacuum.
+    Tables that are not partitioned (SQLite, or Postgres before the migration)
+    fall back to a DELETE of expired rows.
+    """
+    now=now or datetime.now()
+    summary={"created":[],"dropped":[],"moved":[],"deleted":{},"moved_from_default":{}}
+    postgres=db.get_bind().dialect.name=="postgresql"
+    for policy in policies or RETENTION_POLICIES:
+        if not (postgres and is_partitioned(db,policy.table)):
+            if policy.keep_days:
+                cutoff=now-timedelta(days=policy.keep_days)
+                summary["deleted"][policy.table]=db.execute(delete(policy.model).where(policy.model.created_at<cutoff)).rowcount
+            continue
+
+        partitions=monthly_partitions(db,policy.table)
+        current=month_start(now)
+        for offset in range(PARTITION_MONTHS_AHEAD+1):
+            month=add_months(current,offset)
+            if month not in partitions:
+                moved=create_partition(db,policy,month)
+                summary["created"].append(partition_name(policy.table,month))
+                if moved:
+                    summary["moved_from_default"][partition_name(policy.table,month)]=moved
+        for month,(name,tablespace) in sorted(partitions.items()):
+            ends=add_months(month,1)
+            if policy.keep_days and ends<=now-timedelta(days=policy.keep_days):
+                db.execute(text(f"DROP TABLE {name}"))
+                summary["dropped"].append(name)
+            elif policy.cold_tablespace and policy.cold_after_days and ends<=now-timedelta(days=policy.cold_after_days) and tablespace!=policy.cold_tablespace:
+                db.execute(text(f"ALTER TABLE {name} SET TABLESPACE {policy.cold_tablespace}"))
+                summary["moved"].append(name)
+    db.commit()
+    return summary
@@ -0,0 +1,93 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException,status
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+from utils.metrics import register_metrics
+
+BCRYPT_ROUNDS=int(os.getenv("BCRYPT_ROUNDS","12"))
+# 0 runs bcrypt in the shared threadpool as before
+BCRYPT_WORKERS=int(os.getenv("BCRYPT_WORKERS",str(min(4,os.cpu_count() or 1))))
+BCRYPT_MAX_PENDING=int(os.getenv("BCRYPT_MAX_PENDING",str(max(BCRYPT_WORKERS,1)*16)))
+
+# min == max == default: hashes made with any other cost are upgraded (or downgraded) on the next login
+pwd_context=CryptContext(schemes=["bcrypt"],bcrypt__default_rounds=BCRYPT_ROUNDS,bcrypt__min_rounds=BCRYPT_ROUNDS,bcrypt__max_rounds=BCRYPT_ROUNDS)
+
+
+def hash_password(password:str)->str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password:str,hashed:str)->bool:
+    return pwd_context.verify(password,hashed)
+
+
+def verify_and_update(password:str,hashed:str)->tuple[bool,str|None]:
+    """(valid, new_hash); new_hash is set when `hashed` was made with a different cost."""
+    return pwd_context.verify_and_update(password,hashed)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool so login storms cannot starve the API threadpool.
+
+    At most `max_pending` hashes may be running or queued; beyond that
+    requests are turned away with 503 and Retry-After instead of piling up
+    behind minutes of queued bcrypt work.
+    """
+    def __init__(self,workers:int=BCRYPT_WORKERS,max_pending:int=BCRYPT_MAX_PENDING):
+        self.workers=workers
+        self.max_pending=max_pending
+        self._executor=None
+        self._lock=threading.Lock()
+        self.in_flight=0
+        self.counts={"completed":0,"rejected":0,"peak_in_flight":0}
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs the event loop and threadpool is unsafe
+            self._executor=ProcessPoolExecutor(max_workers=self.workers,mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _admit(self):
+        with self._lock:
+            if self.in_flight>=self.max_pending:
+                self.counts["rejected"]+=1
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,detail="Too many logins in progress, retry shortly",headers={"Retry-After":"1"})
+            self.in_flight+=1
+            self.counts["peak_in_flight"]=max(self.counts["peak_in_flight"],self.in_flight)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight-=1
+            self.counts["completed"]+=1
+
+    async def run(self,fn,*args):
+        self._admit()
+        try:
+            if self.workers<=0:
+                return await run_in_threadpool(fn,*args)
+            return await asyncio.get_running_loop().run_in_executor(self._pool(),fn,*args)
+        finally:
+            self._release()
+
+    async def hash(self,password:str)->str:
+        return await self.run(hash_password,password)
+
+    async def verify_and_update(self,password:str,hashed:str)->tuple[bool,str|None]:
+        return await self.run(verify_and_update,password,hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False,cancel_futures=True)
+            self._executor=None
+
+    def stats(self):
+        with self._lock:
+            return {"workers":self.workers,"rounds":BCRYPT_ROUNDS,"max_pending":self.max_pending,"in_flight":self.in_flight,"queued":max(0,self.in_flight-self.workers) if self.workers>0 else 0,**self.counts}
+
+
+password_hasher=PasswordHasher()
+register_metrics("password_hashing",password_hasher.stats)
@@ -1,14 +1,32 @@
 from db.models import BoardMembers,BoardRole
 from fastapi import HTTPException,status
+from utils.membership_cache import membership_cache
 class BoardPermissionService:
     @staticmethod
     def require_member(db,board_id:int,user_id:int):
-        membership=(db.query(BoardMembers).filter(BoardMembers.board_id==board_id,BoardMembers.user_id==user_id).first())
-        if not membership:
+        membership=membership_cache.get(board_id,user_id)
+        if membership is not None:
+            return membership
+        read_started=membership_cache.read_started()
+        row=(db.query(BoardMembers.role).filter(BoardMembers.board_id==board_id,BoardMembers.user_id==user_id).first())
+        if not row:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Not a board member")
         
-        return membership
+        return membership_cache.set(board_id,user_id,row.role,read_started)
     
+    @staticmethod
+    def member_boards(db,board_ids,user_id:int)->set[int]:
+        """The subset of `board_ids` the user belongs to, resolving cache misses in one query."""
+        allowed={board_id for board_id in board_ids if membership_cache.get(board_id,user_id) is not None}
+        missing=set(board_ids)-allowed
+        if missing:
+            read_started=membership_cache.read_started()
+            rows=(db.query(BoardMembers.board_id,BoardMembers.role).filter(BoardMembers.user_id==user_id,BoardMembers.board_id.in_(missing)).all())
+            for row in rows:
+                membership_cache.set(row.board_id,user_id,row.role,read_started)
+                allowed.add(row.board_id)
+        return allowed
+
     @staticmethod
     def require_role(db,board_id:int,user_id:int,allowed_roles:set[BoardRole]):
         membership=BoardPermissionService.require_member(db,board_id,user_id)
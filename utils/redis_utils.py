@@ -0,0 +1,33 @@
+import os
+import redis
+import redis.asyncio
+
+REDIS_URL=os.getenv("CELERY_RESULT_BACKEND","redis://localhost:6379/1")
+
+# pubsub: fire-and-forget PUBLISH on board:{id}; streams: XADD to a capped board:{id}:stream read through consumer groups
+EVENT_TRANSPORT=os.getenv("EVENT_TRANSPORT","pubsub")
+STREAM_MAXLEN=int(os.getenv("STREAM_MAXLEN","10000"))
+# names this API instance's consumer group; required with streams. It must be stable across restarts so unacknowledged
+# events are redelivered, and unique per process: workers sharing a group would each get only part of the events
+INSTANCE_ID=os.getenv("WS_INSTANCE_ID")
+
+redis_client=redis.from_url(REDIS_URL)
+# for request-path reads and writes: awaiting it never holds up the event loop, whichever DB mode is on
+async_redis_client=redis.asyncio.from_url(REDIS_URL)
+
+
+def require_instance_id():
+    if EVENT_TRANSPORT=="streams" and not INSTANCE_ID:
+        raise RuntimeError("EVENT_TRANSPORT=streams needs WS_INSTANCE_ID, a stable name unique to this API process")
+
+
+def board_stream(board_id:int)->str:
+    return f"board:{board_id}:stream"
+
+
+def publish_board_event(pipe,board_id:int,frame:str):
+    """Queue one encoded board event on a pipeline using the configured transport."""
+    if EVENT_TRANSPORT=="streams":
+        pipe.xadd(board_stream(board_id),{"data":frame},maxlen=STREAM_MAXLEN,approximate=True)
+    else:
+        pipe.publish(f"board:{board_id}",frame)
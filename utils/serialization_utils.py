@@ -0,0 +1,40 @@
+import os
+from functools import lru_cache
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from utils.json_utils import dumps,orjson
+
+# off: jsonable_encoder + dumps as FastAPI would; validate: cached TypeAdapter, encoded by pydantic-core;
+# trusted: rows straight to orjson, for selects whose columns already match the response model
+FAST_SERIALIZATION=os.getenv("FAST_SERIALIZATION","off")
+
+
+@lru_cache(maxsize=None)
+def type_adapter(model)->TypeAdapter:
+    return TypeAdapter(model)
+
+
+def _row_dict(value):
+    # RowMapping and Row from Core selects; orjson handles datetime, enum and float itself
+    if hasattr(value,"_asdict"):
+        return value._asdict()
+    return dict(value)
+
+
+def encode(value,model,mode:str|None=None)->bytes:
+    """JSON bytes for `value` shaped as `model`, encoded according to FAST_SERIALIZATION."""
+    mode=mode or FAST_SERIALIZATION
+    if mode=="trusted" and orjson is not None:
+        return orjson.dumps(value,default=_row_dict)
+    if mode in ("validate","trusted"):
+        adapter=type_adapter(model)
+        return adapter.dump_json(adapter.validate_python(value,from_attributes=True))
+    return dumps(jsonable_encoder(value)).encode()
+
+
+def fast_response(value,model):
+    """The handler result as an encoded Response when the fast path is on, else unchanged for response_model."""
+    if FAST_SERIALIZATION=="off":
+        return value
+    return Response(content=encode(value,model),media_type="application/json")
@@ -0,0 +1,111 @@
+import os
+from sqlalchemy import select,update,event
+from sqlalchemy.orm import Session
+from db.models import Board
+from utils.redis_utils import redis_client,async_redis_client
+from utils.db_utils import run_db,after_db_io
+from utils.permission_utils import BoardPermissionService
+
+# short: a version write that never reached Redis can only serve stale 304s and card lists until it expires
+BOARD_VERSION_TTL=int(os.getenv("BOARD_VERSION_TTL","30"))
+
+# only ever raises the cached value, so a late write of an older version cannot win
+_SET_IF_NEWER_SCRIPT="""
+local current=tonumber(redis.call('GET',KEYS[1]))
+if current==nil or current<tonumber(ARGV[1]) then
+  redis.call('SET',KEYS[1],ARGV[1],'EX',ARGV[2])
+  return 1
+end
+return 0
+"""
+_SET_IF_NEWER=redis_client.register_script(_SET_IF_NEWER_SCRIPT)
+_ASYNC_SET_IF_NEWER=async_redis_client.register_script(_SET_IF_NEWER_SCRIPT)
+
+
+def board_version_key(board_id:int)->str:
+    return f"board:{board_id}:version"
+
+
+def board_etag(board_id:int,version:int)->str:
+    return f'W/"{board_id}-{version}"'
+
+
+def etag_matches(if_none_match:str|None,etag:str)->bool:
+    if not if_none_match:
+        return False
+    candidates={candidate.strip() for candidate in if_none_match.split(",")}
+    # weak comparison: W/"x" and "x" name the same version
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
+def cache_board_version(board_id:int,version:int):
+    try:
+        _SET_IF_NEWER(keys=[board_version_key(board_id)],args=[version,BOARD_VERSION_TTL])
+    except Exception as e:
+        print("failed to cache board version, dropping the cached one:",e)
+        try:
+            # readers fall back to the boards row instead of trusting the previous version
+            redis_client.delete(board_version_key(board_id))
+        except Exception as e:
+            print("failed to drop cached board version:",e)
+
+
+async def async_cache_board_version(board_id:int,version:int):
+    try:
+        await _ASYNC_SET_IF_NEWER(keys=[board_version_key(board_id)],args=[version,BOARD_VERSION_TTL])
+    except Exception as e:
+        print("failed to cache board version, dropping the cached one:",e)
+        try:
+            await async_redis_client.delete(board_version_key(board_id))
+        except Exception as e:
+            print("failed to drop cached board version:",e)
+
+
+async def load_board_version(db,board_id:int)->int|None:
+    """Current version of the board: Redis first on the asyncio client, the boards row through run_db on a miss or when Redis is down."""
+    try:
+        cached=await async_redis_client.get(board_version_key(board_id))
+        if cached is not None:
+            return int(cached)
+    except Exception as e:
+        print("board version cache unavailable:",e)
+    version=await run_db(db,lambda session:session.scalar(select(Board.version).where(Board.id==board_id)))
+    if version is not None:
+        await async_cache_board_version(board_id,version)
+    return version
+
+
+def bump_board_version(db,board_id:int)->int|None:
+    """Increment the board's version in the current transaction; it is cached once the transaction commits."""
+    # updated_at keeps its value: it tracks edits to the board itself
+    version=db.scalar(update(Board).where(Board.id==board_id).values(version=Board.version+1,updated_at=Board.updated_at).returning(Board.version))
+    if version is not None:
+        db.info.setdefault("board_versions",{})[board_id]=version
+    return version
+
+
+async def check_board_etag(db,board_id:int,user_id:int,if_none_match:str|None):
+    """Return `(etag, not_modified)` for a conditional read of the board.
+
+    A 304 costs a version lookup plus the (cached) membership check and
+    nothing else; other requests go on to build the payload as usual.
+    """
+    version=await load_board_version(db,board_id)
+    if version is None:
+        return None,False
+    etag=board_etag(board_id,version)
+    if etag_matches(if_none_match,etag):
+        await run_db(db,BoardPermissionService.require_member,board_id,user_id)
+        return etag,True
+    return etag,False
+
+
+@event.listens_for(Session,"after_commit")
+def _publish_board_versions(session):
+    for board_id,version in session.info.pop("board_versions",{}).items():
+        after_db_io(session,lambda board_id=board_id,version=version:cache_board_version(board_id,version),lambda board_id=board_id,version=version:async_cache_board_version(board_id,version))
+
+
+@event.listens_for(Session,"after_rollback")
+def _discard_board_versions(session):
+    session.info.pop("board_versions",None)